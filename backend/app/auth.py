@@ -7,7 +7,8 @@ from dotenv import load_dotenv
 import secrets
 from uuid import uuid4
 from pydantic import BaseModel
-from app.database import get_db_session
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import unit_of_work
 from app.svc.database_service import DatabaseService
 
 # Load environment variables
@@ -102,9 +103,14 @@ async def refresh_google_token(google_refresh_token: str) -> dict:
 
 
 async def create_tokens(
-    user_data: dict, google_token_data: dict = None
+    user_data: dict,
+    google_token_data: dict = None,
+    session: Optional[AsyncSession] = None,
 ) -> Tuple[str, str]:
-    """Create both access and refresh tokens for authenticated user"""
+    """
+    Create both access and refresh tokens for authenticated user. Pass the
+    caller's session to store the refresh token in its unit of work.
+    """
     # Create access token with shorter expiry
     access_expire = datetime.now(timezone.utc) + timedelta(hours=JWT_EXPIRATION_HOURS)
     access_payload = {
@@ -123,7 +129,7 @@ async def create_tokens(
     refresh_token = secrets.token_urlsafe(32)
 
     # Store refresh token in database
-    async for session in get_db_session():
+    async with unit_of_work(session) as session:
         db_service = DatabaseService(session)
         token_data = {
             "token": refresh_token,
@@ -139,15 +145,16 @@ async def create_tokens(
             if google_token_data
             else None,
         }
-        await db_service.create_refresh_token(token_data)
-        break
+        await db_service.create_refresh_token(token_data, returning=False)
 
     return access_token, refresh_token
 
 
-async def refresh_access_token(refresh_token: str) -> Optional[str]:
+async def refresh_access_token(
+    refresh_token: str, session: Optional[AsyncSession] = None
+) -> Optional[str]:
     """Create a new access token using a valid refresh token"""
-    async for session in get_db_session():
+    async with unit_of_work(session) as session:
         db_service = DatabaseService(session)
         token_obj = await db_service.get_refresh_token(refresh_token)
 
@@ -238,28 +245,30 @@ async def refresh_access_token(refresh_token: str) -> Optional[str]:
             return access_token
 
 
-async def revoke_refresh_token(refresh_token: str) -> bool:
+async def revoke_refresh_token(
+    refresh_token: str, session: Optional[AsyncSession] = None
+) -> bool:
     """Revoke a refresh token"""
-    async for session in get_db_session():
+    async with unit_of_work(session) as session:
         db_service = DatabaseService(session)
         token_obj = await db_service.get_refresh_token(refresh_token)
 
         if token_obj:
             await db_service.delete_refresh_token(token_obj)
             return True
-    return False
+        return False
 
 
 async def cleanup_expired_refresh_tokens():
     """Remove expired refresh tokens from storage"""
-    async for session in get_db_session():
+    async with unit_of_work() as session:
         db_service = DatabaseService(session)
         return await db_service.cleanup_expired_refresh_tokens()
 
 
 async def cleanup_inactive_guest_users(hours: int = 24):
     """Remove inactive guest users and their refresh tokens"""
-    async for session in get_db_session():
+    async with unit_of_work() as session:
         db_service = DatabaseService(session)
         return await db_service.cleanup_inactive_guest_users(hours=hours)
 
@@ -299,7 +308,9 @@ def create_jwt_token(payload: dict, expires_minutes: int = 60) -> str:
     return jwt.encode(payload_copy, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
 
 
-async def create_guest_tokens(guest_name: str = None) -> Tuple[str, str]:
+async def create_guest_tokens(
+    guest_name: str = None, session: Optional[AsyncSession] = None
+) -> Tuple[str, str]:
     """Create guest access and refresh tokens"""
     guest_id = "guest_" + str(uuid4())
 
@@ -318,7 +329,7 @@ async def create_guest_tokens(guest_name: str = None) -> Tuple[str, str]:
 
     # Store guest refresh token in database
     refresh_expire = datetime.now(timezone.utc) + timedelta(days=7)
-    async for session in get_db_session():
+    async with unit_of_work(session) as session:
         db_service = DatabaseService(session)
         token_data = {
             "token": guest_refresh_token,
@@ -327,18 +338,19 @@ async def create_guest_tokens(guest_name: str = None) -> Tuple[str, str]:
             "google_refresh_token": None,
             "google_token_expires_at": None,
         }
-        await db_service.create_refresh_token(token_data)
-        break
+        await db_service.create_refresh_token(token_data, returning=False)
 
     return guest_access_token, guest_refresh_token
 
 
-async def refresh_guest_access_token(guest_refresh_token: str) -> Optional[str]:
+async def refresh_guest_access_token(
+    guest_refresh_token: str, session: Optional[AsyncSession] = None
+) -> Optional[str]:
     """Refresh guest access token using guest refresh token"""
     if not guest_refresh_token.startswith("guest_refresh_"):
         return None
 
-    async for session in get_db_session():
+    async with unit_of_work(session) as session:
         db_service = DatabaseService(session)
         token_obj = await db_service.get_refresh_token(guest_refresh_token)
 
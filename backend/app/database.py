@@ -1,30 +1,215 @@
+from sqlalchemy import event, make_url, text
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
 from sqlalchemy.exc import DisconnectionError, OperationalError
-from typing import AsyncGenerator
+from sqlalchemy.exc import TimeoutError as SQLAlchemyTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, AsyncIterator, Optional
 import asyncio
 import logging
+import re
+import time
 
 
 class Base(DeclarativeBase):
     pass
 
 
+# Defaults for DatabaseManager.initialize (overridden by DB_* settings)
+DEFAULT_POOL_SIZE = 10
+DEFAULT_MAX_OVERFLOW = 10
+DEFAULT_POOL_TIMEOUT_SECONDS = 30.0
+# Prepared statements kept per connection by asyncpg; 0 disables (needed
+# behind pgbouncer in transaction mode)
+DEFAULT_STATEMENT_CACHE_SIZE = 500
+DEFAULT_LIVENESS_INTERVAL_SECONDS = 30.0
+# Connections older than this are replaced when next checked in
+POOL_RECYCLE_SECONDS = 1800
+
+_TABLE = re.compile(r"\b(?:FROM|INTO|UPDATE)\s+(\w+)", re.IGNORECASE)
+
+
+def statement_name(context, statement: str) -> str:
+    """
+    The name a statement's latency is recorded under: its statement_name
+    execution option if set, otherwise its verb and first table.
+    """
+    name = context.execution_options.get("statement_name") if context else None
+    if name:
+        return name
+    verb = statement.split(None, 1)[0].lower() if statement.strip() else "?"
+    table = _TABLE.search(statement)
+    return f"{verb} {table.group(1)}" if table else verb
+
+
+class DatabaseMetrics:
+    """Pool checkout waits and query latency per statement name."""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.checkout_wait = 0.0
+        self.max_checkout_wait = 0.0
+        self.checkout_timeouts = 0
+        # Statement name -> [count, total seconds, max seconds]
+        self.queries: dict[str, list] = {}
+        self.liveness_failures = 0
+
+    def record_checkout(self, waited: float, timed_out: bool = False) -> None:
+        if timed_out:
+            self.checkout_timeouts += 1
+            return
+        self.checkouts += 1
+        self.checkout_wait += waited
+        self.max_checkout_wait = max(self.max_checkout_wait, waited)
+
+    def record_query(self, name: str, seconds: float) -> None:
+        entry = self.queries.setdefault(name, [0, 0.0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] = max(entry[2], seconds)
+
+    def get_stats(self) -> dict:
+        return {
+            "checkouts": self.checkouts,
+            "average_checkout_wait_ms": (
+                round(self.checkout_wait / self.checkouts * 1000, 3)
+                if self.checkouts
+                else 0.0
+            ),
+            "max_checkout_wait_ms": round(self.max_checkout_wait * 1000, 3),
+            "checkout_timeouts": self.checkout_timeouts,
+            "liveness_failures": self.liveness_failures,
+            "queries": {
+                name: {
+                    "count": count,
+                    "average_ms": round(total / count * 1000, 3),
+                    "max_ms": round(longest * 1000, 3),
+                }
+                for name, (count, total, longest) in self.queries.items()
+            },
+        }
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waited for a connection."""
+
+    metrics: DatabaseMetrics
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except SQLAlchemyTimeoutError:
+            self.metrics.record_checkout(time.perf_counter() - started, True)
+            raise
+        self.metrics.record_checkout(time.perf_counter() - started)
+        return connection
+
+
 class DatabaseManager:
     def __init__(self):
         self.engine = None
         self.async_session_maker = None
+        self.metrics = DatabaseMetrics()
+        self.live: Optional[bool] = None  # Result of the last liveness check
+
+    def initialize(
+        self,
+        database_url: str,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        max_overflow: int = DEFAULT_MAX_OVERFLOW,
+        pool_timeout: float = DEFAULT_POOL_TIMEOUT_SECONDS,
+        statement_cache_size: int = DEFAULT_STATEMENT_CACHE_SIZE,
+    ):
+        connect_args = {}
+        if make_url(database_url).get_driver_name() == "asyncpg":
+            # Hot queries such as get_user_by_id are prepared once per
+            # connection and reused from then on
+            connect_args["prepared_statement_cache_size"] = statement_cache_size
+
+        metrics = self.metrics
+
+        class Pool(InstrumentedPool):
+            pass
 
-    def initialize(self, database_url: str):
+        # A class attribute, so pools recreated by dispose() keep reporting
+        Pool.metrics = metrics
+
+        # No pre-ping: run_liveness_checks finds dead connections in the
+        # background instead of costing a round trip on every checkout
         self.engine = create_async_engine(
             database_url,
             echo=False,
-            pool_pre_ping=True,  # Verify connections before use
+            poolclass=Pool,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=pool_timeout,
+            pool_recycle=POOL_RECYCLE_SECONDS,
+            connect_args=connect_args,
         )
+
+        @event.listens_for(self.engine.sync_engine, "before_cursor_execute")
+        def _started(conn, cursor, statement, parameters, context, executemany):
+            conn.info["query_started"] = time.perf_counter()
+
+        @event.listens_for(self.engine.sync_engine, "after_cursor_execute")
+        def _finished(conn, cursor, statement, parameters, context, executemany):
+            started = conn.info.pop("query_started", None)
+            if started is not None:
+                metrics.record_query(
+                    statement_name(context, statement), time.perf_counter() - started
+                )
+
         self.async_session_maker = async_sessionmaker(
             self.engine,
+            # Writes return their rows (see DatabaseService), so there is
+            # nothing to reload after a commit
+            expire_on_commit=False,
         )
 
+    async def check_liveness(self) -> bool:
+        """
+        Run SELECT 1 on a pooled connection. If it fails, the pool is
+        emptied so that later checkouts open fresh connections.
+        """
+        if self.engine is None:
+            return False
+        try:
+            async with self.engine.connect() as connection:
+                await connection.execute(
+                    text("SELECT 1").execution_options(statement_name="liveness")
+                )
+            self.live = True
+            return True
+        except Exception as e:
+            self.live = False
+            self.metrics.liveness_failures += 1
+            logging.warning(f"Database liveness check failed, resetting pool: {e}")
+            await self.engine.dispose()
+            return False
+
+    async def run_liveness_checks(
+        self, interval: float = DEFAULT_LIVENESS_INTERVAL_SECONDS
+    ):
+        """Background task that checks the database every interval seconds."""
+        while True:
+            await asyncio.sleep(interval)
+            await self.check_liveness()
+
+    def get_stats(self) -> dict:
+        """Pool occupancy, checkout waits and query latency by statement."""
+        stats = self.metrics.get_stats()
+        if self.engine is not None:
+            pool = self.engine.pool
+            stats.update(
+                pool_size=pool.size(),
+                in_use=pool.checkedout(),
+                idle=pool.checkedin(),
+                overflow=max(0, pool.overflow()),
+            )
+        return stats
+
     async def close(self):
         if self.engine:
             await self.engine.dispose()
@@ -33,16 +218,33 @@ class DatabaseManager:
 db_manager = DatabaseManager()
 
 
-async def get_db_session(max_retries: int = 3) -> AsyncGenerator[AsyncSession, None]:
-    """Get database session with connection retry logic"""
+@asynccontextmanager
+async def unit_of_work(
+    session: Optional[AsyncSession] = None, max_retries: int = 3
+) -> AsyncIterator[AsyncSession]:
+    """
+    The session for one logical operation, to be passed through every call
+    that operation makes so they all share one connection.
+
+    Given an existing session, joins its unit of work and leaves it open for
+    its owner. Otherwise opens a session and checks out its connection up
+    front. Only that checkout is retried: once a statement may have run, a
+    failure is the caller's to handle. The session is closed on exit, which
+    rolls back anything left uncommitted.
+    """
+    if session is not None:
+        yield session
+        return
+
+    if db_manager.async_session_maker is None:
+        raise RuntimeError("DatabaseManager is not initialized.")
     for attempt in range(max_retries):
+        session = db_manager.async_session_maker()
         try:
-            if db_manager.async_session_maker is None:
-                raise RuntimeError("DatabaseManager is not initialized.")
-            async with db_manager.async_session_maker() as session:
-                yield session
-                return
-        except (DisconnectionError, OperationalError) as e:
+            await session.connection()
+            break
+        except (DisconnectionError, OperationalError, OSError) as e:
+            await session.close()
             if attempt == max_retries - 1:
                 logging.error(
                     f"Database connection failed after {max_retries} attempts: {e}"
@@ -52,6 +254,12 @@ async def get_db_session(max_retries: int = 3) -> AsyncGenerator[AsyncSession, N
                 f"Database connection attempt {attempt + 1} failed, retrying: {e}"
             )
             await asyncio.sleep(0.1 * (2**attempt))  # Exponential backoff
-        except Exception as e:
-            logging.error(f"Unexpected database error: {e}")
-            raise
+
+    async with session:
+        yield session
+
+
+async def get_db_session() -> AsyncGenerator[AsyncSession, None]:
+    """FastAPI dependency: the request's unit of work."""
+    async with unit_of_work() as session:
+        yield session
@@ -0,0 +1,625 @@
+"""
+Vectorised move generation and evaluation features for many boards at once.
+
+Positions are packed into an (N, PLANE_COUNT, 64) boolean occupancy tensor:
+planes 0-5 hold the white pawn/knight/bishop/rook/queen/king squares, planes
+6-11 the black ones, and one plane per modifier (in ALL_MODIFIERS order) marks
+squares whose piece has that modifier available. Promoted pawns are packed as
+the piece they act as. Side to move, castling rights and en passant file are
+separate vectors.
+
+Every board-wide quantity (attack maps, mobility, material, legal-move counts)
+is computed with whole-array shifts, so the cost is a fixed number of NumPy
+operations regardless of N. The few rule interactions that cannot be expressed
+that way (checks, pins, en passant, Teleport and Sacrificial Lamb) are
+resolved exactly through the object model for just the affected boards.
+"""
+
+from typing import Iterator, Sequence
+
+import numpy as np
+
+from app.obj.board import Board
+from app.obj.chess_move import ChessMove
+from app.obj.constants import (
+    BOARD_SIZE,
+    EN_PASSANT_ROWS,
+    KING_MOVES,
+    KNIGHT_MOVES,
+    PAWN_DIRECTIONS,
+    PAWN_PROMOTION_ROWS,
+    PAWN_START_ROWS,
+)
+from app.obj.game import Game
+from app.obj.modifier import ALL_MODIFIERS, MODIFIERS_BY_TYPE
+from app.obj.pieces import PIECE_CLASSES, Piece
+from app.obj.position import Position
+
+PIECE_TYPES = ["pawn", "knight", "bishop", "rook", "queen", "king"]
+COLORS = ["white", "black"]
+COLOR_OFFSETS = {"white": 0, "black": len(PIECE_TYPES)}
+MODIFIER_PLANES = {
+    modifier.modifier_type: 2 * len(PIECE_TYPES) + index
+    for index, modifier in enumerate(ALL_MODIFIERS)
+}
+PLANE_COUNT = 2 * len(PIECE_TYPES) + len(ALL_MODIFIERS)
+
+# Castling vector columns
+WHITE_KINGSIDE, WHITE_QUEENSIDE, BLACK_KINGSIDE, BLACK_QUEENSIDE = range(4)
+CASTLING_COLUMNS = {"white": (0, 1), "black": (2, 3)}
+
+# Home row of each color's king and rooks
+HOME_ROWS = {"white": 7, "black": 0}
+
+ORTHOGONALS = [(0, 1), (0, -1), (1, 0), (-1, 0)]
+DIAGONALS = [(1, 1), (1, -1), (-1, -1), (-1, 1)]
+HORIZONTALS = [(0, 1), (0, -1)]
+LONGHORN_MOVES = [(2, 0), (-2, 0), (0, 2), (0, -2)]
+PEGASUS_MOVES = [(-2, -2), (-2, 2), (2, -2), (2, 2)]
+AGGRESSION_MOVES = [(dr * 2, dc * 2) for dr, dc in KING_MOVES]
+CORNERS = [(0, 0), (0, 7), (7, 0), (7, 7)]
+
+FEATURE_NAMES = [
+    "material_white",
+    "material_black",
+    "mobility_white",
+    "mobility_black",
+    "attacked_white",
+    "attacked_black",
+    "in_check",
+    "legal_moves",
+    "turn",
+]
+
+
+class BatchBoards:
+    """A batch of positions packed into NumPy arrays."""
+
+    def __init__(
+        self,
+        occupancy: np.ndarray,
+        turn: np.ndarray,
+        castling: np.ndarray,
+        en_passant: np.ndarray,
+    ):
+        self.occupancy = occupancy  # (N, PLANE_COUNT, 64) bool
+        self.turn = turn  # (N,) int8, 0 for white and 1 for black
+        self.castling = castling  # (N, 4) bool
+        self.en_passant = en_passant  # (N,) int8 file, or -1 if none
+
+    def __len__(self) -> int:
+        return self.occupancy.shape[0]
+
+    @classmethod
+    def from_boards(
+        cls, boards: Sequence[Board], turns: Sequence[str]
+    ) -> "BatchBoards":
+        """Pack object-model boards and their side to move."""
+        count = len(boards)
+        occupancy = np.zeros((count, PLANE_COUNT, BOARD_SIZE * BOARD_SIZE), bool)
+        turn = np.zeros(count, np.int8)
+        castling = np.zeros((count, 4), bool)
+        en_passant = np.full(count, -1, np.int8)
+
+        for index, (board, color) in enumerate(zip(boards, turns)):
+            turn[index] = COLORS.index(color)
+            for piece in board.pieces:
+                square = piece.position.row * BOARD_SIZE + piece.position.col
+                plane = COLOR_OFFSETS[piece.color] + PIECE_TYPES.index(
+                    piece.get_acting_type()
+                )
+                occupancy[index, plane, square] = True
+                for modifier in piece.modifiers:
+                    if _modifier_available(piece, modifier.modifier_type):
+                        plane = MODIFIER_PLANES[modifier.modifier_type]
+                        occupancy[index, plane, square] = True
+
+            for side in COLORS:
+                kingside, queenside = CASTLING_COLUMNS[side]
+                castling[index, kingside] = _has_castling_right(board, side, 7)
+                castling[index, queenside] = _has_castling_right(board, side, 0)
+
+            en_passant[index] = _en_passant_file(board, color)
+
+        return cls(occupancy, turn, castling, en_passant)
+
+    @classmethod
+    def from_games(cls, games: Sequence[Game]) -> "BatchBoards":
+        """Pack the current position of each game."""
+        return cls.from_boards([game.board for game in games], [g.turn for g in games])
+
+    def to_board(self, index: int) -> Board:
+        """
+        Rebuild an object-model board for one packed position.
+
+        The result produces the same moves as the original board, though
+        move history that does not affect move generation is not restored.
+        """
+        board = Board.empty()
+        planes = self.occupancy[index]
+        for color in COLORS:
+            for type_index, piece_type in enumerate(PIECE_TYPES):
+                plane = COLOR_OFFSETS[color] + type_index
+                for square in np.flatnonzero(planes[plane]):
+                    row, col = divmod(int(square), BOARD_SIZE)
+                    piece: Piece = PIECE_CLASSES[piece_type](color)
+                    piece.moved = True
+                    for modifier_type, modifier_plane in MODIFIER_PLANES.items():
+                        if planes[modifier_plane, square]:
+                            piece.add_modifier(MODIFIERS_BY_TYPE[modifier_type])
+                    board.place_piece(piece, Position(row, col))
+
+        for color in COLORS:
+            home_row = HOME_ROWS[color]
+            kingside, queenside = CASTLING_COLUMNS[color]
+            king = board.squares[home_row][4]
+            if king and king.type == "king" and king.color == color:
+                if self.castling[index, kingside] or self.castling[index, queenside]:
+                    king.moved = False
+            for column, rook_col in ((kingside, 7), (queenside, 0)):
+                rook = board.squares[home_row][rook_col]
+                if self.castling[index, column] and rook and rook.type == "rook":
+                    rook.moved = False
+
+        file = int(self.en_passant[index])
+        if file >= 0:
+            color = COLORS[self.turn[index]]
+            enemy = board.opposite_color(color)
+            board.last_move = ChessMove(
+                Position(PAWN_START_ROWS[enemy], file),
+                Position(EN_PASSANT_ROWS[color], file),
+            )
+        return board
+
+
+class BatchEvaluation:
+    """Per-board move counts and evaluation features for a batch."""
+
+    def __init__(
+        self,
+        material: np.ndarray,
+        mobility: np.ndarray,
+        attack_maps: np.ndarray,
+        in_check: np.ndarray,
+        legal_moves: np.ndarray,
+        used_object_model: np.ndarray,
+        turn: np.ndarray,
+    ):
+        self.material = material  # (N, 2) piece values plus modifier scores
+        self.mobility = mobility  # (N, 2) pseudo-legal move counts
+        self.attack_maps = attack_maps  # (N, 2, 64) squares each side attacks
+        self.in_check = in_check  # (N,) side to move is in check
+        self.legal_moves = legal_moves  # (N,) legal moves for the side to move
+        self.used_object_model = used_object_model  # (N,) used the object model
+        self.turn = turn
+
+    def features(self) -> np.ndarray:
+        """Stack the features into an (N, len(FEATURE_NAMES)) matrix."""
+        return np.column_stack(
+            [
+                self.material[:, 0],
+                self.material[:, 1],
+                self.mobility[:, 0],
+                self.mobility[:, 1],
+                self.attack_maps[:, 0].sum(axis=1),
+                self.attack_maps[:, 1].sum(axis=1),
+                self.in_check,
+                self.legal_moves,
+                self.turn,
+            ]
+        ).astype(np.int32)
+
+
+def evaluate_batch(batch: BatchBoards) -> BatchEvaluation:
+    """Compute attack maps, mobility, material and legal-move counts in one call."""
+    count = len(batch)
+    planes = batch.occupancy.reshape(count, PLANE_COUNT, BOARD_SIZE, BOARD_SIZE)
+    sides = {color: _Side(planes, color) for color in COLORS}
+    occupied = sides["white"].occupied | sides["black"].occupied
+    empty = ~occupied
+
+    attack_maps = np.zeros((count, 2, BOARD_SIZE, BOARD_SIZE), bool)
+    mobility = np.zeros((count, 2), np.int32)
+    material = np.zeros((count, 2), np.int32)
+    for index, color in enumerate(COLORS):
+        side = sides[color]
+        enemy = sides[_opposite(color)]
+        attack_maps[:, index] = _attack_map(side, occupied)
+        mobility[:, index] = (
+            _count_steps(_non_king_steps(side, occupied), side.occupied)
+            + _count_steps(_king_steps(side), side.occupied)
+            + _pawn_move_count(side, empty, enemy.occupied)
+            + _special_move_count(side, empty)
+            + side.escape_hatch.sum(axis=(1, 2)) * _row_count(empty, side.escape_row)
+        )
+        material[:, index] = side.material()
+
+    to_move = batch.turn.astype(bool)
+    white_to_move = ~to_move
+    in_check = np.where(
+        white_to_move,
+        (sides["white"].king & attack_maps[:, 1]).any(axis=(1, 2)),
+        (sides["black"].king & attack_maps[:, 0]).any(axis=(1, 2)),
+    )
+    enemy_in_check = np.where(
+        white_to_move,
+        (sides["black"].king & attack_maps[:, 0]).any(axis=(1, 2)),
+        (sides["white"].king & attack_maps[:, 1]).any(axis=(1, 2)),
+    )
+
+    legal_moves = np.zeros(count, np.int32)
+    needs_object_model = in_check | enemy_in_check | (batch.en_passant >= 0)
+    for index, color in enumerate(COLORS):
+        rows = to_move == bool(index)
+        if not rows.any():
+            continue
+        side = sides[color]
+        enemy = sides[_opposite(color)]
+        legal_moves[rows] = _legal_move_count(
+            side, enemy, occupied, batch.castling, color
+        )[rows]
+        needs_object_model |= rows & (
+            (side.king.sum(axis=(1, 2)) != 1)
+            | (enemy.king.sum(axis=(1, 2)) != 1)
+            | side.teleport.any(axis=(1, 2))
+            | side.lamb.any(axis=(1, 2))
+            | enemy.lamb.any(axis=(1, 2))
+            | _has_pin(side, enemy, occupied)
+        )
+
+    for index in np.flatnonzero(needs_object_model):
+        board = batch.to_board(int(index))
+        color = COLORS[batch.turn[index]]
+        legal_moves[index] = len(board.get_available_moves_for_color(color))
+
+    return BatchEvaluation(
+        material=material,
+        mobility=mobility,
+        attack_maps=attack_maps.reshape(count, 2, BOARD_SIZE * BOARD_SIZE),
+        in_check=in_check,
+        legal_moves=legal_moves,
+        used_object_model=needs_object_model,
+        turn=batch.turn,
+    )
+
+
+class _Side:
+    """Movement-pattern masks, shape (N, 8, 8), for one color's pieces."""
+
+    def __init__(self, planes: np.ndarray, color: str):
+        offset = COLOR_OFFSETS[color]
+        pawn, knight, bishop, rook, queen, king = (
+            planes[:, offset + index] for index in range(len(PIECE_TYPES))
+        )
+
+        def modifier(modifier_type: str) -> np.ndarray:
+            return planes[:, MODIFIER_PLANES[modifier_type]]
+
+        self.planes = planes[:, offset : offset + len(PIECE_TYPES)]
+        self.modifier_planes = planes[:, 2 * len(PIECE_TYPES) :]
+        self.color = color
+        self.occupied = self.planes.any(axis=1)
+        self.pawn = pawn
+        self.king = king
+
+        # Quook replaces the rook's movement entirely, so its other modifiers are inert
+        quook = rook & modifier("Quook")
+        plain_rook = rook & ~quook
+        self.knight_leapers = (
+            knight
+            | (plain_rook & modifier("Knook"))
+            | (bishop & modifier("Unicorn"))
+            | (queen & modifier("Kneen"))
+        )
+        self.orthogonal = rook | queen
+        self.diagonal = bishop | queen | quook
+        self.kitty_castle = plain_rook & modifier("Kitty Castle")
+        self.sidestepper = bishop & modifier("Sidestepper")
+        self.longhorn = knight & modifier("Longhorn")
+        self.pegasus = knight & modifier("Pegasus")
+        self.royal_guard = knight & modifier("Royal Guard")
+        self.corner_hop = bishop & modifier("Corner Hop")
+        self.infiltration = queen & modifier("Infiltration")
+        self.lamb = queen & modifier("Sacrificial Lamb")
+        self.aggression = king & modifier("Aggression")
+        self.escape_hatch = king & modifier("Escape Hatch")
+        self.teleport = king & modifier("Teleport")
+        self.reverse = pawn & modifier("Reverse")
+        self.kitty = pawn & modifier("Kitty")
+        self.long_leaper = pawn & modifier("Long Leaper")
+
+        # Rows used by the board-wide modifiers, matching pieces.py
+        self.escape_row = 0 if color == "white" else 7
+        self.infiltration_row = 0 if color == "black" else 7
+
+    def material(self) -> np.ndarray:
+        """Sum of piece values and modifier scores for this side."""
+        total = np.zeros(self.planes.shape[0], np.int32)
+        for index, piece_type in enumerate(PIECE_TYPES):
+            total += (
+                self.planes[:, index].sum(axis=(1, 2))
+                * Piece.PIECE_VALUES[piece_type]
+            )
+        for index, modifier in enumerate(ALL_MODIFIERS):
+            pieces = self.modifier_planes[:, index] & self.occupied
+            total += pieces.sum(axis=(1, 2)) * modifier.score
+        return total
+
+
+def _opposite(color: str) -> str:
+    return "black" if color == "white" else "white"
+
+
+def _modifier_available(piece: Piece, modifier_type: str) -> bool:
+    modifier = MODIFIERS_BY_TYPE[modifier_type]
+    return modifier.uses == 0 or piece.get_modifier_uses_remaining(modifier_type) > 0
+
+
+def _has_castling_right(board: Board, color: str, rook_col: int) -> bool:
+    home_row = HOME_ROWS[color]
+    king = board.squares[home_row][4]
+    rook = board.squares[home_row][rook_col]
+    return bool(
+        king
+        and king.type == "king"
+        and king.color == color
+        and not king.moved
+        and rook
+        and rook.type == "rook"
+        and rook.color == color
+        and not rook.moved
+    )
+
+
+def _en_passant_file(board: Board, color: str) -> int:
+    """File of a pawn that can be captured en passant by the given color, or -1."""
+    last_move = board.last_move
+    if not last_move:
+        return -1
+    enemy = board.opposite_color(color)
+    from_row, from_col = last_move.position_from.coordinates()
+    to_row, to_col = last_move.position_to.coordinates()
+    moved_piece = board.squares[to_row][to_col]
+    if (
+        from_row == PAWN_START_ROWS[enemy]
+        and to_row == EN_PASSANT_ROWS[color]
+        and from_col == to_col
+        and moved_piece
+        and moved_piece.type == "pawn"
+        and moved_piece.color == enemy
+    ):
+        return to_col
+    return -1
+
+
+def _shift(squares: np.ndarray, dr: int, dc: int) -> np.ndarray:
+    """Move every set square by (dr, dc), dropping squares that leave the board."""
+    shifted = np.zeros_like(squares)
+    src_rows = slice(max(-dr, 0), BOARD_SIZE - max(dr, 0))
+    dst_rows = slice(max(dr, 0), BOARD_SIZE - max(-dr, 0))
+    src_cols = slice(max(-dc, 0), BOARD_SIZE - max(dc, 0))
+    dst_cols = slice(max(dc, 0), BOARD_SIZE - max(-dc, 0))
+    shifted[..., dst_rows, dst_cols] = squares[..., src_rows, src_cols]
+    return shifted
+
+
+def _leaps(
+    pieces: np.ndarray, offsets: list[tuple[int, int]]
+) -> Iterator[np.ndarray]:
+    # One source maps to at most one target per offset, so per-offset counts are exact
+    for dr, dc in offsets:
+        yield _shift(pieces, dr, dc)
+
+
+def _slides(
+    pieces: np.ndarray, directions: list[tuple[int, int]], blockers: np.ndarray
+) -> Iterator[np.ndarray]:
+    # Each yielded array is one step along one direction; a ray stops on the first
+    # occupied square (which it still reaches), so rays never overlap within a step
+    for dr, dc in directions:
+        frontier = pieces
+        for _ in range(BOARD_SIZE - 1):
+            frontier = _shift(frontier, dr, dc)
+            if not frontier.any():
+                break
+            yield frontier
+            frontier = frontier & ~blockers
+
+
+def _non_king_steps(side: _Side, occupied: np.ndarray) -> Iterator[np.ndarray]:
+    """Capturing move patterns of everything except pawns and the king."""
+    yield from _leaps(side.knight_leapers, KNIGHT_MOVES)
+    yield from _leaps(side.royal_guard, KING_MOVES)
+    yield from _leaps(side.longhorn, LONGHORN_MOVES)
+    yield from _leaps(side.pegasus, PEGASUS_MOVES)
+    yield from _leaps(side.kitty_castle, DIAGONALS)
+    yield from _leaps(side.sidestepper, HORIZONTALS)
+    yield from _slides(side.orthogonal, ORTHOGONALS, occupied)
+    yield from _slides(side.diagonal, DIAGONALS, occupied)
+
+
+def _king_steps(side: _Side) -> Iterator[np.ndarray]:
+    """Capturing move patterns of the king."""
+    yield from _leaps(side.king, KING_MOVES)
+    yield from _leaps(side.aggression, AGGRESSION_MOVES)
+    yield from _leaps(side.aggression, KNIGHT_MOVES)
+
+
+def _pawn_attacks(side: _Side) -> Iterator[np.ndarray]:
+    direction = PAWN_DIRECTIONS[side.color]
+    for dc in (-1, 1):
+        yield _shift(side.pawn, direction, dc)
+
+
+def _attack_map(side: _Side, occupied: np.ndarray) -> np.ndarray:
+    """Squares the side could capture on, including ones its own pieces occupy."""
+    attacked = np.zeros_like(occupied)
+    for steps in (
+        _non_king_steps(side, occupied),
+        _king_steps(side),
+        _pawn_attacks(side),
+    ):
+        for step in steps:
+            attacked |= step
+    return attacked
+
+
+def _count_steps(steps: Iterator[np.ndarray], own: np.ndarray) -> np.ndarray:
+    total = np.zeros(own.shape[0], np.int32)
+    for step in steps:
+        total += (step & ~own).sum(axis=(1, 2))
+    return total
+
+
+def _row_mask(row: int) -> np.ndarray:
+    mask = np.zeros((BOARD_SIZE, BOARD_SIZE), bool)
+    mask[row] = True
+    return mask
+
+
+def _row_count(squares: np.ndarray, row: int) -> np.ndarray:
+    return squares[:, row].sum(axis=1)
+
+
+def _pawn_move_count(
+    side: _Side, empty: np.ndarray, enemy_occupied: np.ndarray
+) -> np.ndarray:
+    """Pawn moves, counting each promotion square once per promotion piece."""
+    color = side.color
+    direction = PAWN_DIRECTIONS[color]
+    promotion = _row_mask(PAWN_PROMOTION_ROWS[color])
+    start = _row_mask(PAWN_START_ROWS[color])
+
+    def count(targets: np.ndarray) -> np.ndarray:
+        return targets.sum(axis=(1, 2)) + 3 * (targets & promotion).sum(axis=(1, 2))
+
+    one_step = _shift(side.pawn, direction, 0) & empty
+    from_start = _shift(side.pawn & start, direction, 0) & empty
+    two_steps = _shift(from_start, direction, 0) & empty
+    leaper_start = _shift(side.long_leaper & start, direction, 0) & empty
+    three_steps = _shift(leaper_start, 2 * direction, 0) & empty
+    backwards = _shift(side.reverse, -direction, 0) & empty
+
+    total = count(one_step) + two_steps.sum(axis=(1, 2))
+    total += three_steps.sum(axis=(1, 2)) + backwards.sum(axis=(1, 2))
+    for dc in (-1, 1):
+        total += count(_shift(side.pawn, direction, dc) & enemy_occupied)
+        total += count(_shift(side.kitty, direction, dc) & empty)
+    return total
+
+
+def _special_move_count(side: _Side, empty: np.ndarray) -> np.ndarray:
+    """Corner Hop and Infiltration moves, which only land on empty squares."""
+    empty_corners = sum(empty[:, row, col].astype(np.int32) for row, col in CORNERS)
+    total = side.corner_hop.sum(axis=(1, 2)) * empty_corners
+    total += side.infiltration.sum(axis=(1, 2)) * _row_count(
+        empty, side.infiltration_row
+    )
+    return total
+
+
+def _reach_map(side: _Side, occupied: np.ndarray, enemy: _Side) -> np.ndarray:
+    """
+    Squares the side has any move to, ignoring check. This is what the board uses
+    to decide whether castling passes through an attacked square.
+    """
+    empty = ~occupied
+    captures = np.zeros_like(occupied)
+    for steps in (_non_king_steps(side, occupied), _king_steps(side)):
+        for step in steps:
+            captures |= step
+
+    # Moves that may only land on an empty square
+    quiet = np.zeros_like(occupied)
+    direction = PAWN_DIRECTIONS[side.color]
+    start = _row_mask(PAWN_START_ROWS[side.color])
+    quiet |= _shift(side.pawn, direction, 0)
+    quiet |= _shift(_shift(side.pawn & start, direction, 0) & empty, direction, 0)
+    leaper_start = _shift(side.long_leaper & start, direction, 0) & empty
+    quiet |= _shift(leaper_start, 2 * direction, 0)
+    quiet |= _shift(side.reverse, -direction, 0)
+    for dc in (-1, 1):
+        captures |= _shift(side.pawn, direction, dc) & enemy.occupied
+        quiet |= _shift(side.kitty, direction, dc)
+
+    has_corner_hop = side.corner_hop.any(axis=(1, 2))
+    for row, col in CORNERS:
+        quiet[:, row, col] |= has_corner_hop
+    quiet[:, side.infiltration_row] |= side.infiltration.any(axis=(1, 2))[:, None]
+    quiet[:, side.escape_row] |= side.escape_hatch.any(axis=(1, 2))[:, None]
+    return (captures & ~side.occupied) | (quiet & empty)
+
+
+def _legal_move_count(
+    side: _Side,
+    enemy: _Side,
+    occupied: np.ndarray,
+    castling: np.ndarray,
+    color: str,
+) -> np.ndarray:
+    """
+    Legal moves for a side that is not in check and has no pinned pieces: every
+    non-king move is legal, and king moves only need to avoid attacked squares.
+    """
+    empty = ~occupied
+    total = _count_steps(_non_king_steps(side, occupied), side.occupied)
+    total += _pawn_move_count(side, empty, enemy.occupied)
+    total += _special_move_count(side, empty)
+
+    # The king no longer blocks rays once it moves off its square
+    attacked = _attack_map(enemy, occupied & ~side.king)
+    safe = ~side.occupied & ~attacked
+    total += _count_steps(_king_steps(side), ~safe)
+    escape_squares = empty & ~attacked
+    total += side.escape_hatch.sum(axis=(1, 2)) * _row_count(
+        escape_squares, side.escape_row
+    )
+
+    reach = _reach_map(enemy, occupied, side)
+    home_row = HOME_ROWS[color]
+    kingside, queenside = CASTLING_COLUMNS[color]
+    for column, empty_cols, passed_cols, landing_col in (
+        (kingside, (5, 6), (4, 5, 6), 6),
+        (queenside, (1, 2, 3), (4, 3, 2), 2),
+    ):
+        allowed = castling[:, column].copy()
+        for col in empty_cols:
+            allowed &= empty[:, home_row, col]
+        for col in passed_cols:
+            allowed &= ~reach[:, home_row, col]
+        allowed &= ~attacked[:, home_row, landing_col]
+        total += allowed
+    return total
+
+
+def _has_pin(side: _Side, enemy: _Side, occupied: np.ndarray) -> np.ndarray:
+    """Whether any of the side's pieces shields its king from an enemy slider."""
+    count = occupied.shape[0]
+    pinned = np.zeros(count, bool)
+    for directions, sliders in (
+        (ORTHOGONALS, enemy.orthogonal),
+        (DIAGONALS, enemy.diagonal),
+    ):
+        for dr, dc in directions:
+            frontier = side.king
+            shielded = np.zeros(count, bool)
+            for _ in range(BOARD_SIZE - 1):
+                frontier = _shift(frontier, dr, dc)
+                if not frontier.any():
+                    break
+                hit_any = (frontier & occupied).any(axis=(1, 2))
+                hit_own = (frontier & side.occupied).any(axis=(1, 2))
+                pinned |= shielded & (frontier & sliders).any(axis=(1, 2))
+                # Keep walking through empty squares and past the first own piece
+                keep = ~hit_any | (hit_own & ~shielded)
+                shielded |= hit_own
+                frontier = frontier & keep[:, None, None]
+    return pinned
+
+
+def legal_move_counts(
+    boards: Sequence[Board], turns: Sequence[str]
+) -> np.ndarray:
+    """Convenience wrapper returning just the legal-move count of each board."""
+    return evaluate_batch(BatchBoards.from_boards(boards, turns)).legal_moves
+
@@ -0,0 +1,231 @@
+"""
+Opening book built from PGN games and read through mmap.
+
+The builder splits each PGN file into byte ranges, replays the games in those
+ranges with the rules engine in worker processes, and counts how often each
+move was played from each position (by Zobrist key) and how those games ended.
+The book file is a header followed by fixed-size entries sorted by key, so a
+lookup is a binary search over the mapping with no parsing:
+
+    python -m app.engine.book tests/pgn/*.pgn --output opening_book.cgob
+"""
+
+import argparse
+import logging
+import mmap
+import os
+import random
+import struct
+from collections import defaultdict
+from multiprocessing import Pool
+from typing import Optional
+
+from app.engine.pgn import RESULTS, read_games, resolve_san, split_file
+from app.engine.zobrist import position_key
+from app.obj.board import Board
+from app.obj.constants import BOARD_SIZE
+from app.obj.position import Position
+
+MAGIC = b"CGOB"
+VERSION = 1
+HEADER = struct.Struct("<4sBI")
+# key, from square, to square, promotion, then games, white wins, draws, black wins
+ENTRY = struct.Struct("<QBBBxIIII")
+
+PROMOTIONS = [None, "queen", "rook", "bishop", "knight"]
+
+
+class BookMove:
+    """A move stored in the book, with how the games that played it ended."""
+
+    def __init__(
+        self,
+        position_from: Position,
+        position_to: Position,
+        promote_to: Optional[str],
+        games: int,
+        white_wins: int,
+        draws: int,
+        black_wins: int,
+    ):
+        self.position_from = position_from
+        self.position_to = position_to
+        self.promote_to = promote_to
+        self.games = games
+        self.white_wins = white_wins
+        self.draws = draws
+        self.black_wins = black_wins
+
+    def to_dict(self) -> dict:
+        return {
+            "from": self.position_from.to_dict(),
+            "to": self.position_to.to_dict(),
+            "promote_to": self.promote_to,
+            "games": self.games,
+            "white_wins": self.white_wins,
+            "draws": self.draws,
+            "black_wins": self.black_wins,
+        }
+
+
+class OpeningBook:
+    """A memory-mapped book file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.entry_count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} opening book")
+
+    def _key_at(self, index: int) -> int:
+        return struct.unpack_from("<Q", self._map, HEADER.size + index * ENTRY.size)[0]
+
+    def lookup(self, board: Board, turn: str) -> list[BookMove]:
+        """Book moves for a position, most played first."""
+        key = position_key(board, turn)
+
+        # Find the first entry with this key
+        low, high = 0, self.entry_count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key_at(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        moves = []
+        index = low
+        while index < self.entry_count:
+            entry_key, from_square, to_square, promotion, *counts = ENTRY.unpack_from(
+                self._map, HEADER.size + index * ENTRY.size
+            )
+            if entry_key != key:
+                break
+            moves.append(
+                BookMove(
+                    Position(*divmod(from_square, BOARD_SIZE)),
+                    Position(*divmod(to_square, BOARD_SIZE)),
+                    PROMOTIONS[promotion],
+                    *counts,
+                )
+            )
+            index += 1
+        return moves
+
+    def choose(
+        self, board: Board, turn: str, rng: Optional[random.Random] = None
+    ) -> Optional[BookMove]:
+        """Pick a book move at random, weighted by how often it was played."""
+        moves = self.lookup(board, turn)
+        if not moves:
+            return None
+        rng = rng or random
+        return rng.choices(moves, weights=[move.games for move in moves])[0]
+
+    def close(self) -> None:
+        self._map.close()
+
+
+def _count_range(task: tuple[str, int, int, int]) -> tuple[dict, int, int]:
+    """Replay the games in one byte range. Returns the move counts, games and errors."""
+    path, start, end, max_plies = task
+    counts: dict[tuple, list[int]] = defaultdict(lambda: [0, 0, 0, 0])
+    games = errors = 0
+
+    for game in read_games(path, start, end):
+        winner = RESULTS.get(game.get("Result"))
+        if winner is None:
+            continue
+        outcome = {"white": 1, "draw": 2, "black": 3}[winner]
+
+        board = Board()
+        turn = "white"
+        try:
+            for san in game["moves"][:max_plies]:
+                move = resolve_san(board, turn, san)
+                promotion = PROMOTIONS.index(move.promote_to_type)
+                entry = counts[
+                    (
+                        position_key(board, turn),
+                        move.position_from.row * BOARD_SIZE + move.position_from.col,
+                        move.position_to.row * BOARD_SIZE + move.position_to.col,
+                        promotion,
+                    )
+                ]
+                entry[0] += 1
+                entry[outcome] += 1
+                board.apply_move(move)
+                turn = "black" if turn == "white" else "white"
+            games += 1
+        except ValueError as e:
+            # Keep the moves before the bad token, they were replayed correctly
+            logging.debug(f"Skipping rest of game in {path}: {e}")
+            errors += 1
+
+    return dict(counts), games, errors
+
+
+def build(
+    paths: list[str],
+    output: str,
+    max_plies: int = 24,
+    min_games: int = 2,
+    workers: Optional[int] = None,
+) -> int:
+    """Build a book from PGN files and return the number of entries written."""
+    workers = workers or os.cpu_count() or 1
+    tasks = [
+        (path, start, end, max_plies)
+        for path in paths
+        for start, end in split_file(path, workers * 4)
+    ]
+    with Pool(workers) as pool:
+        counts: dict[tuple, list[int]] = defaultdict(lambda: [0, 0, 0, 0])
+        games = errors = 0
+        for part, part_games, part_errors in pool.imap_unordered(_count_range, tasks):
+            for entry_key, values in part.items():
+                totals = counts[entry_key]
+                for index, value in enumerate(values):
+                    totals[index] += value
+            games += part_games
+            errors += part_errors
+
+    entries = sorted(
+        (
+            (entry_key, values)
+            for entry_key, values in counts.items()
+            if values[0] >= min_games
+        ),
+        key=lambda item: (item[0][0], -item[1][0], item[0][1:]),
+    )
+    with open(output, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, len(entries)))
+        for entry_key, values in entries:
+            file.write(ENTRY.pack(*entry_key, *values))
+
+    logging.info(
+        f"Wrote {len(entries)} book entries from {games} games "
+        f"({errors} games stopped early on unreadable moves)"
+    )
+    return len(entries)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("pgn", nargs="+", help="PGN files to read")
+    parser.add_argument("--output", default="opening_book.cgob", help="Book file")
+    parser.add_argument("--plies", type=int, default=24, help="Plies per game to count")
+    parser.add_argument(
+        "--min-games", type=int, default=2, help="Drop moves played fewer times"
+    )
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    build(args.pgn, args.output, args.plies, args.min_games, args.workers)
+
+
+if __name__ == "__main__":
+    main()
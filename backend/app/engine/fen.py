@@ -0,0 +1,242 @@
+"""
+FEN with piece modifiers.
+
+The board field is standard FEN, except that a piece letter may be followed by
+its modifiers in brackets, with an optional count of remaining uses for
+limited-use modifiers:
+
+    r[Quook]nbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RN[Royal Guard]BQK[Escape Hatch:1]BNR w KQkq - 0 1
+
+The remaining fields (side to move, castling, en passant, clocks) are read as
+usual; the two clocks are optional.
+"""
+
+import re
+from typing import Optional
+
+from app.obj.board import Board
+from app.obj.chess_move import ChessMove
+from app.obj.constants import BOARD_SIZE, PAWN_DIRECTIONS, PAWN_START_ROWS
+from app.obj.modifier import MODIFIERS_BY_TYPE
+from app.obj.pieces import PIECE_CLASSES, Piece
+from app.obj.position import Position, position_from_notation
+
+PIECE_LETTERS = {
+    "p": "pawn",
+    "n": "knight",
+    "b": "bishop",
+    "r": "rook",
+    "q": "queen",
+    "k": "king",
+}
+LETTERS_BY_TYPE = {piece_type: letter for letter, piece_type in PIECE_LETTERS.items()}
+CASTLING_ROOKS = {"K": (7, 7), "Q": (7, 0), "k": (0, 7), "q": (0, 0)}
+HOME_ROWS = {"white": 7, "black": 0}
+
+_BOARD_FIELD_PATTERN = re.compile(r"^((?:[^\s\[]|\[[^\]]*\])+)\s+(\S.*)$")
+_TOKEN_PATTERN = re.compile(r"([pnbrqkPNBRQK])(?:\[([^\]]*)\])?|([1-8])")
+
+
+class FENError(ValueError):
+    """Raised for positions that cannot be read."""
+
+
+def board_from_fen(fen: str) -> tuple[Board, str]:
+    """Set up a board from a (modifier-extended) FEN string. Returns the board and turn."""
+    # Modifier names contain spaces, so the board field ends at the first space
+    # outside brackets
+    match = _BOARD_FIELD_PATTERN.match(fen.strip())
+    if not match:
+        raise FENError("FEN needs at least a board and a side to move")
+    placement = match.group(1)
+    fields = match.group(2).split()
+    active = fields[0]
+    castling = fields[1] if len(fields) > 1 else "-"
+    en_passant = fields[2] if len(fields) > 2 else "-"
+
+    if active not in ("w", "b"):
+        raise FENError(f"Unknown side to move {active!r}")
+    turn = "white" if active == "w" else "black"
+
+    rows = placement.split("/")
+    if len(rows) != BOARD_SIZE:
+        raise FENError("FEN board must have 8 ranks")
+
+    board = Board.empty()
+    for row, rank in enumerate(rows):
+        col = 0
+        position = 0
+        while position < len(rank):
+            match = _TOKEN_PATTERN.match(rank, position)
+            if not match:
+                raise FENError(f"Unreadable rank {rank!r}")
+            position = match.end()
+            letter, modifiers, empty = match.groups()
+            if empty:
+                col += int(empty)
+                continue
+            if col >= BOARD_SIZE:
+                raise FENError(f"Rank {rank!r} has more than 8 squares")
+            color = "white" if letter.isupper() else "black"
+            piece = PIECE_CLASSES[PIECE_LETTERS[letter.lower()]](color)
+            if modifiers:
+                _add_modifiers(piece, modifiers)
+            board.place_piece(piece, Position(row, col))
+            col += 1
+        if col != BOARD_SIZE:
+            raise FENError(f"Rank {rank!r} does not have 8 squares")
+
+    for color in ("white", "black"):
+        kings = [p for p in board.pieces if p.type == "king" and p.color == color]
+        if len(kings) != 1:
+            raise FENError(f"Position needs exactly one {color} king")
+
+    _apply_castling_rights(board, castling)
+    _apply_en_passant(board, en_passant, turn)
+    return board, turn
+
+
+def board_to_fen(board: Board, turn: str) -> str:
+    """Write a board as a (modifier-extended) FEN string."""
+    ranks = []
+    for row in range(BOARD_SIZE):
+        rank = ""
+        empty = 0
+        for col in range(BOARD_SIZE):
+            piece = board.squares[row][col]
+            if piece is None:
+                empty += 1
+                continue
+            if empty:
+                rank += str(empty)
+                empty = 0
+            letter = LETTERS_BY_TYPE[piece.get_acting_type()]
+            rank += letter.upper() if piece.color == "white" else letter
+            if piece.modifiers:
+                rank += "[" + ",".join(
+                    _modifier_token(piece, m) for m in piece.modifiers
+                )
+                rank += "]"
+        if empty:
+            rank += str(empty)
+        ranks.append(rank)
+
+    castling = "".join(
+        flag
+        for flag, (row, col) in CASTLING_ROOKS.items()
+        if _can_castle(board, row, col)
+    )
+    en_passant = "-"
+    if board.last_move and board._is_en_passant_opportunity():
+        to = board.last_move.position_to
+        color = board.piece_from_position(to).color
+        en_passant = Position(to.row - PAWN_DIRECTIONS[color], to.col).notation()
+
+    return " ".join(
+        [
+            "/".join(ranks),
+            "w" if turn == "white" else "b",
+            castling or "-",
+            en_passant,
+            "0",
+            "1",
+        ]
+    )
+
+
+def normalize_fen(fen: str) -> str:
+    """Canonical form of a FEN string, for use as a cache key."""
+    board, turn = board_from_fen(fen)
+    return board_to_fen(board, turn)
+
+
+def _add_modifiers(piece: Piece, modifiers: str) -> None:
+    for token in modifiers.split(","):
+        name, _, uses = token.strip().partition(":")
+        modifier = MODIFIERS_BY_TYPE.get(name)
+        if modifier is None:
+            raise FENError(f"Unknown modifier {name!r}")
+        if not piece.add_modifier(modifier):
+            raise FENError(f"{name!r} cannot be applied to a {piece.type}")
+        if uses:
+            if not modifier.uses or not uses.isdigit() or int(uses) > modifier.uses:
+                raise FENError(f"Invalid remaining uses for {name!r}")
+            piece.modifier_uses_remaining[name] = int(uses)
+
+
+def _modifier_token(piece: Piece, modifier) -> str:
+    if modifier.uses:
+        remaining = piece.get_modifier_uses_remaining(modifier.modifier_type)
+        return f"{modifier.modifier_type}:{remaining}"
+    return modifier.modifier_type
+
+
+def _apply_castling_rights(board: Board, castling: str) -> None:
+    """Mark pieces as moved unless FEN says they still have castling rights."""
+    unmoved = set()
+    for flag in castling.replace("-", ""):
+        if flag not in CASTLING_ROOKS:
+            raise FENError(f"Unknown castling flag {flag!r}")
+        row, col = CASTLING_ROOKS[flag]
+        if not (
+            _is_piece(board, row, col, "rook") and _is_piece(board, row, 4, "king")
+        ):
+            raise FENError(f"Castling flag {flag!r} has no king and rook to match")
+        unmoved.update([(row, col), (row, 4)])
+
+    for piece in board.pieces:
+        row, col = piece.position.coordinates()
+        if piece.type == "pawn":
+            if row != PAWN_START_ROWS[piece.color]:
+                piece.mark_moved()
+        elif (row, col) not in unmoved:
+            piece.mark_moved()
+
+
+def _apply_en_passant(board: Board, en_passant: str, turn: str) -> None:
+    """Recreate the double pawn push that allows an en passant capture."""
+    if en_passant == "-":
+        return
+    try:
+        target = position_from_notation(en_passant)
+    except (ValueError, IndexError):
+        raise FENError(f"Invalid en passant square {en_passant!r}")
+
+    mover = "black" if turn == "white" else "white"
+    direction = PAWN_DIRECTIONS[mover]
+    start = Position(target.row - direction, target.col)
+    end = Position(target.row + direction, target.col)
+    if not (
+        0 <= start.row < BOARD_SIZE
+        and 0 <= end.row < BOARD_SIZE
+        and start.row == PAWN_START_ROWS[mover]
+        and _is_piece(board, end.row, end.col, "pawn", mover)
+    ):
+        raise FENError(f"En passant square {en_passant!r} does not match the board")
+    board.last_move = ChessMove(start, end)
+
+
+def _is_piece(
+    board: Board, row: int, col: int, piece_type: str, color: Optional[str] = None
+) -> bool:
+    piece = board.squares[row][col]
+    if piece is None or piece.type != piece_type:
+        return False
+    if color is None:
+        return piece.color == ("white" if row == HOME_ROWS["white"] else "black")
+    return piece.color == color
+
+
+def _can_castle(board: Board, row: int, col: int) -> bool:
+    rook = board.squares[row][col]
+    king = board.squares[row][4]
+    return (
+        rook is not None
+        and king is not None
+        and rook.type == "rook"
+        and king.type == "king"
+        and rook.color == king.color
+        and rook.color == ("white" if row == HOME_ROWS["white"] else "black")
+        and not rook.moved
+        and not king.moved
+    )
@@ -0,0 +1,126 @@
+"""
+Streaming PGN reading and SAN move resolution against the rules engine.
+"""
+
+import os
+import re
+from typing import Generator, Optional
+
+from app.obj.board import Board
+from app.obj.chess_move import ChessMove
+from app.obj.position import position_from_notation
+
+RESULTS = {"1-0": "white", "0-1": "black", "1/2-1/2": "draw"}
+PROMOTION_LETTERS = {"Q": "queen", "R": "rook", "B": "bishop", "N": "knight"}
+PIECE_LETTERS = {"K": "king", **PROMOTION_LETTERS}
+
+_TAG_PATTERN = re.compile(r'\[(\w+)\s+"([^"]*)"\]')
+_SAN_PATTERN = re.compile(
+    r"^(?P<piece>[KQRBN])?(?P<file>[a-h])?(?P<rank>[1-8])?x?"
+    r"(?P<to>[a-h][1-8])(?:=?(?P<promotion>[QRBN]))?$"
+)
+
+
+def clean_moves(moves_text: str) -> list[str]:
+    """Strip move numbers, comments, variations, annotations and results."""
+    moves_text = re.sub(r"\{[^}]*\}", " ", moves_text)
+    moves_text = re.sub(r"\([^)]*\)", " ", moves_text)
+    moves_text = re.sub(r"\$\d+", " ", moves_text)
+    moves_text = re.sub(r"\d+\.+", " ", moves_text)
+    moves_text = re.sub(r"[!?]+", "", moves_text)
+    return [
+        token for token in moves_text.split() if token not in RESULTS and token != "*"
+    ]
+
+
+def split_file(path: str, parts: int) -> list[tuple[int, int]]:
+    """Split a file into roughly equal byte ranges for separate readers."""
+    size = os.path.getsize(path)
+    step = max(1, size // max(1, parts))
+    return [(start, min(start + step, size)) for start in range(0, size, step)]
+
+
+def read_games(
+    path: str, start: int = 0, end: Optional[int] = None
+) -> Generator[dict, None, None]:
+    """
+    Yield games whose [Event tag starts inside [start, end) of the file, as dicts of
+    tags plus a "moves" list. Ranges from split_file cover every game exactly once.
+    """
+    with open(path, "rb") as file:
+        if start:
+            # Finish the line running into the range, it belongs to the previous one
+            file.seek(start - 1)
+            file.readline()
+
+        game: dict = {}
+        moves: list[str] = []
+        while True:
+            line_start = file.tell()
+            raw = file.readline()
+            if not raw:
+                break
+            line = raw.decode("utf-8", errors="replace").strip()
+
+            if line.startswith("[Event"):
+                if game:
+                    game["moves"] = clean_moves(" ".join(moves))
+                    yield game
+                if end is not None and line_start >= end:
+                    return
+                game, moves = {}, []
+
+            if not game and not line.startswith("[Event"):
+                continue  # Skip the tail of a game that started in an earlier range
+
+            match = _TAG_PATTERN.match(line)
+            if match:
+                game[match.group(1)] = match.group(2)
+            elif line:
+                moves.append(line)
+
+        if game:
+            game["moves"] = clean_moves(" ".join(moves))
+            yield game
+
+
+def resolve_san(board: Board, turn: str, san: str) -> ChessMove:
+    """Find the legal move that a SAN token describes."""
+    san = san.rstrip("+#")
+    moves = board.get_available_moves_for_color(turn)
+
+    if san in ("O-O", "O-O-O", "0-0", "0-0-0"):
+        target_col = 6 if len(san) == 3 else 2
+        candidates = [
+            move
+            for move in moves
+            if board.piece_from_position(move.position_from).type == "king"
+            and move.position_to.col == target_col
+            and abs(move.position_to.col - move.position_from.col) == 2
+        ]
+    else:
+        match = _SAN_PATTERN.match(san)
+        if not match:
+            raise ValueError(f"Unreadable SAN move {san!r}")
+        piece_type = PIECE_LETTERS.get(match.group("piece"), "pawn")
+        to = position_from_notation(match.group("to"))
+        file_hint = match.group("file")
+        rank_hint = match.group("rank")
+        promotion = PROMOTION_LETTERS.get(match.group("promotion"))
+
+        candidates = []
+        for move in moves:
+            piece = board.piece_from_position(move.position_from)
+            notation = move.position_from.notation()
+            if (
+                piece.get_acting_type() == piece_type
+                and move.position_to.coordinates() == to.coordinates()
+                and (file_hint is None or notation[0] == file_hint)
+                and (rank_hint is None or notation[1] == rank_hint)
+                and move.promote_to_type == promotion
+            ):
+                candidates.append(move)
+
+    if len(candidates) != 1:
+        raise ValueError(f"SAN move {san!r} matches {len(candidates)} legal moves")
+    return candidates[0]
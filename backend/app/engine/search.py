@@ -0,0 +1,313 @@
+"""
+Alpha-beta search over the rules engine, used for analysis and by the bots.
+
+The search is a plain iterative-deepening negamax with a transposition table
+and a capture-only quiescence search. Evaluation is material, counting the
+score of every modifier that still has uses left, so a Quook is worth more
+than a plain rook in exactly the way loadout costs say it is.
+"""
+
+import time
+from typing import Optional
+
+from app.engine.fen import board_from_fen, board_to_fen
+from app.engine.zobrist import position_key
+from app.obj.board import Board
+from app.obj.chess_move import ChessMove
+from app.obj.pieces import Piece
+
+MATE_SCORE = 100_000
+PAWN_SCORE = 100
+MAX_DEPTH = 64
+QUIESCENCE_DEPTH = 4
+
+# Transposition table entry kinds
+_EXACT, _LOWER, _UPPER = range(3)
+
+
+class SearchTimeout(Exception):
+    """Raised inside the search when the time limit runs out."""
+
+
+class SearchResult:
+    """Outcome of a search, with the score from the side to move's point of view."""
+
+    def __init__(
+        self,
+        best_move: Optional[ChessMove],
+        score: int,
+        depth: int,
+        nodes: int,
+        pv: list[ChessMove],
+        elapsed: float,
+    ):
+        self.best_move = best_move
+        self.score = score
+        self.depth = depth
+        self.nodes = nodes
+        self.pv = pv
+        self.elapsed = elapsed
+
+    @property
+    def mate_in(self) -> Optional[int]:
+        """Moves until mate (negative when being mated), or None."""
+        if abs(self.score) < MATE_SCORE - MAX_DEPTH * 2:
+            return None
+        plies = MATE_SCORE - abs(self.score)
+        moves = (plies + 1) // 2
+        return moves if self.score > 0 else -moves
+
+    def to_dict(self, turn: str) -> dict:
+        # Scores are reported from white's point of view, like most engines do
+        sign = 1 if turn == "white" else -1
+        mate_in = self.mate_in
+        return {
+            "best_move": move_to_uci(self.best_move) if self.best_move else None,
+            "score": sign * self.score if mate_in is None else None,
+            "mate": sign * mate_in if mate_in is not None else None,
+            "pv": [move_to_uci(move) for move in self.pv],
+            "depth": self.depth,
+            "nodes": self.nodes,
+            "time_ms": int(self.elapsed * 1000),
+        }
+
+
+def move_to_uci(move: ChessMove) -> str:
+    """Write a move as from and to squares plus promotion letter, e.g. "e7e8q"."""
+    promotion = ""
+    if move.promote_to_type:
+        promotion = "n" if move.promote_to_type == "knight" else move.promote_to_type[0]
+    return move.position_from.notation() + move.position_to.notation() + promotion
+
+
+def piece_score(piece: Piece) -> int:
+    """Centipawn value of a piece and its usable modifiers."""
+    score = piece.get_base_value()
+    for modifier in piece.modifiers:
+        if modifier.uses and not piece.get_modifier_uses_remaining(
+            modifier.modifier_type
+        ):
+            continue
+        score += modifier.score
+    return score * PAWN_SCORE
+
+
+def evaluate(board: Board, turn: str) -> int:
+    """Material balance from the side to move's point of view."""
+    score = 0
+    for piece in board.pieces:
+        value = piece_score(piece)
+        score += value if piece.color == turn else -value
+    return score
+
+
+class Searcher:
+    """Holds the transposition table and counters for one search."""
+
+    def __init__(self, deadline: Optional[float] = None):
+        self.deadline = deadline
+        self.nodes = 0
+        self.table: dict[int, tuple[int, int, int, Optional[ChessMove]]] = {}
+
+    def search(
+        self, board: Board, turn: str, depth: Optional[int] = None
+    ) -> SearchResult:
+        """Search to the given depth, or as deep as the deadline allows."""
+        started = time.time()
+        max_depth = depth or MAX_DEPTH
+        result = SearchResult(None, 0, 0, 0, [], 0.0)
+
+        for current in range(1, max_depth + 1):
+            try:
+                score = self._negamax(board, turn, current, -MATE_SCORE, MATE_SCORE, 0)
+            except SearchTimeout:
+                break
+            pv = self._principal_variation(board, turn, current)
+            result = SearchResult(
+                pv[0] if pv else None,
+                score,
+                current,
+                self.nodes,
+                pv,
+                time.time() - started,
+            )
+            if result.mate_in is not None or not pv:
+                break
+
+        if result.best_move is None:
+            # Not even depth one finished in time, fall back to any legal move
+            moves = board.get_available_moves_for_color(turn)
+            if moves:
+                result.best_move = moves[0]
+                result.pv = [moves[0]]
+        result.nodes = self.nodes
+        result.elapsed = time.time() - started
+        return result
+
+    def _check_time(self) -> None:
+        self.nodes += 1
+        if self.deadline and self.nodes % 64 == 0 and time.time() > self.deadline:
+            raise SearchTimeout()
+
+    def _negamax(
+        self, board: Board, turn: str, depth: int, alpha: int, beta: int, ply: int
+    ) -> int:
+        self._check_time()
+        if depth <= 0:
+            return self._quiesce(board, turn, alpha, beta, QUIESCENCE_DEPTH)
+
+        key = position_key(board, turn)
+        entry = self.table.get(key)
+        hash_move = None
+        if entry:
+            entry_depth, entry_score, kind, hash_move = entry
+            if entry_depth >= depth:
+                if kind == _EXACT:
+                    return entry_score
+                if kind == _LOWER and entry_score >= beta:
+                    return entry_score
+                if kind == _UPPER and entry_score <= alpha:
+                    return entry_score
+
+        original_alpha = alpha
+        best_score = -MATE_SCORE
+        best_move = None
+        legal_moves = 0
+        opponent = "black" if turn == "white" else "white"
+
+        for move in _ordered_moves(board, turn, hash_move):
+            child = _play(board, move, turn)
+            if child is None:
+                continue
+            legal_moves += 1
+            score = -self._negamax(child, opponent, depth - 1, -beta, -alpha, ply + 1)
+            if score > best_score:
+                best_score = score
+                best_move = move
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                break
+
+        if not legal_moves:
+            return -(MATE_SCORE - ply) if board.is_king_in_check(turn) else 0
+
+        if best_score <= original_alpha:
+            kind = _UPPER
+        elif best_score >= beta:
+            kind = _LOWER
+        else:
+            kind = _EXACT
+        self.table[key] = (depth, best_score, kind, best_move)
+        return best_score
+
+    def _quiesce(
+        self, board: Board, turn: str, alpha: int, beta: int, depth: int
+    ) -> int:
+        self._check_time()
+        stand_pat = evaluate(board, turn)
+        if stand_pat >= beta or depth == 0:
+            return stand_pat
+        alpha = max(alpha, stand_pat)
+        opponent = "black" if turn == "white" else "white"
+
+        for move in _ordered_moves(board, turn, None, captures_only=True):
+            child = _play(board, move, turn)
+            if child is None:
+                continue
+            score = -self._quiesce(child, opponent, -beta, -alpha, depth - 1)
+            if score >= beta:
+                return score
+            alpha = max(alpha, score)
+        return alpha
+
+    def _principal_variation(
+        self, board: Board, turn: str, depth: int
+    ) -> list[ChessMove]:
+        """Follow best moves through the transposition table."""
+        pv = []
+        seen = set()
+        for _ in range(depth):
+            key = position_key(board, turn)
+            entry = self.table.get(key)
+            if not entry or entry[3] is None or key in seen:
+                break
+            seen.add(key)
+            move = entry[3]
+            board = _play(board, move, turn)
+            if board is None:
+                break
+            pv.append(move)
+            turn = "black" if turn == "white" else "white"
+        return pv
+
+
+def _play(board: Board, move: ChessMove, turn: str) -> Optional[Board]:
+    """Apply a pseudo-legal move to a copy of the board, or None if it is illegal."""
+    child = board.clone()
+    child.apply_move(move)
+    if child.is_king_in_check(turn):
+        return None
+    return child
+
+
+def _ordered_moves(
+    board: Board,
+    turn: str,
+    hash_move: Optional[ChessMove],
+    captures_only: bool = False,
+) -> list[ChessMove]:
+    """
+    Pseudo-legal moves, best candidates first: the stored best move, then
+    captures of the most valuable pieces, then promotions, then quiet moves.
+    Legality is checked when a move is played.
+    """
+    scored = []
+    for piece in list(board.pieces):
+        if piece.color != turn:
+            continue
+        for move in board.get_available_moves(piece.position, ignore_check=True):
+            victim = board.piece_from_position(move.position_to_capture)
+            if victim is None and not move.additional_move:
+                victim = board.piece_from_position(move.position_to)
+            if victim is not None and victim.color == turn:
+                victim = None
+            if captures_only and victim is None and not move.promote_to_type:
+                continue
+
+            order = 0
+            if victim is not None:
+                order = 10 * piece_score(victim) - piece_score(piece) // PAWN_SCORE
+            if move.promote_to_type == "queen":
+                order += 8 * PAWN_SCORE
+            if hash_move is not None and _same_move(move, hash_move):
+                order = MATE_SCORE
+            scored.append((order, move))
+
+    scored.sort(key=lambda item: item[0], reverse=True)
+    return [move for _, move in scored]
+
+
+def _same_move(first: ChessMove, second: ChessMove) -> bool:
+    return (
+        first.position_from.coordinates() == second.position_from.coordinates()
+        and first.position_to.coordinates() == second.position_to.coordinates()
+        and first.promote_to_type == second.promote_to_type
+    )
+
+
+def search(
+    board: Board,
+    turn: str,
+    depth: Optional[int] = None,
+    time_limit: Optional[float] = None,
+) -> SearchResult:
+    """Search a position to a depth and/or time limit (in seconds)."""
+    deadline = time.time() + time_limit if time_limit else None
+    return Searcher(deadline).search(board, turn, depth)
+
+
+def analyse_fen(fen: str, depth: Optional[int], time_limit: Optional[float]) -> dict:
+    """Analyse a FEN position. Module-level so it can run in a worker process."""
+    board, turn = board_from_fen(fen)
+    result = search(board, turn, depth, time_limit)
+    return {"fen": board_to_fen(board, turn), **result.to_dict(turn)}
@@ -0,0 +1,276 @@
+"""
+Bot-vs-bot self-play for measuring how strong modifiers really are.
+
+Each game gets its own random generator seeded from the run seed and the game
+number, which decides both loadouts and the random opening plies, and the bots
+search to a fixed depth, so a game's result does not depend on which worker
+played it or when. Results are appended to a JSON-lines file as games finish;
+running again with the same seed skips games already in the file.
+
+    python -m app.engine.selfplay run --games 2000 --seed 1 --output selfplay.jsonl
+    python -m app.engine.selfplay report selfplay.jsonl
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import random
+import time
+from multiprocessing import Pool
+from typing import Optional
+
+from app.engine.search import search
+from app.obj.board import Board
+from app.obj.modifier import ALL_MODIFIERS
+
+DEFAULT_DEPTH = 2
+DEFAULT_MAX_PLIES = 200
+DEFAULT_RANDOM_PLIES = 4
+DEFAULT_MODIFIER_CHANCE = 0.3
+SCORES = {"white": 1.0, "draw": 0.5, "black": 0.0}
+
+
+class SelfPlayConfig:
+    """Settings shared by every game in a run."""
+
+    def __init__(
+        self,
+        seed: int,
+        depth: int = DEFAULT_DEPTH,
+        max_plies: int = DEFAULT_MAX_PLIES,
+        random_plies: int = DEFAULT_RANDOM_PLIES,
+        modifier_chance: float = DEFAULT_MODIFIER_CHANCE,
+        excluded: Optional[list[str]] = None,
+    ):
+        self.seed = seed
+        self.depth = depth
+        self.max_plies = max_plies
+        self.random_plies = random_plies
+        self.modifier_chance = modifier_chance
+        self.excluded = excluded or []
+
+
+def sample_loadout(board: Board, color: str, config: SelfPlayConfig, rng) -> list:
+    """Give each piece of one color a random applicable modifier, or none."""
+    applied = []
+    for piece in board.pieces:
+        if piece.color != color or rng.random() >= config.modifier_chance:
+            continue
+        choices = [
+            modifier
+            for modifier in ALL_MODIFIERS
+            if modifier.modifier_type not in config.excluded
+            and piece.can_add_modifier(modifier)
+        ]
+        if choices:
+            modifier = rng.choice(choices)
+            piece.add_modifier(modifier)
+            applied.append(modifier.modifier_type)
+    return sorted(applied)
+
+
+def play_game(task: tuple[int, SelfPlayConfig]) -> dict:
+    """Play one game and return its result record."""
+    index, config = task
+    rng = random.Random(f"{config.seed}:{index}")
+    started = time.time()
+
+    board = Board()
+    white_modifiers = sample_loadout(board, "white", config, rng)
+    black_modifiers = sample_loadout(board, "black", config, rng)
+
+    turn = "white"
+    history: dict[str, int] = {}
+    winner, reason = "draw", "move_limit"
+    plies = 0
+    while plies < config.max_plies:
+        position_hash = board.get_position_hash(turn)
+        history[position_hash] = history.get(position_hash, 0) + 1
+        if history[position_hash] >= 3:
+            reason = "threefold_repetition"
+            break
+
+        moves = board.get_available_moves_for_color(turn)
+        if not moves:
+            if board.is_king_in_check(turn):
+                winner = "black" if turn == "white" else "white"
+                reason = "checkmate"
+            else:
+                reason = "stalemate"
+            break
+
+        if plies < config.random_plies:
+            move = rng.choice(moves)
+        else:
+            move = search(board, turn, depth=config.depth).best_move
+        board.apply_move(move)
+        turn = "black" if turn == "white" else "white"
+        plies += 1
+
+    return {
+        "seed": config.seed,
+        "game": index,
+        "white_modifiers": white_modifiers,
+        "black_modifiers": black_modifiers,
+        "winner": winner,
+        "reason": reason,
+        "plies": plies,
+        "seconds": round(time.time() - started, 3),
+    }
+
+
+def read_results(path: str, seed: Optional[int] = None) -> list[dict]:
+    """Read a results file, skipping a partly written last line."""
+    results = []
+    if not os.path.exists(path):
+        return results
+    with open(path) as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if seed is None or record.get("seed") == seed:
+                results.append(record)
+    return results
+
+
+def run(
+    config: SelfPlayConfig,
+    games: int,
+    output: str,
+    workers: Optional[int] = None,
+) -> int:
+    """Play games 0..games-1 that are not in the output file yet. Returns games played."""
+    done = {record["game"] for record in read_results(output, config.seed)}
+    tasks = [(index, config) for index in range(games) if index not in done]
+    if not tasks:
+        return 0
+
+    workers = workers or os.cpu_count() or 1
+    started = time.time()
+    played = 0
+    with open(output, "a") as file, Pool(workers) as pool:
+        if file.tell() and not _ends_with_newline(output):
+            file.write("\n")  # Close off a line cut short by an interrupted run
+        for record in pool.imap_unordered(play_game, tasks):
+            file.write(json.dumps(record) + "\n")
+            file.flush()
+            played += 1
+            if played % 10 == 0 or played == len(tasks):
+                logging.info(f"Played {played}/{len(tasks)} games")
+
+    elapsed = time.time() - started
+    logging.info(
+        f"Played {played} games in {elapsed:.0f}s on {workers} workers "
+        f"({played * 3600 / max(elapsed, 1e-9) / workers:.1f} games/hour/core)"
+    )
+    return played
+
+
+def _ends_with_newline(path: str) -> bool:
+    with open(path, "rb") as file:
+        file.seek(-1, os.SEEK_END)
+        return file.read(1) == b"\n"
+
+
+def _mean_and_variance(values: list[float]) -> tuple[float, float]:
+    mean = sum(values) / len(values)
+    if len(values) < 2:
+        return mean, 0.0
+    return mean, sum((v - mean) ** 2 for v in values) / (len(values) - 1)
+
+
+def report(results: list[dict], z: float = 1.96) -> dict:
+    """
+    Summarise results. For each modifier, the delta is the mean score of sides
+    that had it minus the mean score of sides that did not, with a normal
+    approximation confidence interval (z=1.96 for 95%).
+    """
+    # One sample per side per game: (modifiers, score for that side)
+    sides = []
+    for record in results:
+        white_score = SCORES[record["winner"]]
+        sides.append((set(record["white_modifiers"]), white_score))
+        sides.append((set(record["black_modifiers"]), 1.0 - white_score))
+
+    modifiers = {}
+    for modifier in ALL_MODIFIERS:
+        with_modifier = [
+            score for names, score in sides if modifier.modifier_type in names
+        ]
+        without = [
+            score for names, score in sides if modifier.modifier_type not in names
+        ]
+        if not with_modifier or not without:
+            continue
+        mean_with, var_with = _mean_and_variance(with_modifier)
+        mean_without, var_without = _mean_and_variance(without)
+        delta = mean_with - mean_without
+        margin = z * math.sqrt(
+            var_with / len(with_modifier) + var_without / len(without)
+        )
+        modifiers[modifier.modifier_type] = {
+            "score": modifier.score,
+            "sides": len(with_modifier),
+            "delta": round(delta, 4),
+            "low": round(delta - margin, 4),
+            "high": round(delta + margin, 4),
+        }
+
+    seconds = sum(record["seconds"] for record in results)
+    return {
+        "games": len(results),
+        "white_score": round(
+            sum(SCORES[record["winner"]] for record in results) / max(len(results), 1),
+            4,
+        ),
+        # Each game runs on a single core, so this is throughput per core
+        "games_per_hour_per_core": (
+            round(len(results) * 3600 / seconds, 1) if seconds else None
+        ),
+        "modifiers": modifiers,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Play games")
+    run_parser.add_argument("--games", type=int, required=True)
+    run_parser.add_argument("--seed", type=int, required=True)
+    run_parser.add_argument("--output", default="selfplay.jsonl")
+    run_parser.add_argument("--workers", type=int, default=None)
+    run_parser.add_argument("--depth", type=int, default=DEFAULT_DEPTH)
+    run_parser.add_argument("--max-plies", type=int, default=DEFAULT_MAX_PLIES)
+    run_parser.add_argument("--random-plies", type=int, default=DEFAULT_RANDOM_PLIES)
+    run_parser.add_argument(
+        "--modifier-chance", type=float, default=DEFAULT_MODIFIER_CHANCE
+    )
+    run_parser.add_argument("--exclude", nargs="*", default=None)
+
+    report_parser = commands.add_parser("report", help="Summarise a results file")
+    report_parser.add_argument("output")
+    report_parser.add_argument("--seed", type=int, default=None)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "run":
+        config = SelfPlayConfig(
+            args.seed,
+            args.depth,
+            args.max_plies,
+            args.random_plies,
+            args.modifier_chance,
+            args.exclude,
+        )
+        run(config, args.games, args.output, args.workers)
+    else:
+        print(json.dumps(report(read_results(args.output, args.seed)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
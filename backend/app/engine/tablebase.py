@@ -0,0 +1,589 @@
+"""
+Endgame tablebases for small material sets, generated by retrograde analysis.
+
+A material set is written like "KQvK" or "KR[Quook]vK": the white pieces, "v",
+then the black pieces, with an optional modifier in brackets after a piece.
+Each table stores one byte per (side to move, square of every piece) index:
+
+    0         draw
+    1-127     the side to move mates in that many plies
+    128-254   the side to move is mated in (value - 128) plies
+    255       not a legal position
+
+Tables are read through mmap, so probing never loads a file into memory.
+Generation walks every position with the normal board rules across all cores,
+then resolves distances to mate with vectorised retrograde iteration.
+
+    python -m app.engine.tablebase KQvK KRvK KPvK KBNvK --output tablebases
+"""
+
+import argparse
+import logging
+import mmap
+import os
+import re
+import struct
+from multiprocessing import Pool
+from typing import Optional
+
+import numpy as np
+
+from app.obj.board import Board
+from app.obj.chess_move import ChessMove
+from app.obj.constants import BOARD_SIZE, PAWN_PROMOTION_ROWS
+from app.obj.modifier import MODIFIERS_BY_TYPE
+from app.obj.pieces import PIECE_CLASSES, Piece
+from app.obj.position import Position
+
+MAGIC = b"CGTB"
+VERSION = 1
+HEADER = struct.Struct("<4sBH")
+FILE_SUFFIX = ".cgtb"
+
+DRAW = 0
+LOSS_OFFSET = 128
+ILLEGAL = 255
+
+PIECE_LETTERS = {
+    "K": "king",
+    "Q": "queen",
+    "R": "rook",
+    "B": "bishop",
+    "N": "knight",
+    "P": "pawn",
+}
+LETTERS_BY_TYPE = {piece_type: letter for letter, piece_type in PIECE_LETTERS.items()}
+PROMOTION_TYPES = ["queen", "rook", "bishop", "knight"]
+COLORS = ["white", "black"]
+SQUARES = BOARD_SIZE * BOARD_SIZE
+
+# Search states used while generating
+_UNKNOWN, _WIN, _LOSS, _DRAW = range(4)
+_PIECE_PATTERN = re.compile(r"([KQRBNP])(?:\[([^\]]+)\])?")
+
+
+class Material:
+    """An ordered set of pieces that a table covers."""
+
+    def __init__(self, pieces: list[tuple[str, str, Optional[str]]]):
+        # Each piece is (color, type, modifier type or None), kings first per side
+        order = "KQRBNP"
+        self.pieces = sorted(
+            pieces,
+            key=lambda p: (
+                COLORS.index(p[0]),
+                order.index(LETTERS_BY_TYPE[p[1]]),
+                p[2] or "",
+            ),
+        )
+
+    @classmethod
+    def parse(cls, spec: str) -> "Material":
+        """Parse a material string such as "KBNvK" or "KN[Royal Guard]vK"."""
+        sides = spec.split("v")
+        if len(sides) != 2:
+            raise ValueError(f"Material must look like 'KQvK', got {spec!r}")
+
+        pieces = []
+        for color, side in zip(COLORS, sides):
+            if _PIECE_PATTERN.sub("", side):
+                raise ValueError(f"Unrecognised pieces in {spec!r}")
+            for letter, modifier_type in _PIECE_PATTERN.findall(side):
+                piece_type = PIECE_LETTERS[letter]
+                modifier_type = modifier_type or None
+                if modifier_type:
+                    modifier = MODIFIERS_BY_TYPE.get(modifier_type)
+                    if not modifier or not modifier.can_apply_to_piece(piece_type):
+                        raise ValueError(
+                            f"{modifier_type!r} cannot be applied to a {piece_type}"
+                        )
+                    if modifier.uses:
+                        raise ValueError(
+                            f"{modifier_type!r} has limited uses and cannot be tabled"
+                        )
+                pieces.append((color, piece_type, modifier_type))
+
+        material = cls(pieces)
+        for color in COLORS:
+            kings = [p for p in material.pieces if p[0] == color and p[1] == "king"]
+            if len(kings) != 1:
+                raise ValueError(f"{spec!r} needs exactly one {color} king")
+        return material
+
+    @classmethod
+    def from_board(cls, board: Board) -> Optional["Material"]:
+        """The material on a board, or None if a piece carries several modifiers."""
+        pieces = []
+        for piece in board.pieces:
+            if len(piece.modifiers) > 1:
+                return None
+            modifier_type = (
+                piece.modifiers[0].modifier_type if piece.modifiers else None
+            )
+            pieces.append((piece.color, piece.get_acting_type(), modifier_type))
+        return cls(pieces)
+
+    def mirrored(self) -> "Material":
+        """The same material with the colors swapped."""
+        return Material([(_opposite(color), t, m) for color, t, m in self.pieces])
+
+    def __str__(self) -> str:
+        sides = []
+        for color in COLORS:
+            sides.append(
+                "".join(
+                    LETTERS_BY_TYPE[piece_type] + (f"[{modifier}]" if modifier else "")
+                    for piece_color, piece_type, modifier in self.pieces
+                    if piece_color == color
+                )
+            )
+        return "v".join(sides)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Material) and self.pieces == other.pieces
+
+    def __hash__(self) -> int:
+        return hash(tuple(self.pieces))
+
+    @property
+    def size(self) -> int:
+        return 2 * SQUARES ** len(self.pieces)
+
+    @property
+    def file_name(self) -> str:
+        return str(self).replace(" ", "_") + FILE_SUFFIX
+
+    def subsets(self) -> list["Material"]:
+        """Materials reachable by one capture or promotion."""
+        reachable = []
+        for index, (color, piece_type, modifier) in enumerate(self.pieces):
+            others = self.pieces[:index] + self.pieces[index + 1 :]
+            if piece_type != "king":
+                reachable.append(Material(others))
+            if piece_type == "pawn":
+                for promoted in PROMOTION_TYPES:
+                    reachable.append(Material(others + [(color, promoted, None)]))
+        return list(dict.fromkeys(reachable))
+
+    def index_of(self, board: Board, turn: str) -> Optional[int]:
+        """Table index of a board with exactly this material, or None."""
+        squares = []
+        unused = list(board.pieces)
+        for color, piece_type, modifier in self.pieces:
+            match = next(
+                (
+                    piece
+                    for piece in unused
+                    if piece.color == color
+                    and piece.get_acting_type() == piece_type
+                    and _modifier_type(piece) == modifier
+                ),
+                None,
+            )
+            if match is None:
+                return None
+            unused.remove(match)
+            squares.append(match.position.row * BOARD_SIZE + match.position.col)
+        if unused:
+            return None
+        return self.index_from_squares(turn, squares)
+
+    def index_from_squares(self, turn: str, squares: list[int]) -> int:
+        """Table index for the side to move and the square of each piece."""
+        index = COLORS.index(turn)
+        for square in squares:
+            index = index * SQUARES + square
+        return index
+
+    def squares_at(self, index: int) -> tuple[str, list[int]]:
+        """Split a table index into the side to move and each piece's square."""
+        squares = []
+        for _ in self.pieces:
+            index, square = divmod(index, SQUARES)
+            squares.append(square)
+        squares.reverse()
+        return COLORS[index], squares
+
+    def board_at(self, index: int) -> Optional[tuple[Board, str]]:
+        """
+        Set up the board for a table index, or None if pieces overlap or a pawn
+        stands on a rank it can never occupy. Pieces are placed in material order.
+        """
+        turn, squares = self.squares_at(index)
+        if len(set(squares)) != len(squares):
+            return None
+
+        board = Board.empty()
+        for (color, piece_type, modifier), square in zip(self.pieces, squares):
+            row, col = divmod(square, BOARD_SIZE)
+            if piece_type == "pawn" and (
+                row == PAWN_PROMOTION_ROWS[color]
+                or (
+                    row == PAWN_PROMOTION_ROWS[_opposite(color)]
+                    and modifier != "Reverse"
+                )
+            ):
+                return None
+            piece: Piece = PIECE_CLASSES[piece_type](color)
+            piece.mark_moved()
+            if modifier:
+                piece.add_modifier(MODIFIERS_BY_TYPE[modifier])
+            board.place_piece(piece, Position(row, col))
+        return board, turn
+
+
+class ProbeResult:
+    """Outcome of a tablebase probe, from the side to move's point of view."""
+
+    def __init__(self, outcome: str, plies: int):
+        self.outcome = outcome  # "win", "loss" or "draw"
+        self.plies = plies  # Plies until mate, 0 for draws
+
+    def __repr__(self) -> str:
+        return f"ProbeResult(outcome={self.outcome!r}, plies={self.plies})"
+
+
+class Tablebase:
+    """One memory-mapped table file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, spec_length = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} tablebase")
+        spec = self._map[HEADER.size : HEADER.size + spec_length].decode()
+        self.material = Material.parse(spec)
+        self._offset = HEADER.size + spec_length
+
+    def value(self, index: int) -> int:
+        """Raw stored byte for an index."""
+        return self._map[self._offset + index]
+
+    def values(self) -> np.ndarray:
+        """All stored bytes as a read-only array backed by the mapping."""
+        return np.frombuffer(
+            self._map, dtype=np.uint8, count=self.material.size, offset=self._offset
+        )
+
+    def probe(self, board: Board, turn: str) -> Optional[ProbeResult]:
+        """Look up a board with this table's material (in either color)."""
+        index = self.material.index_of(board, turn)
+        if index is None:
+            index = self.material.index_of(_mirror(board), _opposite(turn))
+        if index is None:
+            return None
+        return _decode(self.value(index))
+
+    def close(self) -> None:
+        self._map.close()
+
+
+class TablebaseSet:
+    """All tables in a directory, opened on first use."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._tables: dict[Material, Optional[Tablebase]] = {}
+
+    def table(self, material: Material) -> Optional[Tablebase]:
+        if material not in self._tables:
+            path = os.path.join(self.directory, material.file_name)
+            self._tables[material] = Tablebase(path) if os.path.exists(path) else None
+        return self._tables[material]
+
+    def probe(self, board: Board, turn: str) -> Optional[ProbeResult]:
+        """Probe the table for the board's material, if one has been generated."""
+        material = Material.from_board(board)
+        if material is None or len(material.pieces) > 5:
+            return None
+        for candidate in (material, material.mirrored()):
+            table = self.table(candidate)
+            if table:
+                return table.probe(board, turn)
+        return None
+
+
+def _opposite(color: str) -> str:
+    return "black" if color == "white" else "white"
+
+
+def _modifier_type(piece: Piece) -> Optional[str]:
+    return piece.modifiers[0].modifier_type if piece.modifiers else None
+
+
+def _mirror(board: Board) -> Board:
+    """Flip the board top to bottom and swap the colors of every piece."""
+    mirrored = Board.empty()
+    for piece in board.pieces:
+        copy: Piece = PIECE_CLASSES[piece.get_acting_type()](_opposite(piece.color))
+        copy.moved = piece.moved
+        for modifier in piece.modifiers:
+            copy.add_modifier(modifier)
+        row, col = piece.position.coordinates()
+        mirrored.place_piece(copy, Position(BOARD_SIZE - 1 - row, col))
+    return mirrored
+
+
+def _decode(value: int) -> Optional[ProbeResult]:
+    if value == ILLEGAL:
+        return None
+    if value == DRAW:
+        return ProbeResult("draw", 0)
+    if value < LOSS_OFFSET:
+        return ProbeResult("win", value)
+    return ProbeResult("loss", value - LOSS_OFFSET)
+
+
+def _encode(states: np.ndarray, plies: np.ndarray) -> np.ndarray:
+    values = np.full(states.shape, ILLEGAL, np.uint8)
+    values[states == _DRAW] = DRAW
+    values[states == _UNKNOWN] = DRAW
+    wins = states == _WIN
+    values[wins] = plies[wins]
+    losses = states == _LOSS
+    values[losses] = LOSS_OFFSET + plies[losses]
+    return values
+
+
+# Worker state, set once per process by _init_worker
+_worker_material: Optional[Material] = None
+_worker_tables: Optional[TablebaseSet] = None
+
+
+def _init_worker(spec: str, directory: str) -> None:
+    global _worker_material, _worker_tables
+    _worker_material = Material.parse(spec)
+    _worker_tables = TablebaseSet(directory)
+
+
+def _expand_chunk(bounds: tuple[int, int]):
+    """
+    Set up every position in [start, stop) and list its pseudo-legal successors.
+    Quiet moves keep the material, so their successor index is worked out from the
+    squares alone; only captures and promotions touch a cloned board. Moves that
+    leave the mover in check land on positions marked illegal and are dropped
+    later, which is the same filter the board applies to legal moves.
+    """
+    start, stop = bounds
+    material = _worker_material
+    legal = np.zeros(stop - start, bool)
+    in_check = np.zeros(stop - start, bool)
+    counts = np.zeros(stop - start, np.int32)
+    targets: list[int] = []
+    external_states: list[int] = []
+    external_plies: list[int] = []
+
+    for offset, index in enumerate(range(start, stop)):
+        setup = material.board_at(index)
+        if setup is None:
+            continue
+        board, turn = setup
+        next_turn = _opposite(turn)
+        if board.is_king_in_check(next_turn):
+            continue
+        legal[offset] = True
+        in_check[offset] = board.is_king_in_check(turn)
+        _, squares = material.squares_at(index)
+
+        for slot, piece in enumerate(board.pieces):
+            if piece.color != turn:
+                continue
+            for move in board.get_available_moves(piece.position, ignore_check=True):
+                if _is_quiet(board, move):
+                    moved = list(squares)
+                    moved[slot] = (
+                        move.position_to.row * BOARD_SIZE + move.position_to.col
+                    )
+                    targets.append(material.index_from_squares(next_turn, moved))
+                    external_states.append(_UNKNOWN)
+                    external_plies.append(0)
+                    counts[offset] += 1
+                    continue
+
+                successor = board.clone()
+                successor.apply_move(move)
+                if successor.is_king_in_check(turn):
+                    continue
+                target = material.index_of(successor, next_turn)
+                if target is not None:
+                    targets.append(target)
+                    external_states.append(_UNKNOWN)
+                    external_plies.append(0)
+                else:
+                    result = _worker_tables.probe(successor, next_turn)
+                    if result is None:
+                        # Material without a table is treated as a draw
+                        result = ProbeResult("draw", 0)
+                    targets.append(-1)
+                    external_states.append(
+                        {"win": _WIN, "loss": _LOSS, "draw": _DRAW}[result.outcome]
+                    )
+                    external_plies.append(result.plies)
+                counts[offset] += 1
+
+    return (
+        legal,
+        in_check,
+        counts,
+        np.array(targets, np.int32),
+        np.array(external_states, np.int8),
+        np.array(external_plies, np.int16),
+    )
+
+
+def _is_quiet(board: Board, move: ChessMove) -> bool:
+    return (
+        board.piece_from_position(move.position_to_capture) is None
+        and board.piece_from_position(move.position_to) is None
+        and not move.promote_to_type
+        and not move.additional_move
+    )
+
+
+def generate(
+    material: Material,
+    directory: str,
+    workers: Optional[int] = None,
+    chunk_size: int = 4096,
+) -> str:
+    """Generate one table (its sub-tables must already exist) and return its path."""
+    workers = workers or os.cpu_count() or 1
+    size = material.size
+    chunks = [
+        (start, min(start + chunk_size, size)) for start in range(0, size, chunk_size)
+    ]
+
+    with Pool(
+        workers, initializer=_init_worker, initargs=(str(material), directory)
+    ) as pool:
+        parts = pool.map(_expand_chunk, chunks)
+
+    legal = np.concatenate([part[0] for part in parts])
+    in_check = np.concatenate([part[1] for part in parts])
+    counts = np.concatenate([part[2] for part in parts])
+    targets = np.concatenate([part[3] for part in parts])
+    external_states = np.concatenate([part[4] for part in parts])
+    external_plies = np.concatenate([part[5] for part in parts])
+    del parts
+
+    # Drop moves into illegal positions, i.e. moves that leave the mover in check
+    owners = np.repeat(np.arange(size), counts)
+    keep = (targets < 0) | legal[np.maximum(targets, 0)]
+    counts = np.bincount(owners[keep], minlength=size).astype(np.int32)
+    targets = targets[keep]
+    external_states = external_states[keep]
+    external_plies = external_plies[keep]
+
+    states = np.full(size, _UNKNOWN, np.int8)
+    plies = np.zeros(size, np.int16)
+    no_moves = legal & (counts == 0)
+    states[no_moves & in_check] = _LOSS
+    states[no_moves & ~in_check] = _DRAW
+    _retrograde(states, plies, counts, targets, external_states, external_plies)
+    states[~legal] = -1
+
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, material.file_name)
+    spec = str(material).encode()
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, len(spec)))
+        file.write(spec)
+        file.write(_encode(states, plies).tobytes())
+    return path
+
+
+def _retrograde(
+    states: np.ndarray,
+    plies: np.ndarray,
+    counts: np.ndarray,
+    targets: np.ndarray,
+    external_states: np.ndarray,
+    external_plies: np.ndarray,
+) -> None:
+    """
+    Resolve wins and losses one ply at a time. A position is won in p plies if a
+    move reaches a position lost in p - 1, and lost in p plies once every move
+    reaches a won position (the slowest of which was won in p - 1).
+    """
+    internal = targets >= 0
+    safe_targets = np.where(internal, targets, 0)
+    has_moves = counts > 0
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[has_moves]
+    owners = np.flatnonzero(has_moves)
+
+    # Sub-table results can be far from mate, so keep going until they are covered
+    last_external = int(external_plies.max(initial=0)) + 1
+    ply = 1
+    while True:
+        edge_states = np.where(internal, states[safe_targets], external_states)
+        edge_plies = np.where(internal, plies[safe_targets], external_plies)
+        unknown = states[owners] == _UNKNOWN
+
+        reaches_loss = (edge_states == _LOSS) & (edge_plies == ply - 1)
+        wins = unknown & np.logical_or.reduceat(reaches_loss, starts)
+        won = edge_states == _WIN
+        slowest_win = np.maximum.reduceat(np.where(won, edge_plies, 0), starts)
+        losses = (
+            unknown
+            & ~wins
+            & np.logical_and.reduceat(won, starts)
+            & (slowest_win == ply - 1)
+        )
+
+        if not wins.any() and not losses.any() and ply > last_external:
+            break
+        states[owners[wins]] = _WIN
+        plies[owners[wins]] = ply
+        states[owners[losses]] = _LOSS
+        plies[owners[losses]] = ply
+        ply += 1
+        if ply >= LOSS_OFFSET - 1:
+            raise ValueError("Distance to mate does not fit in a table byte")
+
+    states[states == _UNKNOWN] = _DRAW
+
+
+def generate_with_subtables(
+    material: Material, directory: str, workers: Optional[int] = None
+) -> list[str]:
+    """Generate a table and every table it can reach, skipping existing files."""
+    paths = []
+    for subset in material.subsets():
+        # Capturing down to bare kings (or a mirrored set) still needs its own file
+        canonical = _canonical(subset)
+        paths.extend(generate_with_subtables(canonical, directory, workers))
+
+    path = os.path.join(directory, material.file_name)
+    if not os.path.exists(path):
+        logging.info(f"Generating {material} ({material.size} positions)")
+        generate(material, directory, workers)
+    paths.append(path)
+    return paths
+
+
+def _canonical(material: Material) -> Material:
+    """Prefer the orientation with more white material, as tables are stored that way."""
+    white = sum(1 for piece in material.pieces if piece[0] == "white")
+    black = len(material.pieces) - white
+    return material.mirrored() if black > white else material
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("materials", nargs="+", help='Material sets such as "KQvK"')
+    parser.add_argument("--output", default="tablebases", help="Output directory")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    for spec in args.materials:
+        for path in generate_with_subtables(
+            _canonical(Material.parse(spec)), args.output, args.workers
+        ):
+            logging.info(f"Ready: {path}")
+
+
+if __name__ == "__main__":
+    main()
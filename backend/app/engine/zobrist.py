@@ -0,0 +1,86 @@
+"""
+64-bit Zobrist keys for positions, including piece modifiers.
+
+Two positions share a key when the same pieces (by acting type, color and
+active modifiers) stand on the same squares with the same side to move,
+castling rights and en passant file. Keys are stable across processes and
+runs, so they can be written to files such as the opening book.
+"""
+
+import random
+
+from app.obj.board import Board
+from app.obj.constants import BOARD_SIZE
+from app.obj.modifier import ALL_MODIFIERS
+from app.obj.pieces import PIECE_CLASSES
+
+SQUARES = BOARD_SIZE * BOARD_SIZE
+COLORS = ["white", "black"]
+HOME_ROWS = {"white": 7, "black": 0}
+
+_random = random.Random(0x5EED_C0DE)
+
+
+def _square_keys() -> list[int]:
+    return [_random.getrandbits(64) for _ in range(SQUARES)]
+
+
+PIECE_KEYS = {
+    (color, piece_type): _square_keys()
+    for color in COLORS
+    for piece_type in PIECE_CLASSES
+}
+MODIFIER_KEYS = {
+    (color, modifier.modifier_type): _square_keys()
+    for color in COLORS
+    for modifier in ALL_MODIFIERS
+}
+CASTLING_KEYS = {
+    (color, side): _random.getrandbits(64)
+    for color in COLORS
+    for side in ("kingside", "queenside")
+}
+EN_PASSANT_KEYS = [_random.getrandbits(64) for _ in range(BOARD_SIZE)]
+BLACK_TO_MOVE_KEY = _random.getrandbits(64)
+
+
+def position_key(board: Board, turn: str) -> int:
+    """Compute the key of a board with the given side to move."""
+    key = BLACK_TO_MOVE_KEY if turn == "black" else 0
+
+    for piece in board.pieces:
+        square = piece.position.row * BOARD_SIZE + piece.position.col
+        key ^= PIECE_KEYS[(piece.color, piece.get_acting_type())][square]
+        for modifier in piece.modifiers:
+            # Used-up modifiers no longer change how the piece plays
+            if modifier.uses and not piece.get_modifier_uses_remaining(
+                modifier.modifier_type
+            ):
+                continue
+            key ^= MODIFIER_KEYS[(piece.color, modifier.modifier_type)][square]
+
+    for color in COLORS:
+        for side, rook_col in (("kingside", BOARD_SIZE - 1), ("queenside", 0)):
+            if _can_still_castle(board, color, rook_col):
+                key ^= CASTLING_KEYS[(color, side)]
+
+    if board.last_move and board._is_en_passant_opportunity():
+        key ^= EN_PASSANT_KEYS[board.last_move.position_to.col]
+
+    return key
+
+
+def _can_still_castle(board: Board, color: str, rook_col: int) -> bool:
+    row = HOME_ROWS[color]
+    king = board.squares[row][4]
+    rook = board.squares[row][rook_col]
+    return (
+        king is not None
+        and king.type == "king"
+        and king.color == color
+        and not king.moved
+        and rook is not None
+        and rook.type == "rook"
+        and rook.color == color
+        and not rook.moved
+    )
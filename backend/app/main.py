@@ -1,6 +1,13 @@
 from app.svc.room import RoomService, RoomManager, ConnectionManager
 from app.svc.time_manager import TimeManager
 from app.svc.websocket_handler import WebSocketMessageHandler
+from app.svc.analysis_service import AnalysisService
+from app.svc.clock_scheduler import ClockScheduler
+from app.svc.position_service import PositionService
+from app.svc.room_threads import RoomThreads
+from app.svc.persistence import PersistenceQueue
+from app.svc.sharding import ShardCoordinator, ShardSpec
+from app.svc.broker import DEFAULT_BROKER_SOCKET, BrokerLink
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
@@ -14,17 +21,54 @@ import os
 import logging
 from dotenv import load_dotenv
 
-from .routers import health, auth, websocket, game
-from .obj.game import GameStatus, GAME_START_TIMEOUT_SECONDS
+from .routers import health, auth, websocket, game, analysis
+from .obj.game import GameStatus
 from .auth import cleanup_expired_refresh_tokens, cleanup_inactive_guest_users
 from .database import db_manager
+from .svc.database_service import DatabaseService
 
 load_dotenv()
 
 # Initialize shared services
-room_manager = RoomManager(ConnectionManager(), RoomService())
+clock_scheduler = ClockScheduler(lambda room_id: queue_clock_deadline(room_id))
+# MOVEGEN_EXECUTOR is inline, thread (for free-threaded builds) or process
+position_service = PositionService(
+    mode=os.getenv("MOVEGEN_EXECUTOR", "inline"),
+    workers=int(os.getenv("MOVEGEN_WORKERS", "2")),
+)
+# SHARD_COUNT > 1 runs this process as shard SHARD_INDEX (see app.sharded)
+shard = ShardSpec(
+    index=int(os.getenv("SHARD_INDEX", "0")),
+    count=int(os.getenv("SHARD_COUNT", "1")),
+)
+# ROOM_THREADS > 0 pins each room's game logic to one of that many threads,
+# which only pays off on free-threaded builds
+room_threads = RoomThreads(int(os.getenv("ROOM_THREADS", "0")))
+# Finished games and rating changes are written in batches in the background
+persistence = PersistenceQueue(
+    flush_interval=float(os.getenv("PERSIST_FLUSH_SECONDS", "0.5")),
+    max_backlog=int(os.getenv("PERSIST_MAX_BACKLOG", "50000")),
+)
+room_manager = RoomManager(
+    ConnectionManager(
+        max_send_lag=float(os.getenv("MAX_SEND_LAG_SECONDS", "10")), shard=shard
+    ),
+    RoomService(clock_scheduler, shard, persistence),
+    position_service,
+    room_threads,
+)
+DatabaseService.user_changed_listeners.extend(
+    [
+        room_manager.user_info_cache.invalidate,
+        room_manager.room_service.loadouts.invalidate,
+    ]
+)
+if shard.count > 1:
+    room_manager.shards = ShardCoordinator(shard, room_manager)
+    DatabaseService.user_changed_listeners.append(room_manager.shards.user_changed)
 time_manager = TimeManager()
 message_handler = WebSocketMessageHandler(room_manager)
+analysis_service = AnalysisService(workers=int(os.getenv("ANALYSIS_WORKERS", "2")))
 
 # Initialize rate limiter
 limiter = Limiter(key_func=get_remote_address)
@@ -33,59 +77,50 @@ limiter = Limiter(key_func=get_remote_address)
 websocket.room_manager = room_manager
 websocket.message_handler = message_handler
 game.room_manager = room_manager
+analysis.analysis_service = analysis_service
 auth.limiter = limiter
 
 
-async def check_game_timers():
-    """Background task to check for time expiration in all active games."""
-    while True:
-        try:
-            current_time = time.time()
-            for room_id, room in room_manager.room_service.rooms.items():
-                if room.game.status == GameStatus.IN_PROGRESS:
-                    # Check if current player has run out of time
-                    if time_manager.check_timeout(room.game, current_time):
-                        # Update game state to mark timeout
-                        time_manager.update_player_time(room.game, current_time)
-                        logging.info(
-                            f"{room.game.turn.capitalize()} player has run out of time in room {room_id}"
-                        )
-                        await room_manager.emit_game_state_to_room(room_id)
-                        await room_manager.cleanup_room_with_elo_update(room_id)
-
-                elif room.game.status == GameStatus.NOT_STARTED:
-                    # Check for game start timeout
-                    elapsed_since_creation = current_time - room.game.created_at
-                    elapsed_since_last_move = current_time - room.game.last_move_time
-
-                    should_abort = False
-                    if room.game.turn == "white":
-                        # White hasn't moved yet, check time since game creation
-                        if elapsed_since_creation >= GAME_START_TIMEOUT_SECONDS:
-                            logging.info(
-                                f"White player timed out in room {room_id} (no first move)"
-                            )
-                            should_abort = True
-                    else:
-                        # Black's turn, check time since white's move
-                        if elapsed_since_last_move >= GAME_START_TIMEOUT_SECONDS:
-                            logging.info(
-                                f"Black player timed out in room {room_id} (no response)"
-                            )
-                            should_abort = True
-
-                    if should_abort:
-                        room.game.status = GameStatus.ABORTED
-                        room.game.end_reason = "aborted"
-                        room.game.completed_at = current_time
-                        room.game.winner = "aborted"
-                        await room_manager.emit_game_state_to_room(room_id)
-                        await room_manager.room_service.cleanup_room(room_id)
-                        continue
-        except Exception as e:
-            logging.error(f"Error in timer check task: {e}")
-
-        await asyncio.sleep(1)  # Check every 1 second
+async def queue_clock_deadline(room_id):
+    """Pass a clock deadline to the room's actor so it runs between moves."""
+    room = room_manager.room_service.get_room(room_id)
+    if room:
+        room.actor.submit(lambda: handle_clock_deadline(room_id), internal=True)
+
+
+async def handle_clock_deadline(room_id):
+    """Handle a game reaching its clock deadline: a flag-fall or a start timeout."""
+    room = room_manager.room_service.get_room(room_id)
+    if not room:
+        return
+
+    current_time = time.time()
+    if room.game.status == GameStatus.IN_PROGRESS:
+        # Check if current player has run out of time
+        if time_manager.check_timeout(room.game, current_time):
+            # Update game state to mark timeout
+            time_manager.update_player_time(room.game, current_time)
+            logging.info(
+                f"{room.game.turn.capitalize()} player has run out of time in room {room_id}"
+            )
+            await room_manager.emit_game_state_to_room(room_id)
+            await room_manager.cleanup_room_with_elo_update(room_id)
+            return
+
+    elif room.game.status == GameStatus.NOT_STARTED:
+        deadline = room.game.next_deadline()
+        if deadline is not None and current_time >= deadline:
+            if room.game.turn == "white":
+                logging.info(f"White player timed out in room {room_id} (no first move)")
+            else:
+                logging.info(f"Black player timed out in room {room_id} (no response)")
+            room.game.abort()
+            await room_manager.emit_game_state_to_room(room_id)
+            await room_manager.room_service.cleanup_room(room_id)
+            return
+
+    # Not due after all (e.g. the game changed without notifying), so check again later
+    clock_scheduler.schedule(room_id, room.game.next_deadline())
 
 
 async def cleanup_expired_tokens():
@@ -120,11 +155,38 @@ async def execute_cleanup_inactive_guest_users():
 async def lifespan(app: FastAPI):
     # Startup
     database_url = os.getenv("DATABASE_URL")
+    liveness_task = None
     if database_url:
-        db_manager.initialize(database_url)
-
-    timer_task = asyncio.create_task(check_game_timers())
+        db_manager.initialize(
+            database_url,
+            pool_size=int(os.getenv("DB_POOL_SIZE", "10")),
+            max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
+            pool_timeout=float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30")),
+            statement_cache_size=int(os.getenv("DB_STATEMENT_CACHE_SIZE", "500")),
+        )
+        liveness_task = asyncio.create_task(
+            db_manager.run_liveness_checks(
+                float(os.getenv("DB_LIVENESS_SECONDS", "30"))
+            )
+        )
+
+    broker_link = None
+    if room_manager.shards:
+        broker_link = BrokerLink(
+            os.getenv("BROKER_SOCKET", DEFAULT_BROKER_SOCKET),
+            shard.index,
+            room_manager.shards.handle,
+        )
+        room_manager.shards.attach(broker_link)
+
+    persistence.start()
+    timer_task = asyncio.create_task(clock_scheduler.run())
     cleanup_task = asyncio.create_task(cleanup_expired_tokens())
+    matchmaking_task = asyncio.create_task(
+        room_manager.run_matchmaking(
+            float(os.getenv("MATCHMAKING_TICK_SECONDS", "0.25"))
+        )
+    )
     # guest_account_cleanup_task = asyncio.create_task(
     #     execute_cleanup_inactive_guest_users()
     # )
@@ -132,7 +194,16 @@ async def lifespan(app: FastAPI):
     # Shutdown
     timer_task.cancel()
     cleanup_task.cancel()
+    matchmaking_task.cancel()
+    if liveness_task:
+        liveness_task.cancel()
     # guest_account_cleanup_task.cancel()
+    analysis_service.shutdown()
+    position_service.shutdown()
+    room_threads.shutdown()
+    if broker_link:
+        await broker_link.close()
+    await persistence.close()
     await db_manager.close()
 
 
@@ -161,6 +232,7 @@ app.include_router(health.router)
 app.include_router(auth.router)
 app.include_router(websocket.router)
 app.include_router(game.router)
+app.include_router(analysis.router)
 
 
 if __name__ == "__main__":
@@ -22,6 +22,54 @@ class Board:
         self.captured_pieces: list[Piece] = []  # Track captured pieces
         self.initialize_board()
 
+    @classmethod
+    def empty(cls) -> "Board":
+        """
+        Create a board with no pieces on it, for setting up arbitrary positions.
+        """
+        board = cls.__new__(cls)
+        board.squares = [[None] * BOARD_SIZE for _ in range(BOARD_SIZE)]
+        board.last_move = None
+        board.pieces = []
+        board.captured_pieces = []
+        return board
+
+    def place_piece(self, piece: Piece, position: Position) -> None:
+        """
+        Put a piece on an empty square and start tracking it.
+        """
+        piece.position = position
+        self.squares[position.row][position.col] = piece
+        self.pieces.append(piece)
+
+    def copy(self) -> "Board":
+        """
+        Copy the board structurally: each piece is copied with its own
+        modifier list and uses, while modifiers and positions (which are
+        replaced on a move, never changed in place) are shared. Much cheaper
+        than clone().
+        """
+        board = Board.__new__(Board)
+        board.squares = [[None] * BOARD_SIZE for _ in range(BOARD_SIZE)]
+        board.last_move = self.last_move
+        board.pieces = []
+        for piece in self.pieces:
+            copied = self._copy_piece(piece)
+            board.pieces.append(copied)
+            board.squares[copied.position.row][copied.position.col] = copied
+        board.captured_pieces = [
+            self._copy_piece(piece) for piece in self.captured_pieces
+        ]
+        return board
+
+    @staticmethod
+    def _copy_piece(piece: Piece) -> Piece:
+        copied = piece.__class__.__new__(piece.__class__)
+        copied.__dict__.update(piece.__dict__)
+        copied.modifiers = piece.modifiers.copy()
+        copied.modifier_uses_remaining = piece.modifier_uses_remaining.copy()
+        return copied
+
     def clone(self):
         """
         Create a deep copy of the board for move validation.
@@ -282,75 +330,90 @@ class Board:
         )
 
         if move:
-            initial_position = position_from.coordinates()
-            position_to = move.position_to.coordinates()
-            position_to_capture = move.position_to_capture.coordinates()
+            self.apply_move(move)
+            return True
 
-            piece = self.piece_from_position(position_from)
+        return False
 
-            # For swap moves (teleport), save the piece at the destination before we overwrite it
-            saved_additional_piece = None
-            if move.additional_move:
-                saved_additional_piece = self.piece_from_position(
-                    move.additional_move[0]
-                )
+    def apply_move(self, move: ChessMove) -> None:
+        """
+        Carry out a move that has already been validated, including captures,
+        promotion, limited modifier uses and castling or teleport swaps.
+        """
+        position_from = move.position_from
+        initial_position = position_from.coordinates()
+        position_to = move.position_to.coordinates()
+        position_to_capture = move.position_to_capture.coordinates()
 
-            # Check for piece at the capture position (e.g., en passant)
-            piece_to_capture = self.piece_from_position(move.position_to_capture)
-            if piece_to_capture:
-                self.captured_pieces.append(piece_to_capture)
-                self.pieces.remove(piece_to_capture)
-
-            # Also check for piece at the destination position (normal captures)
-            # But don't capture if this is a swap move (teleport) - the piece will be moved instead
-            if not piece_to_capture and not move.additional_move:
-                piece_at_destination = self.piece_from_position(move.position_to)
-                if piece_at_destination:
-                    self.captured_pieces.append(piece_at_destination)
-                    self.pieces.remove(piece_at_destination)
-
-            self.squares[position_to_capture[0]][position_to_capture[1]] = None
-            self.squares[position_to[0]][position_to[1]] = piece
-            if move.promote_to_type:
-                # Promote the pawn to act as the specified piece
-                piece.promote_to(move.promote_to_type)
-            piece.position = Position(position_to[0], position_to[1])
-            self.squares[initial_position[0]][initial_position[1]] = None
-            piece.mark_moved()
-            self.last_move = move
-
-            # Decrement modifier uses if this move used a limited-use modifier
-            if move.used_modifier:
-                piece.decrement_modifier_uses(move.used_modifier)
-
-            if move.additional_move:
-                # Use saved piece for swaps, or fetch for castling
-                additional_piece = (
-                    saved_additional_piece
-                    if saved_additional_piece
-                    else self.piece_from_position(move.additional_move[0])
-                )
-                if additional_piece:
-                    # Move the additional piece (like in castling or teleport)
-                    additional_initial_position = move.additional_move[0].coordinates()
-                    additional_position_to = move.additional_move[1].coordinates()
-                    self.squares[additional_position_to[0]][
-                        additional_position_to[1]
-                    ] = additional_piece
-                    # Only clear the additional piece's initial position if it's not where we just placed the main piece
-                    # (This matters for teleport where they swap positions)
-                    if additional_initial_position != position_to:
-                        self.squares[additional_initial_position[0]][
-                            additional_initial_position[1]
-                        ] = None
-                    additional_piece.mark_moved()
-                    additional_piece.position = Position(
-                        additional_position_to[0], additional_position_to[1]
-                    )
+        piece = self.piece_from_position(position_from)
 
-            return True
+        # For swap moves (teleport), save the piece at the destination before we overwrite it
+        saved_additional_piece = None
+        if move.additional_move:
+            saved_additional_piece = self.piece_from_position(
+                move.additional_move[0]
+            )
+
+        # A teleport swap lands on a friendly piece, which moves instead of being captured
+        is_swap = bool(move.additional_move) and (
+            move.additional_move[0].coordinates() == position_to
+        )
+
+        # Check for piece at the capture position (e.g., en passant)
+        piece_to_capture = (
+            None if is_swap else self.piece_from_position(move.position_to_capture)
+        )
+        if piece_to_capture:
+            self.captured_pieces.append(piece_to_capture)
+            self.pieces.remove(piece_to_capture)
+
+        # Also check for piece at the destination position (normal captures)
+        # But don't capture if this is a swap move (teleport) - the piece will be moved instead
+        if not piece_to_capture and not move.additional_move:
+            piece_at_destination = self.piece_from_position(move.position_to)
+            if piece_at_destination:
+                self.captured_pieces.append(piece_at_destination)
+                self.pieces.remove(piece_at_destination)
+
+        self.squares[position_to_capture[0]][position_to_capture[1]] = None
+        self.squares[position_to[0]][position_to[1]] = piece
+        if move.promote_to_type:
+            # Promote the pawn to act as the specified piece
+            piece.promote_to(move.promote_to_type)
+        piece.position = Position(position_to[0], position_to[1])
+        self.squares[initial_position[0]][initial_position[1]] = None
+        piece.mark_moved()
+        self.last_move = move
+
+        # Decrement modifier uses if this move used a limited-use modifier
+        if move.used_modifier:
+            piece.decrement_modifier_uses(move.used_modifier)
+
+        if move.additional_move:
+            # Use saved piece for swaps, or fetch for castling
+            additional_piece = (
+                saved_additional_piece
+                if saved_additional_piece
+                else self.piece_from_position(move.additional_move[0])
+            )
+            if additional_piece:
+                # Move the additional piece (like in castling or teleport)
+                additional_initial_position = move.additional_move[0].coordinates()
+                additional_position_to = move.additional_move[1].coordinates()
+                self.squares[additional_position_to[0]][
+                    additional_position_to[1]
+                ] = additional_piece
+                # Only clear the additional piece's initial position if it's not where we just placed the main piece
+                # (This matters for teleport where they swap positions)
+                if additional_initial_position != position_to:
+                    self.squares[additional_initial_position[0]][
+                        additional_initial_position[1]
+                    ] = None
+                additional_piece.mark_moved()
+                additional_piece.position = Position(
+                    additional_position_to[0], additional_position_to[1]
+                )
 
-        return False
 
     def get_available_moves_for_color(self, color: str) -> list[ChessMove]:
         """
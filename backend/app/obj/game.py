@@ -1,4 +1,5 @@
 from enum import Enum
+from typing import Callable, Optional
 from app.obj.board import Board
 from app.svc.time_manager import TimeManager
 import time
@@ -19,9 +20,15 @@ GAME_START_TIMEOUT_SECONDS = 20.0
 
 
 class Game:
-    def __init__(self):
+    def __init__(
+        self, board: Optional[Board] = None, position_hash: Optional[str] = None
+    ):
+        """
+        Start a game from the standard position, or from a prepared starting
+        board whose get_position_hash("white") is already known.
+        """
         self.turn = "white"
-        self.board = Board()
+        self.board = board or Board()
         self.status: GameStatus = GameStatus.IN_PROGRESS
         self.white_time_left = STARTING_TIME_IN_SECONDS
         self.black_time_left = STARTING_TIME_IN_SECONDS
@@ -37,7 +44,33 @@ class Game:
         self.black_draw_requested = False
         self.last_move = None
         self.position_history = {}  # Hash -> count for threefold repetition detection
-        self._record_position()
+        # Called whenever next_deadline() may have changed, e.g. to reschedule timers
+        self.clock_listener: Optional[Callable[[], None]] = None
+        if position_hash is None:
+            self._record_position()
+        else:
+            self.position_history[position_hash] = 1
+
+    def next_deadline(self) -> Optional[float]:
+        """
+        Timestamp at which the game next needs attention from the clock: the
+        current player's flag-fall, or the start timeout before the first moves.
+        """
+        if self.status == GameStatus.IN_PROGRESS:
+            time_left = (
+                self.white_time_left if self.turn == "white" else self.black_time_left
+            )
+            return self.last_move_time + time_left
+        if self.status == GameStatus.NOT_STARTED:
+            waiting_since = (
+                self.created_at if self.turn == "white" else self.last_move_time
+            )
+            return waiting_since + GAME_START_TIMEOUT_SECONDS
+        return None
+
+    def _notify_clock_change(self):
+        if self.clock_listener:
+            self.clock_listener()
 
     def move(self, start, end, player_color, promote_to=None):
         if self.status == GameStatus.COMPLETE:
@@ -103,6 +136,7 @@ class Game:
                     self.winner = "draw"
                     self.end_reason = "stalemate"
 
+            self._notify_clock_change()
             return True  # Move was successfully made
         else:
             return False  # Move was invalid
@@ -147,6 +181,15 @@ class Game:
         self.completed_at = time.time()
         self.winner = winner
         self.end_reason = end_reason
+        self._notify_clock_change()
+
+    def abort(self):
+        """Abort a game that never properly started"""
+        self.status = GameStatus.ABORTED
+        self.end_reason = "aborted"
+        self.completed_at = time.time()
+        self.winner = "aborted"
+        self._notify_clock_change()
 
     def mark_player_forfeit(self, color):
         if self.status != GameStatus.COMPLETE:
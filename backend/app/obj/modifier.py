@@ -180,3 +180,28 @@ TELEPORT_MODIFIER = Modifier(
     description="This piece may swap places with any friendly piece on the board",
     uses=1,
 )
+
+
+# All modifiers in a stable order, used wherever modifiers need an index
+ALL_MODIFIERS = [
+    KNOOK_MODIFIER,
+    DIAGONAL_ROOK_MODIFIER,
+    QUOOK_MODIFIER,
+    BACKWARDS_PAWN_MODIFIER,
+    DIAGONAL_PAWN_MODIFIER,
+    LONG_LEAP_PAWN_MODIFIER,
+    SIDESTEP_BISHOP_MODIFIER,
+    UNICORN_MODIFIER,
+    CORNER_HOP_MODIFIER,
+    LONGHORN_MODIFIER,
+    PEGASUS_MODIFIER,
+    ROYAL_GUARD_MODIFIER,
+    SACRIFICIAL_QUEEN_MODIFIER,
+    KNEEN_MODIFIER,
+    INFILTRATION_MODIFIER,
+    ESCAPE_HATCH_MODIFIER,
+    AGGRESSIVE_KING_MODIFIER,
+    TELEPORT_MODIFIER,
+]
+
+MODIFIERS_BY_TYPE = {modifier.modifier_type: modifier for modifier in ALL_MODIFIERS}
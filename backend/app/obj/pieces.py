@@ -663,7 +663,7 @@ class King(Piece):
                         moves.append(move)
 
             # Also add knight moves (covers remaining squares in 2-square radius)
-            moves.append(
+            moves.extend(
                 board.get_knight_moves(self.position, self.color, ignore_illegal_moves)
             )
 
@@ -742,3 +742,13 @@ class King(Piece):
             moves.append(move)
 
         return moves
+
+
+PIECE_CLASSES = {
+    "pawn": Pawn,
+    "rook": Rook,
+    "knight": Knight,
+    "bishop": Bishop,
+    "queen": Queen,
+    "king": King,
+}
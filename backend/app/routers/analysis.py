@@ -0,0 +1,62 @@
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Request
+from pydantic import BaseModel, Field
+from app.auth import verify_jwt_token
+from app.engine.fen import FENError, normalize_fen
+from app.svc.analysis_service import (
+    AnalysisBusyError,
+    AnalysisLimitError,
+    AnalysisService,
+)
+
+router = APIRouter(prefix="/api/analysis", tags=["analysis"])
+
+# This will be set by main.py
+analysis_service: AnalysisService = None  # type: ignore
+
+DEFAULT_DEPTH = 3
+MAX_DEPTH = 6
+MAX_TIME_LIMIT_SECONDS = 10.0
+
+
+class AnalysisRequest(BaseModel):
+    fen: str  # FEN, with optional [Modifier] tags after pieces
+    depth: Optional[int] = Field(default=None, ge=1, le=MAX_DEPTH)
+    time_limit: Optional[float] = Field(
+        default=None, gt=0, le=MAX_TIME_LIMIT_SECONDS
+    )  # Seconds
+
+
+@router.post("")
+async def analyse_position(analysis_request: AnalysisRequest, request: Request):
+    """Find the best move, evaluation and principal variation for a position."""
+
+    # Get access token from cookie
+    access_token = request.cookies.get("access_token")
+    if not access_token:
+        raise HTTPException(status_code=401, detail="Access token not found")
+
+    # Verify the token is valid
+    payload = verify_jwt_token(access_token)
+    if not payload:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+
+    try:
+        fen = normalize_fen(analysis_request.fen)
+    except FENError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    depth = analysis_request.depth
+    if depth is None and analysis_request.time_limit is None:
+        depth = DEFAULT_DEPTH
+    # Depth searches are capped too, so one request cannot hold a worker for long
+    time_limit = analysis_request.time_limit or MAX_TIME_LIMIT_SECONDS
+
+    try:
+        return await analysis_service.analyse(payload.sub, fen, depth, time_limit)
+    except AnalysisLimitError:
+        raise HTTPException(
+            status_code=429, detail="Too many analyses running for this user"
+        )
+    except AnalysisBusyError:
+        raise HTTPException(status_code=503, detail="Analysis queue is full")
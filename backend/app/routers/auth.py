@@ -62,7 +62,7 @@ async def get_or_create_user(user_info: dict, db_service: DatabaseService) -> di
 
     if existing_user:
         # Update last activity timestamp for OAuth authentication
-        await db_service.update_user_last_activity(user_info["id"])
+        await db_service.update_user_last_activity(user_info["id"], returning=False)
 
         # Return existing user data
         return {
@@ -85,7 +85,7 @@ async def get_or_create_user(user_info: dict, db_service: DatabaseService) -> di
     new_user = await db_service.create_user(user_data)
 
     # Update last activity timestamp for new user OAuth authentication
-    await db_service.update_user_last_activity(new_user.id)
+    await db_service.update_user_last_activity(new_user.id, returning=False)
 
     return {
         "id": new_user.id,
@@ -170,10 +170,14 @@ async def get_current_user(
 
         if refresh_token_value.startswith("guest_refresh_"):
             # Handle guest refresh tokens
-            new_access_token = await refresh_guest_access_token(refresh_token_value)
+            new_access_token = await refresh_guest_access_token(
+                refresh_token_value, db_session
+            )
         else:
             # Handle authenticated user refresh tokens
-            new_access_token = await refresh_access_token(refresh_token_value)
+            new_access_token = await refresh_access_token(
+                refresh_token_value, db_session
+            )
 
         if new_access_token:
             # Successfully refreshed, verify new token
@@ -184,7 +188,9 @@ async def get_current_user(
 
                 if user:
                     # Update last activity timestamp for token refresh
-                    await db_service.update_user_last_activity(payload.sub)
+                    await db_service.update_user_last_activity(
+                        payload.sub, returning=False
+                    )
 
                     response = JSONResponse(
                         content={
@@ -202,7 +208,9 @@ async def get_current_user(
     # If we still don't have a valid token, create guest session as fallback
     if not payload:
         # Create new guest session
-        guest_access_token, guest_refresh_token = await create_guest_tokens()
+        guest_access_token, guest_refresh_token = await create_guest_tokens(
+            session=db_session
+        )
 
         token_payload = verify_jwt_token(guest_access_token)
         if token_payload and token_payload.sub.startswith("guest_"):
@@ -210,15 +218,15 @@ async def get_current_user(
 
             # Store guest user in database
             try:
-                existing_user = await db_service.get_user_by_id(guest_id)
-                if not existing_user:
-                    await db_service.create_guest_user(guest_id)
-
-                # Get the created/existing guest user
+                # Get the existing guest user, or create it
                 user = await db_service.get_user_by_id(guest_id)
+                if not user:
+                    user = await db_service.create_guest_user(guest_id)
                 if user:
                     # Update last activity timestamp for new guest session
-                    await db_service.update_user_last_activity(guest_id)
+                    await db_service.update_user_last_activity(
+                        guest_id, returning=False
+                    )
 
                     response = JSONResponse(
                         content={
@@ -380,7 +388,7 @@ async def _process_oauth_callback(code: str, db_session: AsyncSession):
     user_data = await get_or_create_user(user_info, db_service)
 
     # Create both access and refresh tokens for our application
-    access_token, refresh_token = await create_tokens(user_info, token_data)
+    access_token, refresh_token = await create_tokens(user_info, token_data, db_session)
 
     return {
         "access_token": access_token,
@@ -1,7 +1,15 @@
-from fastapi import APIRouter
+import os
+import secrets
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException
+from ..database import db_manager
 
 router = APIRouter()
 
+# Shared secret for operator-only stats; unset turns them off
+STATS_TOKEN = os.getenv("STATS_TOKEN")
+
 
 @router.get("/")
 async def root():
@@ -11,3 +19,25 @@ async def root():
 @router.get("/health")
 async def health_check():
     return {"status": "healthy"}
+
+
+@router.get("/health/database")
+async def database_health():
+    """Result of the last database liveness check."""
+    status = {True: "healthy", False: "unhealthy", None: "unknown"}[db_manager.live]
+    return {"status": status}
+
+
+@router.get("/health/database/stats")
+async def database_stats(x_stats_token: Optional[str] = Header(None)):
+    """
+    Connection pool occupancy, checkout waits and query latency. For
+    operators only: the request must carry STATS_TOKEN in an X-Stats-Token
+    header, and without STATS_TOKEN set the route does not exist.
+    """
+    if not STATS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_stats_token or not secrets.compare_digest(x_stats_token, STATS_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid stats token")
+
+    return db_manager.get_stats()
@@ -1,9 +1,13 @@
-from app.svc.room import RoomManager
+from app.svc.room import Room, RoomManager
 from app.svc.websocket_handler import WebSocketMessageHandler
+from app.svc.binary_protocol import BinaryProtocolError, decode_client_message
 from app.obj.game import GameStatus
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from functools import partial
+from typing import Optional
+from uuid import UUID
+import json
 import logging
-import time
 
 router = APIRouter()
 
@@ -13,37 +17,93 @@ message_handler: WebSocketMessageHandler = None
 
 
 @router.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket, token: str = None):
+async def websocket_endpoint(
+    websocket: WebSocket, token: str = None, protocol: str = None
+):
     # Extract access token from query parameters
     access_token = token
 
-    connection_id = await room_manager.connect(websocket, access_token)
+    # protocol=delta opts in to a snapshot followed by state deltas
+    connection_id = await room_manager.connect(websocket, access_token, protocol)
     user_id = room_manager.manager.connection_id_to_user_id.get(connection_id)
     try:
         while True:
-            data = await websocket.receive_json()
+            data = await receive_message(websocket)
+            if data is None:
+                continue
             room = room_manager.room_service.find_player_room(user_id)
             if room:
                 player_color = "white" if room.white == user_id else "black"
 
-                # Route message to appropriate handler
-                await message_handler.handle_message(data, room, player_color)
+                if data.get("type") == "resync":
+                    # The client missed a delta; send it a fresh snapshot
+                    connection = room_manager.manager.id_to_websocket_connection[
+                        connection_id
+                    ]
+                    connection.state_stream.reset()
+                    room.actor.submit(
+                        partial(room_manager.emit_game_state_to_room, room.id)
+                    )
+                    continue
+
+                # Hand the message to the room's actor so it is applied in order
+                queued = room.actor.submit(
+                    partial(message_handler.handle_message, data, room, player_color)
+                )
+                if not queued:
+                    logging.warning(
+                        f"Dropped message from player {user_id}: room {room.id} queue is full"
+                    )
 
     except WebSocketDisconnect:
         logging.info(f"WebSocket disconnected for player {user_id}")
         await room_manager.disconnect(connection_id)
         room = room_manager.room_service.find_player_room(user_id)
         if room:
-            # If game hasn't started yet and a player disconnects, abort the game
-            if room.game.status == GameStatus.NOT_STARTED:
-                room.game.status = GameStatus.ABORTED
-                room.game.end_reason = "aborted"
-                room.game.completed_at = time.time()
-                room.game.winner = "aborted"
-                logging.info(
-                    f"Aborted game {room.id} due to player {user_id} disconnect before game start"
-                )
-                await room_manager.emit_game_state_to_room(room.id)
-                await room_manager.cleanup_room_with_elo_update(room.id)
-            else:
-                await room_manager.emit_game_state_to_room(room.id)
+            room.actor.submit(
+                partial(handle_player_disconnect, room, user_id), internal=True
+            )
+
+
+@router.websocket("/ws/spectate/{room_id}")
+async def spectate_endpoint(websocket: WebSocket, room_id: UUID):
+    # Spectators are read-only: they get state frames and anything they send is ignored
+    connection = await room_manager.watch(websocket, room_id)
+    if connection is None:
+        return
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+    finally:
+        logging.info(f"Spectator disconnected from room {room_id}")
+        room_manager.stop_watching(room_id, connection)
+
+
+async def receive_message(websocket: WebSocket) -> Optional[dict]:
+    """Receive a JSON text frame or a binary protocol frame as a message dict."""
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+    if message.get("bytes") is not None:
+        try:
+            return decode_client_message(message["bytes"])
+        except BinaryProtocolError as e:
+            logging.warning(f"Ignoring invalid binary message: {e}")
+            return None
+    return json.loads(message["text"])
+
+
+async def handle_player_disconnect(room: Room, user_id: str):
+    """Abort a game that has not started yet, otherwise tell the opponent."""
+    # If game hasn't started yet and a player disconnects, abort the game
+    if room.game.status == GameStatus.NOT_STARTED:
+        room.game.abort()
+        logging.info(
+            f"Aborted game {room.id} due to player {user_id} disconnect before game start"
+        )
+        await room_manager.emit_game_state_to_room(room.id)
+        await room_manager.cleanup_room_with_elo_update(room.id)
+    else:
+        await room_manager.emit_game_state_to_room(room.id)
@@ -0,0 +1,71 @@
+"""
+Run the API as SHARD_COUNT processes plus the shard broker.
+
+Shard N listens on PORT + N (PORT defaults to 8000). The proxy in front sends
+/ws?shard=N to shard N and any other socket to shard 0, which redirects it
+to the right shard (see nginx.conf, set up for up to eight shards on
+8000-8007). Plain HTTP requests can go to any shard.
+
+Usage: SHARD_COUNT=4 python -m app.sharded
+"""
+
+import os
+import signal
+import subprocess
+import sys
+import time
+
+from app.svc.broker import DEFAULT_BROKER_SOCKET
+
+
+def main() -> None:
+    count = int(os.getenv("SHARD_COUNT", str(os.cpu_count() or 1)))
+    base_port = int(os.getenv("PORT", "8000"))
+    socket_path = os.getenv("BROKER_SOCKET", DEFAULT_BROKER_SOCKET)
+
+    processes = [
+        subprocess.Popen([sys.executable, "-m", "app.svc.broker", socket_path])
+    ]
+    # Shards retry until the broker is up, but starting it first avoids warnings
+    for _ in range(50):
+        if os.path.exists(socket_path):
+            break
+        time.sleep(0.1)
+
+    for index in range(count):
+        env = dict(
+            os.environ,
+            SHARD_INDEX=str(index),
+            SHARD_COUNT=str(count),
+            BROKER_SOCKET=socket_path,
+        )
+        processes.append(
+            subprocess.Popen(
+                [
+                    sys.executable,
+                    "-m",
+                    "uvicorn",
+                    "app.main:app",
+                    "--host",
+                    "localhost",
+                    "--port",
+                    str(base_port + index),
+                ],
+                env=env,
+            )
+        )
+
+    # Stop the shards and broker with us, whether killed or interrupted
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        for process in processes:
+            process.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            process.terminate()
+
+
+if __name__ == "__main__":
+    main()
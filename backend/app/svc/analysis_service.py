@@ -0,0 +1,145 @@
+"""Position analysis service backed by a bounded process pool."""
+
+import asyncio
+import logging
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from app.engine.search import analyse_fen
+
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_QUEUED = 16
+DEFAULT_PER_USER_LIMIT = 2
+DEFAULT_CACHE_SIZE = 1024
+
+
+class AnalysisBusyError(Exception):
+    """Raised when the pool and its queue are full."""
+
+
+class AnalysisLimitError(Exception):
+    """Raised when a user already has their maximum number of analyses running."""
+
+
+class AnalysisService:
+    """
+    Runs searches in worker processes so the event loop never blocks on them.
+
+    At most `workers` searches run at once and at most `max_queued` more wait for
+    a worker; further requests are rejected rather than queued without bound.
+    Identical requests share one search, and finished results are cached by
+    position and the depth reached.
+    """
+
+    def __init__(
+        self,
+        workers: int = DEFAULT_WORKERS,
+        max_queued: int = DEFAULT_MAX_QUEUED,
+        per_user_limit: int = DEFAULT_PER_USER_LIMIT,
+        cache_size: int = DEFAULT_CACHE_SIZE,
+    ):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.per_user_limit = per_user_limit
+        self.cache_size = cache_size
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.cache: OrderedDict[tuple, dict] = OrderedDict()
+        self.in_flight: dict[tuple, asyncio.Future] = {}
+        self.user_counts: dict[str, int] = {}
+        self.pending = 0
+
+    def start(self) -> None:
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+
+    def shutdown(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def get_stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "max_queued": self.max_queued,
+            "cached": len(self.cache),
+        }
+
+    async def analyse(
+        self,
+        user_id: str,
+        fen: str,
+        depth: Optional[int] = None,
+        time_limit: Optional[float] = None,
+    ) -> dict:
+        """
+        Analyse a normalised FEN position for a user.
+
+        Args:
+            user_id: User requesting the analysis, for per-user limits
+            fen: Position in modifier-extended FEN, already normalised
+            depth: Search depth, or None to search until the time limit
+            time_limit: Seconds to search for, or None for a fixed depth
+
+        Returns:
+            Best move, evaluation and principal variation
+        """
+        if depth is not None:
+            cached = self._get_cached((fen, depth))
+            if cached is not None:
+                return {**cached, "cached": True}
+
+        key = (fen, depth, time_limit)
+
+        # Join an identical search that is already running
+        if key in self.in_flight:
+            return {**await asyncio.shield(self.in_flight[key]), "cached": False}
+
+        if self.user_counts.get(user_id, 0) >= self.per_user_limit:
+            raise AnalysisLimitError()
+        if self.pending >= self.workers + self.max_queued:
+            raise AnalysisBusyError()
+
+        self.start()
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(
+            self.executor, analyse_fen, fen, depth, time_limit
+        )
+        self.in_flight[key] = future
+        self.pending += 1
+        self.user_counts[user_id] = self.user_counts.get(user_id, 0) + 1
+        # Book-keeping happens when the worker finishes, even if the caller has gone
+        future.add_done_callback(lambda done: self._finished(key, user_id, done))
+
+        result = await asyncio.shield(future)
+        return {**result, "cached": False}
+
+    def _finished(self, key: tuple, user_id: str, future: asyncio.Future) -> None:
+        self.pending -= 1
+        self.user_counts[user_id] -= 1
+        if not self.user_counts[user_id]:
+            del self.user_counts[user_id]
+        self.in_flight.pop(key, None)
+
+        if future.cancelled() or future.exception() is not None:
+            return
+        result = future.result()
+        # Cache by the depth actually reached, which is what a timed search or a
+        # depth search cut short by its time limit is worth
+        self._store((key[0], result["depth"]), result)
+        logging.info(
+            f"Analysed position to depth {result['depth']} in {result['time_ms']}ms"
+        )
+
+    def _get_cached(self, key: tuple) -> Optional[dict]:
+        result = self.cache.get(key)
+        if result is not None:
+            self.cache.move_to_end(key)
+        return result
+
+    def _store(self, key: tuple, result: dict) -> None:
+        self.cache[key] = result
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
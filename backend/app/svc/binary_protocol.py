@@ -0,0 +1,279 @@
+"""
+Compact binary websocket protocol, negotiated with the "chess-cg.binary.v1"
+subprotocol on /ws.
+
+After the handshake the server sends one JSON text frame, binary_hello, with
+the code tables below. Every later server frame is a binary STATE message and
+clients send binary frames. All integers are little-endian and squares are
+numbered row * 8 + col, with row 0 being black's back rank as in the JSON
+protocol.
+
+STATE (server -> client):
+    B    message type (1)
+    16s  room id
+    B    flags: 1 black to move, 2 white in check, 4 black in check,
+         8 white draw request, 16 black draw request, 32 opponent connected
+    B    status code
+    B    winner code (0 for none)
+    B    end reason code (0 for none)
+    I I  white and black clock in milliseconds
+    H    last move code (0xFFFF for none)
+    64s  board: one piece code per square (0 for empty)
+    B    captured piece count, then one piece code each
+    B    modifier count, then square, modifier code and uses left
+         (255 for unlimited) per modifier
+    B    origin count, then square and a 64-bit target mask per origin
+    B    player id length, then the player id in UTF-8
+
+Piece codes are 1 + the index in PIECE_TYPES, plus 8 for black pieces.
+Move codes are from + (to << 6) + (promotion << 12), with promotion 0 for
+none or 1 + the index in PROMOTION_TYPES.
+
+Client messages are one type byte, followed by a move code for MOVE.
+"""
+
+import struct
+from typing import Any
+
+from app.obj.constants import BOARD_SIZE
+from app.obj.game import Game, GameStatus
+from app.obj.modifier import ALL_MODIFIERS
+
+BINARY_SUBPROTOCOL = "chess-cg.binary.v1"
+VERSION = 1
+
+PIECE_TYPES = ["pawn", "knight", "bishop", "rook", "queen", "king"]
+PROMOTION_TYPES = ["bishop", "knight", "rook", "queen"]
+MODIFIER_TYPES = [modifier.modifier_type for modifier in ALL_MODIFIERS]
+STATUSES = [status.value for status in GameStatus]
+WINNERS = [None, "white", "black", "draw", "aborted"]
+END_REASONS = [
+    None,
+    "checkmate",
+    "stalemate",
+    "resignation",
+    "draw_agreement",
+    "time",
+    "threefold_repetition",
+    "aborted",
+]
+
+STATE = 1
+CLIENT_MESSAGE_TYPES = {
+    0x10: "move",
+    0x11: "reset_premove",
+    0x12: "resign",
+    0x13: "request_draw",
+    0x14: "resync",
+}
+NO_MOVE = 0xFFFF
+UNLIMITED_USES = 255
+
+_STATE_HEADER = struct.Struct("<B16sBBBBIIH")
+_MOVE = struct.Struct("<H")
+_ORIGIN = struct.Struct("<BQ")
+_PIECE_CODES = {name: index + 1 for index, name in enumerate(PIECE_TYPES)}
+_MODIFIER_CODES = {name: index for index, name in enumerate(MODIFIER_TYPES)}
+
+
+class BinaryProtocolError(ValueError):
+    """Raised for a client frame that does not follow the protocol."""
+
+
+def hello_message() -> dict[str, Any]:
+    """The code tables a client needs to read STATE messages."""
+    return {
+        "type": "binary_hello",
+        "version": VERSION,
+        "piece_types": PIECE_TYPES,
+        "promotion_types": PROMOTION_TYPES,
+        "modifiers": MODIFIER_TYPES,
+        "statuses": STATUSES,
+        "winners": WINNERS,
+        "end_reasons": END_REASONS,
+    }
+
+
+def piece_code(piece) -> int:
+    return _PIECE_CODES[piece.get_acting_type()] + (8 if piece.color == "black" else 0)
+
+
+def square_index(position) -> int:
+    return position.row * BOARD_SIZE + position.col
+
+
+def _on_board(position) -> bool:
+    return 0 <= position.row < BOARD_SIZE and 0 <= position.col < BOARD_SIZE
+
+
+def encode_move(move) -> int:
+    promotion = (
+        PROMOTION_TYPES.index(move.promote_to_type) + 1 if move.promote_to_type else 0
+    )
+    return (
+        square_index(move.position_from)
+        | square_index(move.position_to) << 6
+        | promotion << 12
+    )
+
+
+def decode_move(code: int) -> dict[str, Any]:
+    """Turn a move code into the fields of a JSON move message."""
+    start, end, promotion = code & 63, (code >> 6) & 63, code >> 12
+    if promotion > len(PROMOTION_TYPES):
+        raise BinaryProtocolError(f"Invalid promotion code {promotion}")
+    return {
+        "from": [start // BOARD_SIZE, start % BOARD_SIZE],
+        "to": [end // BOARD_SIZE, end % BOARD_SIZE],
+        "promotion": PROMOTION_TYPES[promotion - 1] if promotion else None,
+    }
+
+
+def decode_client_message(frame: bytes) -> dict[str, Any]:
+    """Turn a client frame into the same dict a JSON client would send."""
+    if not frame or frame[0] not in CLIENT_MESSAGE_TYPES:
+        raise BinaryProtocolError("Unknown message type")
+    data: dict[str, Any] = {"type": CLIENT_MESSAGE_TYPES[frame[0]]}
+    if data["type"] == "move":
+        if len(frame) != 1 + _MOVE.size:
+            raise BinaryProtocolError("Move message must be 3 bytes")
+        data.update(decode_move(_MOVE.unpack_from(frame, 1)[0]))
+    return data
+
+
+def encode_state(
+    room_id: bytes,
+    game: Game,
+    player_id: str,
+    moves: list,
+    opponent_connected: bool,
+    clocks: tuple[float, float],
+    kings_in_check: dict[str, bool],
+) -> bytes:
+    """Encode one player's view of a game as a STATE message."""
+    board = game.board
+    flags = (
+        (game.turn == "black")
+        | kings_in_check["white"] << 1
+        | kings_in_check["black"] << 2
+        | game.white_draw_requested << 3
+        | game.black_draw_requested << 4
+        | opponent_connected << 5
+    )
+    header = _STATE_HEADER.pack(
+        STATE,
+        room_id,
+        flags,
+        STATUSES.index(game.status.value),
+        WINNERS.index(game.winner),
+        END_REASONS.index(game.end_reason),
+        max(0, round(clocks[0] * 1000)),
+        max(0, round(clocks[1] * 1000)),
+        encode_move(game.last_move) if game.last_move else NO_MOVE,
+    )
+
+    squares = bytearray(BOARD_SIZE * BOARD_SIZE)
+    modifiers = bytearray()
+    modifier_count = 0
+    for piece in board.pieces:
+        square = square_index(piece.position)
+        squares[square] = piece_code(piece)
+        for modifier in piece.modifiers:
+            # Only modifiers with limited uses have an entry
+            uses = piece.modifier_uses_remaining.get(modifier.modifier_type)
+            code = _MODIFIER_CODES[modifier.modifier_type]
+            modifiers += bytes(
+                (square, code, UNLIMITED_USES if uses is None else min(uses, 254))
+            )
+            modifier_count += 1
+
+    captured = bytes(piece_code(piece) for piece in board.captured_pieces)
+
+    targets: dict[int, int] = {}
+    for move in moves:
+        # Premoves can point off the board; those cannot be played anyway
+        if _on_board(move.position_to):
+            origin = square_index(move.position_from)
+            targets[origin] = targets.get(origin, 0) | 1 << square_index(
+                move.position_to
+            )
+    origins = b"".join(_ORIGIN.pack(origin, mask) for origin, mask in targets.items())
+
+    player = player_id.encode()
+    return b"".join(
+        [
+            header,
+            squares,
+            bytes((len(captured),)),
+            captured,
+            bytes((modifier_count,)),
+            modifiers,
+            bytes((len(targets),)),
+            origins,
+            bytes((len(player),)),
+            player,
+        ]
+    )
+
+
+def decode_state(frame: bytes) -> dict[str, Any]:
+    """Decode a STATE message. Used by tests and tooling; clients do the same."""
+    (
+        message_type,
+        room_id,
+        flags,
+        status,
+        winner,
+        end_reason,
+        white_ms,
+        black_ms,
+        last_move,
+    ) = _STATE_HEADER.unpack_from(frame)
+    if message_type != STATE:
+        raise BinaryProtocolError("Not a STATE message")
+    offset = _STATE_HEADER.size
+    board = list(frame[offset : offset + 64])
+    offset += 64
+
+    count = frame[offset]
+    captured = list(frame[offset + 1 : offset + 1 + count])
+    offset += 1 + count
+
+    count = frame[offset]
+    offset += 1
+    modifiers = []
+    for _ in range(count):
+        square, code, uses = frame[offset : offset + 3]
+        modifiers.append(
+            (square, MODIFIER_TYPES[code], None if uses == UNLIMITED_USES else uses)
+        )
+        offset += 3
+
+    count = frame[offset]
+    offset += 1
+    targets = {}
+    for _ in range(count):
+        origin, mask = _ORIGIN.unpack_from(frame, offset)
+        targets[origin] = [square for square in range(64) if mask >> square & 1]
+        offset += _ORIGIN.size
+
+    length = frame[offset]
+    player_id = frame[offset + 1 : offset + 1 + length].decode()
+
+    return {
+        "room_id": room_id,
+        "turn": "black" if flags & 1 else "white",
+        "kings_in_check": {"white": bool(flags & 2), "black": bool(flags & 4)},
+        "draw_requests": {"white": bool(flags & 8), "black": bool(flags & 16)},
+        "opponent_connected": bool(flags & 32),
+        "status": STATUSES[status],
+        "winner": WINNERS[winner],
+        "end_reason": END_REASONS[end_reason],
+        "time": {"white": white_ms / 1000, "black": black_ms / 1000},
+        "last_move": None if last_move == NO_MOVE else decode_move(last_move),
+        "board": board,
+        "captured": captured,
+        "modifiers": modifiers,
+        "targets": targets,
+        "player_id": player_id,
+    }
@@ -0,0 +1,164 @@
+"""
+Routes messages between shard processes.
+
+Broker is a small standalone process listening on a local Unix socket. Each
+shard connects with BrokerLink, says which shard it is, and then writes one
+JSON object per line with a "to" field naming the destination shard; the
+broker forwards the line unchanged. InProcessBroker does the same for shards
+living in one process, which is how the tests run.
+
+Run the broker with: python -m app.svc.broker [socket path]
+"""
+
+import asyncio
+import logging
+import os
+import sys
+from typing import Any, Callable, Optional
+
+import orjson
+
+DEFAULT_BROKER_SOCKET = "/tmp/chess-cg-broker.sock"
+RECONNECT_SECONDS = 1.0
+
+MessageHandler = Callable[[dict[str, Any]], None]
+
+
+class Broker:
+    """Forwards lines between connected shards by their "to" field."""
+
+    def __init__(self):
+        self.shards: dict[int, asyncio.StreamWriter] = {}
+        self.forwarded = 0
+        self.undeliverable = 0
+
+    async def serve(self, path: str = DEFAULT_BROKER_SOCKET) -> None:
+        if os.path.exists(path):
+            os.unlink(path)
+        server = await asyncio.start_unix_server(self._handle_shard, path)
+        logging.info(f"Shard broker listening on {path}")
+        async with server:
+            await server.serve_forever()
+
+    async def _handle_shard(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        hello = await reader.readline()
+        if not hello:
+            writer.close()
+            return
+        shard = orjson.loads(hello)["shard"]
+        self.shards[shard] = writer
+        logging.info(f"Shard {shard} connected to the broker")
+        try:
+            while line := await reader.readline():
+                target = self.shards.get(orjson.loads(line)["to"])
+                if target is None:
+                    self.undeliverable += 1
+                    continue
+                target.write(line)
+                self.forwarded += 1
+        except Exception as e:
+            logging.error(f"Error reading from shard {shard}: {e}")
+        finally:
+            if self.shards.get(shard) is writer:
+                del self.shards[shard]
+            writer.close()
+            logging.info(f"Shard {shard} disconnected from the broker")
+
+
+class BrokerLink:
+    """A shard's connection to the broker. Reconnects if the broker restarts."""
+
+    def __init__(self, path: str, shard: int, handler: MessageHandler):
+        self.path = path
+        self.shard = shard
+        self.handler = handler
+        self.writer: Optional[asyncio.StreamWriter] = None
+        self.task: Optional[asyncio.Task] = None
+        self.sent = 0
+        self.unsent = 0  # Messages dropped while the broker was unreachable
+
+    def start(self) -> None:
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+
+    def send(self, shard: int, message: dict[str, Any]) -> None:
+        """Send a message to another shard without waiting for it."""
+        if self.writer is None or self.writer.is_closing():
+            self.unsent += 1
+            logging.warning(
+                f"Dropped {message.get('type')} message for shard {shard}: "
+                "not connected to the broker"
+            )
+            return
+        self.writer.write(orjson.dumps({**message, "to": shard}) + b"\n")
+        self.sent += 1
+
+    async def close(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    async def run(self) -> None:
+        while True:
+            try:
+                reader, self.writer = await asyncio.open_unix_connection(self.path)
+                self.writer.write(orjson.dumps({"shard": self.shard}) + b"\n")
+                while line := await reader.readline():
+                    try:
+                        self.handler(orjson.loads(line))
+                    except Exception as e:
+                        logging.error(f"Error handling broker message: {e}")
+                logging.warning("Lost connection to the shard broker")
+            except OSError as e:
+                logging.warning(f"Cannot reach the shard broker at {self.path}: {e}")
+            self.writer = None
+            await asyncio.sleep(RECONNECT_SECONDS)
+
+
+class InProcessBroker:
+    """Stands in for Broker when every shard lives in one process."""
+
+    def __init__(self):
+        self.handlers: dict[int, MessageHandler] = {}
+
+    def link(self, shard: int, handler: MessageHandler) -> "InProcessLink":
+        self.handlers[shard] = handler
+        return InProcessLink(self)
+
+
+class InProcessLink:
+    def __init__(self, broker: InProcessBroker):
+        self.broker = broker
+        self.sent = 0
+        self.unsent = 0
+
+    def start(self) -> None:
+        pass
+
+    def send(self, shard: int, message: dict[str, Any]) -> None:
+        handler = self.broker.handlers.get(shard)
+        if handler is None:
+            self.unsent += 1
+            return
+        # Round-trip through JSON and deliver later, as the socket broker would
+        copy = orjson.loads(orjson.dumps({**message, "to": shard}))
+        asyncio.get_running_loop().call_soon(handler, copy)
+        self.sent += 1
+
+    async def close(self) -> None:
+        pass
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_BROKER_SOCKET
+    asyncio.run(Broker().serve(path))
+
+
+if __name__ == "__main__":
+    main()
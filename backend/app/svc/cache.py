@@ -0,0 +1,109 @@
+"""In-process async cache with TTL, LRU eviction and request coalescing."""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Generic, Hashable, Optional, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+DEFAULT_TTL_SECONDS = 60.0
+DEFAULT_MAX_SIZE = 10_000
+
+
+class AsyncCache(Generic[K, V]):
+    """
+    Caches what loader returns for each key for ttl seconds, keeping at most
+    max_size entries (least recently used go first). Concurrent misses for
+    the same key share one loader call, run as its own task: a caller that
+    is cancelled while waiting stops waiting, but the load carries on for
+    everyone else. A loader error is passed to every waiter and nothing is
+    cached.
+
+    Invalidating a key also detaches any load in progress, so a load that
+    started before a write cannot put the old value back afterwards.
+    Invalidation is per process: other processes see a change once their
+    entry expires.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[K], Awaitable[V]],
+        ttl: float = DEFAULT_TTL_SECONDS,
+        max_size: int = DEFAULT_MAX_SIZE,
+    ):
+        self.loader = loader
+        self.ttl = ttl
+        self.max_size = max_size
+        self.entries: OrderedDict[K, tuple[float, V]] = OrderedDict()
+        self.loading: dict[K, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0  # Misses that waited on another caller's load
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def peek(self, key: K) -> Optional[V]:
+        """Return the cached value if it is fresh, without loading or counting."""
+        entry = self.entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            return None
+        return entry[1]
+
+    async def get(self, key: K) -> V:
+        entry = self.entries.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return entry[1]
+            del self.entries[key]
+
+        self.misses += 1
+        task = self.loading.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.create_task(self._load(key))
+            # Every waiter may have gone; mark a failure as retrieved
+            task.add_done_callback(lambda done: done.cancelled() or done.exception())
+            self.loading[key] = task
+        return await asyncio.shield(task)
+
+    async def _load(self, key: K) -> V:
+        task = asyncio.current_task()
+        try:
+            value = await self.loader(key)
+        finally:
+            # An invalidation during the load detached it; do not cache the result
+            loaded = self.loading.get(key) is task
+            if loaded:
+                del self.loading[key]
+        if loaded:
+            self.put(key, value)
+        return value
+
+    def put(self, key: K, value: V) -> None:
+        self.entries[key] = (time.monotonic() + self.ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: K) -> None:
+        self.entries.pop(key, None)
+        self.loading.pop(key, None)
+
+    def get_stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,136 @@
+"""Deadline scheduler for game clocks."""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import threading
+import time
+from typing import TYPE_CHECKING, Awaitable, Callable, Optional
+from uuid import UUID
+
+if TYPE_CHECKING:
+    from ..obj.game import Game
+
+
+class ClockScheduler:
+    """
+    Fires a callback when a room's game reaches its next clock deadline.
+
+    Deadlines live in a min-heap. Rescheduling pushes a new entry and leaves the
+    old one behind; stale entries are recognised by their sequence number and
+    skipped when they reach the top, so every reschedule and every fired
+    deadline costs O(log n) whatever the number of rooms.
+    """
+
+    def __init__(self, on_deadline: Callable[[UUID], Awaitable[None]]):
+        self.on_deadline = on_deadline
+        self.heap: list[tuple[float, int, UUID]] = []
+        self.entries: dict[UUID, tuple[float, int]] = {}  # Live entry per room
+        self._sequence = itertools.count()
+        self._wakeup = asyncio.Event()
+        self.fired = 0
+        self.total_lag = 0.0  # Seconds between deadlines and their callbacks
+
+    def watch(self, room_id: UUID, game: "Game") -> None:
+        """
+        Keep a room scheduled on its game's deadline as the game changes.
+
+        Games may change on a room thread (see RoomThreads), but the heap and
+        the wakeup event belong to the event loop, so changes made off the
+        loop's thread are handed back to it to reschedule.
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        loop_thread = threading.get_ident()
+
+        def reschedule() -> None:
+            if loop is None or threading.get_ident() == loop_thread:
+                self.schedule(room_id, game.next_deadline())
+            else:
+                loop.call_soon_threadsafe(
+                    lambda: self.schedule(room_id, game.next_deadline())
+                )
+
+        game.clock_listener = reschedule
+        self.schedule(room_id, game.next_deadline())
+
+    def unwatch(self, room_id: UUID) -> None:
+        self.entries.pop(room_id, None)
+
+    def schedule(self, room_id: UUID, deadline: Optional[float]) -> None:
+        """Set (or with None, clear) the deadline for a room."""
+        if deadline is None:
+            self.entries.pop(room_id, None)
+            return
+
+        sequence = next(self._sequence)
+        self.entries[room_id] = (deadline, sequence)
+        heapq.heappush(self.heap, (deadline, sequence, room_id))
+
+        # Drop stale entries once they outnumber live ones
+        if len(self.heap) > 2 * len(self.entries) + 64:
+            self.heap = [
+                (entry[0], entry[1], room) for room, entry in self.entries.items()
+            ]
+            heapq.heapify(self.heap)
+
+        # Wake the runner if this is now the earliest deadline
+        if self.heap[0][1] == sequence:
+            self._wakeup.set()
+
+    def next_deadline(self) -> Optional[float]:
+        self._drop_stale()
+        return self.heap[0][0] if self.heap else None
+
+    def get_stats(self) -> dict:
+        return {
+            "scheduled": len(self.entries),
+            "heap_size": len(self.heap),
+            "fired": self.fired,
+            "average_lag_ms": (
+                round(self.total_lag / self.fired * 1000, 3) if self.fired else 0.0
+            ),
+        }
+
+    def _drop_stale(self) -> None:
+        while self.heap:
+            deadline, sequence, room_id = self.heap[0]
+            if self.entries.get(room_id) == (deadline, sequence):
+                return
+            heapq.heappop(self.heap)
+
+    def pop_due(self, now: float) -> list[UUID]:
+        """Remove and return every room whose deadline has passed."""
+        due = []
+        self._drop_stale()
+        while self.heap and self.heap[0][0] <= now:
+            deadline, _, room_id = heapq.heappop(self.heap)
+            del self.entries[room_id]
+            self.total_lag += now - deadline
+            due.append(room_id)
+            self._drop_stale()
+        return due
+
+    async def run(self) -> None:
+        """Sleep until the earliest deadline (or an earlier reschedule) and fire it."""
+        while True:
+            self._wakeup.clear()
+            due = self.pop_due(time.time())
+            for room_id in due:
+                self.fired += 1
+                try:
+                    await self.on_deadline(room_id)
+                except Exception as e:
+                    logging.error(f"Error handling clock deadline for {room_id}: {e}")
+            if due:
+                continue
+
+            deadline = self.next_deadline()
+            timeout = None if deadline is None else max(0.0, deadline - time.time())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
@@ -1,7 +1,9 @@
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete
+from sqlalchemy import Integer, String, column, delete, insert, select, update, values
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from app.db_models import User, ChessGame, RefreshToken
-from typing import Optional, TYPE_CHECKING
+from typing import Callable, Optional, TYPE_CHECKING
 from uuid import uuid4
 from datetime import datetime, timezone, timedelta
 
@@ -10,26 +12,60 @@ if TYPE_CHECKING:
 
 
 class DatabaseService:
+    # Called with a user id after that user's row changes, so in-process
+    # caches can drop their copy (registered by main.py)
+    user_changed_listeners: list[Callable[[str], None]] = []
+
     def __init__(self, session: AsyncSession):
         self.session = session
 
-    async def create_user(self, user_data: dict) -> User:
+    def _user_changed(self, user_id: str) -> None:
+        for listener in self.user_changed_listeners:
+            listener(user_id)
+
+    async def _write(self, model: type, statement, returning: bool = True):
+        """
+        Run one INSERT or UPDATE and commit. With returning, the written row
+        comes back from the same statement (... RETURNING) instead of being
+        read again afterwards; otherwise None is returned.
+        """
+        if returning:
+            statement = statement.returning(model)
+        result = await self.session.execute(
+            statement.execution_options(
+                populate_existing=True, synchronize_session=False
+            )
+        )
+        row = result.scalar_one_or_none() if returning else None
+        await self.session.commit()
+        return row
+
+    async def create_user(
+        self, user_data: dict, returning: bool = True
+    ) -> Optional[User]:
         # Set ELO based on user type
         if user_data.get("user_type") == "authenticated":
             user_data["elo"] = 1200
         elif user_data.get("user_type") == "guest":
             user_data["elo"] = None
 
-        user = User(**user_data)
-        self.session.add(user)
-        await self.session.commit()
-        await self.session.refresh(user)
-        return user
+        return await self._write(User, insert(User).values(**user_data), returning)
 
     async def get_user_by_id(self, user_id: str) -> Optional[User]:
-        result = await self.session.execute(select(User).where(User.id == user_id))
+        result = await self.session.execute(
+            select(User)
+            .where(User.id == user_id)
+            .execution_options(statement_name="get_user_by_id")
+        )
         return result.scalar_one_or_none()
 
+    async def get_users_by_ids(self, user_ids: list[str]) -> list[User]:
+        """Fetch several users in one query; unknown ids are skipped."""
+        if not user_ids:
+            return []
+        result = await self.session.execute(select(User).where(User.id.in_(user_ids)))
+        return list(result.scalars().all())
+
     async def get_user_by_email(self, email: str) -> Optional[User]:
         result = await self.session.execute(select(User).where(User.email == email))
         return result.scalar_one_or_none()
@@ -49,65 +85,71 @@ class DatabaseService:
         }
         return await self.create_user(guest_data)
 
-    async def update_user_username(self, user_id: str, username: str) -> Optional[User]:
-        user = await self.get_user_by_id(user_id)
-        if not user:
-            return None
-
+    async def update_user_username(
+        self, user_id: str, username: str, returning: bool = True
+    ) -> Optional[User]:
         # Check if username is already taken by another user
         existing_user = await self.get_user_by_username(username)
         if existing_user and existing_user.id != user_id:
             return None  # Username already taken
 
-        user.username = username
-        await self.session.commit()
-        await self.session.refresh(user)
+        try:
+            user = await self._update_user(user_id, returning, username=username)
+        except IntegrityError:
+            # Taken by someone else since the check above
+            await self.session.rollback()
+            return None
+        self._user_changed(user_id)
         return user
 
-    async def update_user_elo(self, user_id: str, new_elo: int) -> Optional[User]:
+    async def update_user_elo(
+        self, user_id: str, new_elo: int, returning: bool = True
+    ) -> Optional[User]:
         """Update a user's ELO rating."""
-        user = await self.get_user_by_id(user_id)
-        if not user:
-            return None
-
-        user.elo = new_elo
-        await self.session.commit()
-        await self.session.refresh(user)
+        user = await self._update_user(user_id, returning, elo=new_elo)
+        self._user_changed(user_id)
         return user
 
-    async def update_user_last_activity(self, user_id: str) -> Optional[User]:
+    async def update_user_last_activity(
+        self, user_id: str, returning: bool = True
+    ) -> Optional[User]:
         """Update a user's last activity timestamp."""
-        user = await self.get_user_by_id(user_id)
-        if not user:
-            return None
-
-        user.last_activity_at = datetime.now(timezone.utc).replace(tzinfo=None)
-        await self.session.commit()
-        await self.session.refresh(user)
-        return user
+        return await self._update_user(
+            user_id,
+            returning,
+            last_activity_at=datetime.now(timezone.utc).replace(tzinfo=None),
+        )
 
-    async def update_user_loadout(self, user_id: str, loadout: "Loadout | dict") -> Optional[User]:
+    async def update_user_loadout(
+        self, user_id: str, loadout: "Loadout | dict", returning: bool = True
+    ) -> Optional[User]:
         """Update a user's piece modifiers loadout."""
-        user = await self.get_user_by_id(user_id)
-        if not user:
-            return None
-
         # Convert Loadout model to dict if needed
         if hasattr(loadout, "model_dump"):
-            user.loadout = loadout.model_dump()
-        else:
-            user.loadout = loadout
-        await self.session.commit()
-        await self.session.refresh(user)
+            loadout = loadout.model_dump()
+        user = await self._update_user(user_id, returning, loadout=loadout)
+        self._user_changed(user_id)
         return user
 
+    async def _update_user(
+        self, user_id: str, returning: bool, **values
+    ) -> Optional[User]:
+        """
+        Set columns on one user with UPDATE ... RETURNING. Returns None if
+        there is no such user, or always without returning.
+        """
+        return await self._write(
+            User, update(User).where(User.id == user_id).values(**values), returning
+        )
+
     async def create_chess_game(
         self,
         white_player_id: Optional[str],
         black_player_id: Optional[str],
         winner: str = None,
         end_reason: str = None,
-    ) -> ChessGame:
+        returning: bool = True,
+    ) -> Optional[ChessGame]:
         game_data = {
             "id": str(uuid4()),
             "white_player_id": white_player_id,
@@ -115,24 +157,73 @@ class DatabaseService:
             "winner": winner,
             "end_reason": end_reason,
         }
-        chess_game = ChessGame(**game_data)
-        self.session.add(chess_game)
+        return await self._write(
+            ChessGame, insert(ChessGame).values(**game_data), returning
+        )
+
+    async def get_user_elos(
+        self, user_ids: list[str], for_update: bool = False
+    ) -> dict[str, Optional[int]]:
+        """
+        Fetch several users' ratings in one query; unknown ids are skipped.
+        With for_update the rows stay locked until the session commits, so
+        nobody else can rate these players in between. Rows are locked in id
+        order, so two such transactions cannot deadlock.
+        """
+        if not user_ids:
+            return {}
+        statement = select(User.id, User.elo).where(User.id.in_(user_ids))
+        if for_update:
+            statement = statement.order_by(User.id).with_for_update()
+        result = await self.session.execute(statement)
+        return {user_id: elo for user_id, elo in result.all()}
+
+    async def insert_games(self, games: list[dict]) -> set[str]:
+        """
+        Insert finished games, each with its own id, skipping any already
+        saved, and return the ids actually inserted. Does not commit, so the
+        caller can rate exactly those games in the same transaction.
+        """
+        if not games:
+            return set()
+        result = await self.session.execute(
+            pg_insert(ChessGame)
+            .values(games)
+            .on_conflict_do_nothing(index_elements=[ChessGame.id])
+            .returning(ChessGame.id)
+        )
+        return set(result.scalars().all())
+
+    async def save_ratings(self, elos: dict[str, int]) -> None:
+        """Set several users' ratings in one UPDATE ... FROM VALUES, then commit."""
+        if elos:
+            ratings = values(
+                column("id", String), column("elo", Integer), name="ratings"
+            ).data(list(elos.items()))
+            await self.session.execute(
+                update(User)
+                .where(User.id == ratings.c.id)
+                .values(elo=ratings.c.elo)
+                .execution_options(synchronize_session=False)
+            )
         await self.session.commit()
-        await self.session.refresh(chess_game)
-        return chess_game
+        for user_id in elos:
+            self._user_changed(user_id)
 
-    async def create_refresh_token(self, token_data: dict) -> RefreshToken:
+    async def create_refresh_token(
+        self, token_data: dict, returning: bool = True
+    ) -> Optional[RefreshToken]:
         """Create a new refresh token in the database"""
-        refresh_token_obj = RefreshToken(**token_data)
-        self.session.add(refresh_token_obj)
-        await self.session.commit()
-        await self.session.refresh(refresh_token_obj)
-        return refresh_token_obj
+        return await self._write(
+            RefreshToken, insert(RefreshToken).values(**token_data), returning
+        )
 
     async def get_refresh_token(self, token: str) -> Optional[RefreshToken]:
         """Get refresh token by token string"""
         result = await self.session.execute(
-            select(RefreshToken).where(RefreshToken.token == token)
+            select(RefreshToken)
+            .where(RefreshToken.token == token)
+            .execution_options(statement_name="get_refresh_token")
         )
         return result.scalar_one_or_none()
 
@@ -1,10 +1,13 @@
 """ELO rating calculation service."""
 
 import logging
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 
 from .database_service import DatabaseService
 
+if TYPE_CHECKING:
+    from .persistence import FinishedGame
+
 
 class EloService:
     """Service for calculating and updating ELO ratings."""
@@ -45,71 +48,93 @@ class EloService:
 
         return round(rating_change)
 
-    async def update_ratings(
-        self, 
-        white_id: str, 
-        black_id: str, 
-        winner: str,
-        get_user_info_func,
-        db_service: DatabaseService
+    def rating_changes(
+        self, white_elo: int, black_elo: int, winner: str
     ) -> Optional[tuple[int, int]]:
         """
-        Update ELO ratings for both players after a completed game.
-        
+        Rating changes for both players after a game.
+
         Args:
-            white_id: White player ID
-            black_id: Black player ID  
+            white_elo: White player's rating before the game
+            black_elo: Black player's rating before the game
             winner: 'white', 'black', or 'draw'
-            get_user_info_func: Function to get user info
-            db_service: Database service instance
-            
+
         Returns:
-            Tuple of (white_rating_change, black_rating_change) or None if skipped
+            Tuple of (white_rating_change, black_rating_change) or None if the
+            winner is not recognised
         """
-        # Skip rating updates for guest players
-        if white_id.startswith("guest_") or black_id.startswith("guest_"):
-            logging.info("Skipping ELO updates for guest players")
+        if winner == "white":
+            white_result, black_result = "win", "loss"
+        elif winner == "black":
+            white_result, black_result = "loss", "win"
+        elif winner == "draw":
+            white_result, black_result = "draw", "draw"
+        else:
+            logging.warning(f"Unknown game winner: {winner}, skipping ELO updates")
             return None
 
-        try:
-            # Get current ratings
-            white_info = await get_user_info_func(white_id)
-            black_info = await get_user_info_func(black_id)
-            white_elo = white_info["elo"] or self.DEFAULT_RATING
-            black_elo = black_info["elo"] or self.DEFAULT_RATING
-
-            # Determine results for each player
-            if winner == "white":
-                white_result = "win"
-                black_result = "loss"
-            elif winner == "black":
-                white_result = "loss"
-                black_result = "win"
-            elif winner == "draw":
-                white_result = "draw"
-                black_result = "draw"
-            else:
-                logging.warning(f"Unknown game winner: {winner}, skipping ELO updates")
-                return None
-
-            # Calculate rating changes
-            white_change = self.calculate_rating_change(white_elo, black_elo, white_result)
-            black_change = self.calculate_rating_change(black_elo, white_elo, black_result)
-
-            # Update ratings in database
-            new_white_elo = white_elo + white_change
-            new_black_elo = black_elo + black_change
-
-            await db_service.update_user_elo(white_id, new_white_elo)
-            await db_service.update_user_elo(black_id, new_black_elo)
-
-            logging.info(
-                f"ELO updated - White: {white_elo} → {new_white_elo} ({white_change:+d}), "
-                f"Black: {black_elo} → {new_black_elo} ({black_change:+d})"
-            )
-            
-            return (white_change, black_change)
-
-        except Exception as e:
-            logging.error(f"Failed to update ELO ratings: {e}")
-            return None
\ No newline at end of file
+        return (
+            self.calculate_rating_change(white_elo, black_elo, white_result),
+            self.calculate_rating_change(black_elo, white_elo, black_result),
+        )
+
+    def new_ratings(
+        self,
+        results: list[tuple[str, str, str]],
+        stored: dict[str, Optional[int]],
+    ) -> dict[str, int]:
+        """
+        Apply game results in order to the stored ratings.
+
+        Args:
+            results: (white_id, black_id, winner) per game, oldest first
+            stored: Current rating per player (None for unrated); games with a
+                player missing from it are skipped
+
+        Returns:
+            New rating for every player whose rating changed
+        """
+        elos: dict[str, int] = {}
+        for white_id, black_id, winner in results:
+            if white_id not in stored or black_id not in stored:
+                continue
+            white_elo = elos.get(white_id, stored[white_id] or self.DEFAULT_RATING)
+            black_elo = elos.get(black_id, stored[black_id] or self.DEFAULT_RATING)
+            changes = self.rating_changes(white_elo, black_elo, winner)
+            if changes:
+                elos[white_id] = white_elo + changes[0]
+                elos[black_id] = black_elo + changes[1]
+        return elos
+
+    async def save_games(
+        self, games: list["FinishedGame"], db_service: DatabaseService
+    ) -> dict[str, int]:
+        """
+        Save finished games and rate the rated ones in one transaction: the
+        players' rating rows are locked, the games inserted, and the new
+        ratings written together. Games already saved by an earlier attempt
+        are skipped, so they are never rated twice.
+
+        Args:
+            games: Finished games, oldest first
+            db_service: Database service instance
+
+        Returns:
+            New rating for every player whose rating changed
+        """
+        players = {
+            player
+            for game in games
+            if game.rated
+            for player in (game.white_player_id, game.black_player_id)
+        }
+        stored = await db_service.get_user_elos(list(players), for_update=True)
+        inserted = await db_service.insert_games([game.to_row() for game in games])
+        results = [
+            (game.white_player_id, game.black_player_id, game.winner)
+            for game in games
+            if game.rated and game.id in inserted
+        ]
+        elos = self.new_ratings(results, stored)
+        await db_service.save_ratings(elos)
+        return elos
@@ -3,6 +3,7 @@
 from typing import Optional, Tuple
 
 from app.svc.room import Room
+from app.svc.room_threads import RoomThreads
 
 from ..obj.game import GameStatus
 from ..obj.position import Position
@@ -11,6 +12,10 @@ from ..obj.position import Position
 class GameService:
     """Service for handling chess game business logic operations."""
 
+    def __init__(self, room_threads: Optional[RoomThreads] = None):
+        # Moves are validated and applied on the room's thread, if configured
+        self.room_threads = room_threads or RoomThreads()
+
     async def process_move(
         self,
         room: Room,
@@ -35,7 +40,9 @@ class GameService:
         start = Position(from_pos[0], from_pos[1])
         end = Position(to_pos[0], to_pos[1])
 
-        return room.game.move(start, end, player_color, promotion)
+        return await self.room_threads.run(
+            room.id, room.game.move, start, end, player_color, promotion
+        )
 
     async def process_resignation(self, room: Room, player_color: str) -> bool:
         """
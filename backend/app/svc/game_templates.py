@@ -0,0 +1,114 @@
+"""
+Prebuilt starting positions, one per pair of loadouts.
+
+Building a game board piece by piece, applying modifiers and generating the
+first move lists costs far more than copying a finished board. Rooms are
+opened from a GameTemplate instead: an immutable starting board with the
+players' modifiers applied, plus everything the first broadcast needs.
+Templates are kept in an LRU keyed by the two loadouts, so players who
+rematch or share a loadout reuse the same template.
+"""
+
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Optional
+
+from app.engine.zobrist import position_key
+from app.obj.board import Board
+from app.obj.game import Game
+from app.obj.modifier import Modifier
+from app.svc.position_service import PositionSummary, summarise
+
+if TYPE_CHECKING:
+    from app.svc.room import CompiledLoadout
+
+DEFAULT_TEMPLATE_CACHE_SIZE = 1024
+
+# One side's modifiers as (row, col, modifier type), in loadout order
+SideKey = tuple[tuple[int, int, str], ...]
+
+
+def side_key(assignments: list[tuple[int, int, Modifier]]) -> SideKey:
+    return tuple(
+        (row, col, modifier.modifier_type) for row, col, modifier in assignments
+    )
+
+
+class GameTemplate:
+    """
+    A starting position with modifiers applied. The board must never be
+    changed: games get their own copy from new_game().
+    """
+
+    def __init__(
+        self,
+        white: list[tuple[int, int, Modifier]],
+        black: list[tuple[int, int, Modifier]],
+    ):
+        self.board = Board()
+        for row, col, modifier in (*white, *black):
+            self.board.squares[row][col].add_modifier(modifier)
+        self.position_hash = self.board.get_position_hash("white")
+        self.key = position_key(self.board, "white")
+        # The first broadcast: move lists, check flags and squares
+        self.summary: PositionSummary = summarise(self.board, "white")
+        self.squares = self.board.get_squares()
+
+    def new_game(self) -> Game:
+        return Game(self.board.copy(), self.position_hash)
+
+    def is_unchanged(self, game: Game) -> bool:
+        """Whether game is still in this template's position (no move made yet)."""
+        return game.board.last_move is None and game.turn == "white"
+
+
+class GameTemplates:
+    """LRU of game templates keyed by (white loadout, black loadout)."""
+
+    def __init__(self, max_size: int = DEFAULT_TEMPLATE_CACHE_SIZE):
+        self.max_size = max_size
+        self.templates: OrderedDict[tuple[SideKey, SideKey], GameTemplate] = (
+            OrderedDict()
+        )
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self.templates)
+
+    def get(
+        self,
+        white: Optional["CompiledLoadout"],
+        black: Optional["CompiledLoadout"],
+    ) -> GameTemplate:
+        """
+        The template for white's white-side and black's black-side modifiers.
+        A missing loadout (a guest, or one that failed to load) means none.
+        """
+        white_side = white["white"] if white else []
+        black_side = black["black"] if black else []
+        key = (side_key(white_side), side_key(black_side))
+
+        template = self.templates.get(key)
+        if template is not None:
+            self.hits += 1
+            self.templates.move_to_end(key)
+            return template
+
+        self.misses += 1
+        template = GameTemplate(white_side, black_side)
+        self.templates[key] = template
+        while len(self.templates) > self.max_size:
+            self.templates.popitem(last=False)
+            self.evictions += 1
+        return template
+
+    def get_stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.templates),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,200 @@
+"""Rating-banded matchmaking queue."""
+
+import time
+from collections import deque
+from typing import Optional
+
+BAND_WIDTH = 100  # Rating points per bucket
+INITIAL_WINDOW = 100  # Rating difference accepted straight away
+WINDOW_GROWTH_PER_SECOND = 25  # Extra difference accepted per second waited
+MAX_WINDOW = 3000  # Wide enough to match anyone
+UNRATED = 1200  # Rating used for guests
+WAIT_SAMPLES = 1000  # Recent time-to-match samples kept for percentiles
+MAX_SCAN_PER_BAND = 32  # Waiting players considered per band on each lookup
+
+
+class QueueEntry:
+    def __init__(self, user_id: str, rating: int, joined_at: float):
+        self.user_id = user_id
+        self.rating = rating
+        self.joined_at = joined_at
+        self.active = True  # Cleared when the player leaves or is matched
+
+    def window(self, now: float) -> float:
+        """Largest rating difference this player accepts after waiting until now."""
+        waited = max(0.0, now - self.joined_at)
+        return min(MAX_WINDOW, INITIAL_WINDOW + WINDOW_GROWTH_PER_SECOND * waited)
+
+
+class MatchmakingQueue:
+    """
+    Waiting players in FIFO deques bucketed by rating band, plus a dict from
+    user id to entry for O(1) membership checks and removal. Removed entries
+    are only marked inactive and are dropped when a lookup walks past them
+    (or when a deque is mostly inactive entries), so joining and leaving are
+    both amortised O(1).
+
+    Two players can be paired when their rating difference is within the
+    window of the one who has waited longer. Windows widen with waiting time,
+    so no one waits forever for a close match. A lookup only considers the
+    MAX_SCAN_PER_BAND longest-waiting players of each band, which keeps a
+    matchmaking tick linear in the number of players; anyone further back is
+    considered once those ahead of them are matched or their windows widen.
+    """
+
+    def __init__(self):
+        self.buckets: dict[int, deque[QueueEntry]] = {}
+        self.entries: dict[str, QueueEntry] = {}
+        self.band_sizes: dict[int, int] = {}  # Players queued per band
+        self.wait_times: deque[float] = deque(maxlen=WAIT_SAMPLES)
+        self.matched = 0
+        self.visits = 0  # Deque entries examined by lookups
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self.entries
+
+    def add(
+        self, user_id: str, rating: Optional[int], now: Optional[float] = None
+    ) -> bool:
+        """Queue a player. Returns False if they are already queued."""
+        if user_id in self.entries:
+            return False
+        entry = QueueEntry(
+            user_id,
+            UNRATED if rating is None else rating,
+            time.time() if now is None else now,
+        )
+        band = self._band(entry.rating)
+        self.entries[user_id] = entry
+        self.buckets.setdefault(band, deque()).append(entry)
+        self.band_sizes[band] = self.band_sizes.get(band, 0) + 1
+        self._compact(band)
+        return True
+
+    def remove(self, user_id: str) -> bool:
+        """Take a player out of the queue. Returns False if they were not queued."""
+        entry = self.entries.pop(user_id, None)
+        if entry is None:
+            return False
+        self._deactivate(entry)
+        return True
+
+    def find_match(self, user_id: str, now: Optional[float] = None) -> Optional[str]:
+        """
+        Return the best opponent for a queued player without removing either:
+        the longest-waiting acceptable player in the nearest rating band.
+        """
+        entry = self.entries.get(user_id)
+        if entry is None:
+            return None
+        now = time.time() if now is None else now
+        band = self._band(entry.rating)
+        # No window is wider than MAX_WINDOW, so bands further away never match
+        for distance in range(MAX_WINDOW // BAND_WIDTH + 2):
+            for other_band in {band - distance, band + distance}:
+                opponent = self._first_acceptable(other_band, entry, now)
+                if opponent is not None:
+                    return opponent.user_id
+        return None
+
+    def pair(self, first: str, second: str, now: Optional[float] = None) -> None:
+        """Remove two matched players, recording how long each waited."""
+        now = time.time() if now is None else now
+        for user_id in (first, second):
+            entry = self.entries.pop(user_id)
+            self._deactivate(entry)
+            self.wait_times.append(now - entry.joined_at)
+        self.matched += 2
+
+    def match_all(self, now: Optional[float] = None) -> list[tuple[str, str]]:
+        """
+        Pair everyone who can be paired, longest waiting first, and remove
+        them. Each pair is (longer waiting, shorter waiting).
+        """
+        now = time.time() if now is None else now
+        pairs = []
+        for user_id in list(self.entries):  # In joining order
+            if user_id not in self.entries:
+                continue  # Already paired with someone who waited longer
+            opponent = self.find_match(user_id, now)
+            if opponent is not None:
+                self.pair(user_id, opponent, now)
+                pairs.append((user_id, opponent))
+        return pairs
+
+    def waiting_since(self, cutoff: float) -> list[QueueEntry]:
+        """Players who joined at or before cutoff, longest waiting first."""
+        waiting = []
+        for entry in self.entries.values():  # In joining order
+            if entry.joined_at > cutoff:
+                break
+            waiting.append(entry)
+        return waiting
+
+    def get_stats(self) -> dict:
+        waits = sorted(self.wait_times)
+
+        def percentile(fraction: float) -> Optional[float]:
+            if not waits:
+                return None
+            return round(waits[min(len(waits) - 1, int(fraction * len(waits)))], 3)
+
+        return {
+            "queued": len(self.entries),
+            "bands": {
+                band * BAND_WIDTH: depth
+                for band, depth in sorted(self.band_sizes.items())
+            },
+            "matched": self.matched,
+            "time_to_match_seconds": {
+                "p50": percentile(0.5),
+                "p90": percentile(0.9),
+                "p99": percentile(0.99),
+            },
+        }
+
+    def _band(self, rating: int) -> int:
+        return rating // BAND_WIDTH
+
+    def _deactivate(self, entry: QueueEntry) -> None:
+        entry.active = False
+        band = self._band(entry.rating)
+        self.band_sizes[band] -= 1
+        if not self.band_sizes[band]:
+            del self.band_sizes[band]
+
+    def _compact(self, band: int) -> None:
+        """Rebuild a deque once inactive entries make up most of it."""
+        bucket = self.buckets[band]
+        if len(bucket) > 2 * self.band_sizes.get(band, 0) + 16:
+            self.buckets[band] = deque(entry for entry in bucket if entry.active)
+
+    def _first_acceptable(
+        self, band: int, entry: QueueEntry, now: float
+    ) -> Optional[QueueEntry]:
+        bucket = self.buckets.get(band)
+        if not bucket:
+            return None
+        # Take entries off the front, dropping players who have left or been
+        # matched for good and putting the waiting ones back in order
+        scanned: list[QueueEntry] = []
+        found = None
+        while bucket and len(scanned) < MAX_SCAN_PER_BAND:
+            candidate = bucket.popleft()
+            self.visits += 1
+            if not candidate.active:
+                continue
+            scanned.append(candidate)
+            if candidate is entry:
+                continue
+            older = candidate if candidate.joined_at <= entry.joined_at else entry
+            if abs(candidate.rating - entry.rating) <= older.window(now):
+                found = candidate
+                break
+        bucket.extendleft(reversed(scanned))
+        if not bucket:
+            del self.buckets[band]
+        return found
@@ -0,0 +1,244 @@
+"""
+Write-behind persistence for finished games and the rating changes they cause.
+
+Finishing a game only appends a record here; nothing on the move path waits
+on the database. A background flusher writes records in batches, each batch
+in one transaction: lock the players' rating rows (SELECT ... FOR UPDATE),
+insert the games (INSERT ... ON CONFLICT DO NOTHING RETURNING id), then set
+the changed ratings in one UPDATE ... FROM VALUES. Ratings are computed from
+the locked values, game by game in the order games finished, so a player who
+finishes two games close together is rated on the result of the first, even
+when another process is saving games for the same player.
+
+Every game gets its id when it is queued, and only games the INSERT actually
+added are rated. Retrying a batch whose commit may or may not have gone
+through therefore neither saves a game twice nor rates it twice.
+
+A batch that fails because the database is unreachable is retried with
+backoff for as long as it takes, while new games wait in the backlog. Any
+other failure is retried up to max_attempts; after that the batch is split
+in half and each half written on its own, splitting again on failure, so one
+bad record costs only itself: it is dropped with an error log listing it,
+and the rest of the batch is saved.
+
+The backlog lives only in this process's memory. Games queued but not yet
+written are lost if the process crashes or is killed; close() drains the
+queue on a clean shutdown. The backlog is also bounded: records arriving
+while it is full (a long outage) are dropped and counted.
+"""
+
+import asyncio
+import itertools
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional
+from uuid import uuid4
+
+from sqlalchemy.exc import DisconnectionError, InterfaceError, OperationalError
+from sqlalchemy.exc import TimeoutError as SQLAlchemyTimeoutError
+
+from ..database import unit_of_work
+from .database_service import DatabaseService
+from .elo_service import EloService
+
+DEFAULT_BATCH_SIZE = 500
+# Seconds between flushes while records keep arriving
+DEFAULT_FLUSH_INTERVAL_SECONDS = 0.5
+DEFAULT_MAX_BACKLOG = 50_000
+DEFAULT_MAX_ATTEMPTS = 5
+RETRY_BACKOFF_SECONDS = 0.5
+MAX_RETRY_BACKOFF_SECONDS = 10.0
+# Longest close() spends writing out the backlog on shutdown
+DRAIN_TIMEOUT_SECONDS = 10.0
+# Failures meaning the database could not be reached, not that a record is bad
+CONNECTION_ERRORS = (
+    DisconnectionError,
+    InterfaceError,
+    OperationalError,
+    SQLAlchemyTimeoutError,
+    OSError,
+    asyncio.TimeoutError,
+)
+
+
+class FinishedGame:
+    """A game to save. Player ids are None for guests."""
+
+    def __init__(
+        self,
+        white_player_id: Optional[str],
+        black_player_id: Optional[str],
+        winner: str,
+        end_reason: str,
+        rated: bool = False,
+    ):
+        # Fixed when queued, so a retried write cannot save the game twice
+        self.id = str(uuid4())
+        self.white_player_id = white_player_id
+        self.black_player_id = black_player_id
+        self.winner = winner
+        self.end_reason = end_reason
+        # Only completed games between two registered players change ratings
+        self.rated = rated and bool(white_player_id and black_player_id)
+
+    def to_row(self) -> dict:
+        return {
+            "id": self.id,
+            "white_player_id": self.white_player_id,
+            "black_player_id": self.black_player_id,
+            "winner": self.winner,
+            "end_reason": self.end_reason,
+        }
+
+
+class PersistenceQueue:
+    """
+    Queues finished games and writes them out in the background. writer
+    saves one batch; by default it writes to the database as described above.
+    """
+
+    def __init__(
+        self,
+        writer: Optional[Callable[[list[FinishedGame]], Awaitable[None]]] = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL_SECONDS,
+        max_backlog: int = DEFAULT_MAX_BACKLOG,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    ):
+        self.writer = writer or self._write
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_backlog = max_backlog
+        self.max_attempts = max_attempts
+        self.elo_service = EloService()
+        self.pending: deque[FinishedGame] = deque()
+        self.task: Optional[asyncio.Task] = None
+        self.closing = False
+        self._wakeup = asyncio.Event()
+        self.saved = 0
+        self.batches = 0
+        self.failures = 0  # Failed attempts, including those later retried
+        self.dropped = 0  # Records lost to a full backlog or repeated failures
+        self.total_flush_time = 0.0
+
+    def __len__(self) -> int:
+        return len(self.pending)
+
+    def record(self, game: FinishedGame) -> bool:
+        """Queue a finished game. Returns False if the backlog is full."""
+        closed = self.closing and self.task is not None and self.task.done()
+        if closed or len(self.pending) >= self.max_backlog:
+            self.dropped += 1
+            logging.error(
+                f"Dropped {game.winner} game between {game.white_player_id} and "
+                f"{game.black_player_id}: persistence queue is "
+                f"{'closed' if closed else 'full'}"
+            )
+            return False
+        self.pending.append(game)
+        if len(self.pending) >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    def start(self) -> None:
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+
+    async def run(self) -> None:
+        """Flush every flush_interval, or sooner once a full batch is waiting."""
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            while self.pending:
+                await self.flush_batch()
+                if len(self.pending) < self.batch_size and not self.closing:
+                    break  # Let a partial batch fill up until the next flush
+            if self.closing and not self.pending:
+                return
+
+    async def flush_batch(self) -> None:
+        """
+        Write the oldest batch, retrying until the database is reachable, then
+        bisecting it to save everything but the records that keep failing.
+        """
+        batch = list(itertools.islice(self.pending, self.batch_size))
+        if not await self._write_retrying(batch, self.max_attempts):
+            await self._write_split(batch)
+        for _ in batch:
+            self.pending.popleft()
+
+    async def _write_retrying(self, batch: list[FinishedGame], attempts: int) -> bool:
+        """
+        Write a batch, retrying connection failures with backoff until they
+        stop and any other failure up to attempts times. Returns whether the
+        batch was saved.
+        """
+        backoff = RETRY_BACKOFF_SECONDS
+        failed = 0
+        while True:
+            started = time.time()
+            try:
+                await self.writer(batch)
+            except Exception as e:
+                self.failures += 1
+                if isinstance(e, CONNECTION_ERRORS):
+                    attempt = "database unreachable, retrying"
+                else:
+                    failed += 1
+                    attempt = f"attempt {failed}/{attempts}"
+                logging.warning(
+                    f"Saving {len(batch)} finished games failed ({attempt}): {e}"
+                )
+                if failed >= attempts:
+                    return False
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, MAX_RETRY_BACKOFF_SECONDS)
+                continue
+            self.total_flush_time += time.time() - started
+            self.batches += 1
+            self.saved += len(batch)
+            return True
+
+    async def _write_split(self, batch: list[FinishedGame]) -> None:
+        """Write each half of a failed batch once, splitting further on failure."""
+        if len(batch) == 1:
+            self.dropped += 1
+            logging.error(f"Gave up saving finished game: {batch[0].to_row()}")
+            return
+        middle = len(batch) // 2
+        for half in (batch[:middle], batch[middle:]):
+            if not await self._write_retrying(half, 1):
+                await self._write_split(half)
+
+    async def close(self, timeout: float = DRAIN_TIMEOUT_SECONDS) -> None:
+        """Write out the backlog, including records that arrive meanwhile."""
+        self.closing = True
+        self._wakeup.set()
+        if self.task is None:
+            self.start()
+        done, _ = await asyncio.wait({self.task}, timeout=timeout)
+        if not done:
+            self.task.cancel()
+            logging.error(f"Shut down with {len(self.pending)} finished games unsaved")
+
+    def get_stats(self) -> dict:
+        return {
+            "backlog": len(self.pending),
+            "saved": self.saved,
+            "batches": self.batches,
+            "failures": self.failures,
+            "dropped": self.dropped,
+            "average_flush_ms": (
+                round(self.total_flush_time / self.batches * 1000, 3)
+                if self.batches
+                else 0.0
+            ),
+        }
+
+    async def _write(self, batch: list[FinishedGame]) -> None:
+        async with unit_of_work() as session:
+            await self.elo_service.save_games(batch, DatabaseService(session))
@@ -0,0 +1,185 @@
+"""Move and premove generation for state broadcasts, optionally off the event loop."""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+from app.engine.fen import board_from_fen, board_to_fen
+from app.obj.board import Board
+from app.obj.chess_move import ChessMove
+from app.obj.constants import BOARD_SIZE
+
+INLINE = "inline"
+THREAD = "thread"  # Only helps on free-threaded Python builds
+PROCESS = "process"
+MODES = {INLINE, THREAD, PROCESS}
+
+DEFAULT_WORKERS = 2
+# Longest to wait for a worker before generating on the event loop instead
+DEFAULT_BUDGET_SECONDS = 0.2
+# Positions with this few pieces are cheaper to do inline than to ship out
+DEFAULT_INLINE_MAX_PIECES = 8
+DEFAULT_CACHE_SIZE = 256
+
+
+class PositionSummary:
+    """What every broadcast needs: each side's move list and check flags."""
+
+    def __init__(
+        self, moves: dict[str, list[ChessMove]], kings_in_check: dict[str, bool]
+    ):
+        self.moves = moves  # Legal moves for the side to move, premoves for the other
+        self.kings_in_check = kings_in_check
+
+
+def summarise(board: Board, turn: str) -> PositionSummary:
+    other = "black" if turn == "white" else "white"
+    return PositionSummary(
+        {
+            turn: board.get_available_moves_for_color(turn),
+            other: board.get_available_premoves_for_color(other),
+        },
+        board.kings_in_check(),
+    )
+
+
+def snapshot(board: Board, turn: str) -> str:
+    """
+    The position as FEN followed by which squares hold a piece that has
+    moved, as a hexadecimal bitmask of row * 8 + col. FEN alone only implies
+    moved flags through castling rights and pawn rows, which misses kings
+    whose rooks are gone and pawns (such as Reverse pawns) back on their
+    starting row, and those flags decide castling and double-step moves.
+    """
+    moved = 0
+    for piece in board.pieces:
+        if piece.moved:
+            row, col = piece.position.coordinates()
+            moved |= 1 << (row * BOARD_SIZE + col)
+    return f"{board_to_fen(board, turn)} {moved:x}"
+
+
+def board_from_snapshot(position: str) -> tuple[Board, str]:
+    fen, _, moved = position.rpartition(" ")
+    board, turn = board_from_fen(fen)
+    mask = int(moved, 16)
+    for piece in board.pieces:
+        row, col = piece.position.coordinates()
+        piece.moved = bool(mask >> (row * BOARD_SIZE + col) & 1)
+    return board, turn
+
+
+def summarise_snapshot(position: str) -> PositionSummary:
+    """Worker entry point: rebuild the position from its snapshot and summarise it."""
+    board, turn = board_from_snapshot(position)
+    return summarise(board, turn)
+
+
+class PositionService:
+    """
+    Produces position summaries for broadcasts.
+
+    In thread or process mode the position is snapshotted (see snapshot(): FEN
+    with modifiers and their uses, plus every piece's moved flag) and
+    summarised by a worker, so the event loop keeps serving other sockets
+    meanwhile. Small positions are summarised inline, and so is any position
+    whose worker result takes longer than the budget or fails. Summaries are
+    cached by snapshot, since a position is often broadcast more than once.
+    """
+
+    def __init__(
+        self,
+        mode: str = INLINE,
+        workers: int = DEFAULT_WORKERS,
+        budget: float = DEFAULT_BUDGET_SECONDS,
+        inline_max_pieces: int = DEFAULT_INLINE_MAX_PIECES,
+        cache_size: int = DEFAULT_CACHE_SIZE,
+    ):
+        if mode not in MODES:
+            raise ValueError(f"Unknown position service mode: {mode}")
+        self.mode = mode
+        self.workers = workers
+        self.budget = budget
+        self.inline_max_pieces = inline_max_pieces
+        self.cache_size = cache_size
+        self.executor: Optional[Executor] = None
+        self.cache: OrderedDict[str, PositionSummary] = OrderedDict()
+        self.offloaded = 0
+        self.inline = 0
+        self.over_budget = 0
+        self.failed = 0
+        self.total_offload_time = 0.0
+
+    def start(self) -> None:
+        if self.executor is None and self.mode != INLINE:
+            if self.mode == THREAD:
+                self.executor = ThreadPoolExecutor(max_workers=self.workers)
+            else:
+                self.executor = ProcessPoolExecutor(max_workers=self.workers)
+
+    def shutdown(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def get_stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "offloaded": self.offloaded,
+            "inline": self.inline,
+            "over_budget": self.over_budget,
+            "failed": self.failed,
+            "average_offload_ms": (
+                round(self.total_offload_time / self.offloaded * 1000, 3)
+                if self.offloaded
+                else 0.0
+            ),
+            "cached": len(self.cache),
+        }
+
+    async def summarise(self, board: Board, turn: str) -> PositionSummary:
+        if self.mode == INLINE or len(board.pieces) <= self.inline_max_pieces:
+            self.inline += 1
+            return summarise(board, turn)
+
+        position = snapshot(board, turn)
+        summary = self.cache.get(position)
+        if summary is not None:
+            self.cache.move_to_end(position)
+            return summary
+
+        self.start()
+        started = time.time()
+        future = asyncio.get_running_loop().run_in_executor(
+            self.executor, summarise_snapshot, position
+        )
+        # A late result is still worth caching for the next broadcast
+        future.add_done_callback(lambda done: self._finished(position, started, done))
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), self.budget)
+        except asyncio.TimeoutError:
+            self.over_budget += 1
+            logging.warning(
+                f"Position summary took over {self.budget}s; generating inline"
+            )
+        except Exception as e:
+            # A snapshot that would not load, or a broken worker pool
+            self.failed += 1
+            logging.error(
+                f"Position summary failed in a worker ({e}); generating inline"
+            )
+        self.inline += 1
+        return summarise(board, turn)
+
+    def _finished(self, position: str, started: float, future: asyncio.Future) -> None:
+        if future.cancelled() or future.exception() is not None:
+            return
+        self.offloaded += 1
+        self.total_offload_time += time.time() - started
+        self.cache[position] = future.result()
+        self.cache.move_to_end(position)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
@@ -4,10 +4,30 @@ from app.obj.game import Game, GameStatus
 from fastapi import WebSocket
 from pydantic import BaseModel
 from ..auth import verify_jwt_token
-from ..database import get_db_session
+from ..database import unit_of_work
 from ..svc.database_service import DatabaseService
-from ..svc.elo_service import EloService
+from ..svc.clock_scheduler import ClockScheduler
+from ..svc.room_actor import RoomActor
+from ..svc.matchmaking import MatchmakingQueue
+from ..svc.position_service import PositionService, summarise
+from ..svc.room_registry import StripedDict
+from ..svc.room_threads import RoomThreads
+from ..svc.cache import AsyncCache
+from ..svc.game_templates import GameTemplate, GameTemplates
+from ..svc.persistence import FinishedGame, PersistenceQueue
+from ..svc.spectators import SPECTATOR_QUEUE_SIZE, SpectatorChannel
+from ..svc.sharding import ShardSpec, shard_for
+from ..svc.binary_protocol import BINARY_SUBPROTOCOL, encode_state, hello_message
+from ..svc.state_delta import (
+    BINARY_PROTOCOL,
+    DELTA_PROTOCOL,
+    JSON_PROTOCOL,
+    PROTOCOLS,
+    StateStream,
+    compact_shared_state,
+)
 from ..obj.modifier import (
+    Modifier,
     KNOOK_MODIFIER,
     DIAGONAL_ROOK_MODIFIER,
     QUOOK_MODIFIER,
@@ -28,12 +48,19 @@ from ..obj.modifier import (
     TELEPORT_MODIFIER,
 )
 from ..obj.position import Position
+import asyncio
+import itertools
+from functools import partial
 import time
 import logging
-from typing import TYPE_CHECKING, Optional
+import orjson
+from collections import deque
+from typing import TYPE_CHECKING, Callable, Optional
 
 if TYPE_CHECKING:
+    from app.db_models import User
     from app.routers.game import Loadout
+    from app.svc.sharding import ShardCoordinator
 
 
 class UserInfo(BaseModel):
@@ -41,21 +68,194 @@ class UserInfo(BaseModel):
     username: str
 
 
+# Seconds a player's rating and username are served from memory
+USER_INFO_TTL_SECONDS = 60.0
+# Seconds a compiled loadout is kept; saving a loadout drops it straight away
+LOADOUT_TTL_SECONDS = 3600.0
+# Seconds between matchmaking passes
+MATCHMAKING_TICK_SECONDS = 0.25
+# Most new arrivals rated and queued per matchmaking pass
+MATCHMAKING_BATCH_SIZE = 500
+# Outbound messages waiting per connection before newer states replace them
+SEND_QUEUE_SIZE = 8
+# A connection whose messages take longer than this to go out is dropped
+MAX_SEND_LAG_SECONDS = 10.0
+
+
 class WebSocketConnection:
-    def __init__(self, websocket: WebSocket):
+    """
+    A websocket with its own writer task. Messages are queued and sent in
+    order, so a slow client only delays itself. When the queue is full, a new
+    full state replaces everything waiting (latest state wins); a connection
+    that cannot get a message out within max_send_lag seconds is closed.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        protocol: str = JSON_PROTOCOL,
+        max_queued: int = SEND_QUEUE_SIZE,
+        max_send_lag: float = MAX_SEND_LAG_SECONDS,
+    ):
         self.websocket = websocket
         self.id = uuid4()
+        self.protocol = protocol
+        self.state_stream = StateStream()
+        self.max_queued = max_queued
+        self.max_send_lag = max_send_lag
+        self.outbox: deque[tuple[float, str | bytes]] = deque()
+        self.ready = asyncio.Event()
+        self.writer: Optional[asyncio.Task] = None
+        self.closed = False
+        self.finishing = False  # Close the socket once the outbox is empty
+        self.sent = 0
+        self.coalesced = 0  # Queued messages replaced by a newer state
+        self.total_lag = 0.0
+        self.max_lag = 0.0
+
+    @property
+    def backlogged(self) -> bool:
+        return len(self.outbox) >= self.max_queued
+
+    def start(self) -> None:
+        if self.writer is None:
+            self.writer = asyncio.create_task(self._write())
+
+    def send(self, message: "str | bytes") -> None:
+        """
+        Queue a message. Callers only send complete states or, for delta
+        streams, a snapshot once backlogged, so dropping what is queued when
+        the queue is full never leaves the client with a gap.
+        """
+        if self.closed:
+            return
+        if self.backlogged:
+            self.coalesced += len(self.outbox)
+            self.outbox.clear()
+        self.outbox.append((time.time(), message))
+        self.ready.set()
+
+    def close(self) -> None:
+        self.closed = True
+        self.outbox.clear()
+        if self.writer is not None and self.writer is not asyncio.current_task():
+            self.writer.cancel()
+
+    def finish(self) -> None:
+        """Send whatever is queued, then close the socket normally."""
+        if self.closed:
+            return
+        self.finishing = True
+        self.ready.set()
+
+    def get_stats(self) -> dict:
+        return {
+            "queued": len(self.outbox),
+            "sent": self.sent,
+            "coalesced": self.coalesced,
+            "average_lag_ms": (
+                round(self.total_lag / self.sent * 1000, 3) if self.sent else 0.0
+            ),
+            "max_lag_ms": round(self.max_lag * 1000, 3),
+        }
+
+    async def _write(self) -> None:
+        while not self.closed:
+            if not self.outbox:
+                if self.finishing:
+                    await self._close_socket(1000)
+                    return
+                self.ready.clear()
+                await self.ready.wait()
+                continue
+
+            queued_at, message = self.outbox.popleft()
+            budget = self.max_send_lag - (time.time() - queued_at)
+            try:
+                if budget <= 0:
+                    raise asyncio.TimeoutError
+                if isinstance(message, bytes):
+                    send = self.websocket.send_bytes(message)
+                else:
+                    send = self.websocket.send_text(message)
+                await self._send_within(send, budget)
+            except asyncio.TimeoutError:
+                logging.warning(
+                    f"Closing connection {self.id}: messages are over "
+                    f"{self.max_send_lag}s behind"
+                )
+                await self._abandon()
+                return
+            except Exception as e:
+                logging.error(f"Failed to send to connection {self.id}: {e}")
+                await self._abandon()
+                return
+
+            lag = time.time() - queued_at
+            self.sent += 1
+            self.total_lag += lag
+            self.max_lag = max(self.max_lag, lag)
+
+    async def _send_within(self, send, budget: float) -> None:
+        """
+        Like asyncio.wait_for, except that cancelling the writer is never lost
+        when the send happens to finish at the same moment (wait_for can
+        swallow it before Python 3.12, leaving the writer waiting forever).
+        """
+        task = asyncio.ensure_future(send)
+        try:
+            done, _ = await asyncio.wait({task}, timeout=budget)
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        if not done:
+            task.cancel()
+            raise asyncio.TimeoutError
+        task.result()
+
+    async def _abandon(self) -> None:
+        """Stop sending and close the socket; the receive loop then cleans up."""
+        self.outbox.clear()
+        await self._close_socket(1013)
+
+    async def _close_socket(self, code: int) -> None:
+        self.closed = True
+        try:
+            await asyncio.wait_for(self.websocket.close(code=code), 1)
+        except Exception:
+            pass
 
 
 class ConnectionManager:
-    def __init__(self):
+    def __init__(
+        self,
+        send_queue_size: int = SEND_QUEUE_SIZE,
+        max_send_lag: float = MAX_SEND_LAG_SECONDS,
+        shard: Optional[ShardSpec] = None,
+    ):
+        self.send_queue_size = send_queue_size
+        self.max_send_lag = max_send_lag
+        self.shard = shard or ShardSpec()
         self.id_to_websocket_connection: dict[UUID, WebSocketConnection] = {}
         self.user_id_to_connection_map: dict[str, list[WebSocketConnection]] = {}
         self.connection_id_to_user_id: dict[UUID, str] = {}
         self.user_id_to_name: dict[str, str] = {}
 
-    async def connect(self, websocket: WebSocket, jwt: Optional[str]) -> UUID:
-        await websocket.accept()
+    async def connect(
+        self,
+        websocket: WebSocket,
+        jwt: Optional[str],
+        protocol: Optional[str] = None,
+    ) -> UUID:
+        # Clients that offer the binary subprotocol get it; others stay on JSON
+        if BINARY_SUBPROTOCOL in websocket.scope.get("subprotocols", []):
+            await websocket.accept(subprotocol=BINARY_SUBPROTOCOL)
+            await websocket.send_json(hello_message())
+            protocol = BINARY_PROTOCOL
+        else:
+            await websocket.accept()
+            if protocol not in PROTOCOLS:
+                protocol = JSON_PROTOCOL
 
         # Extract name from JWT or generate guest name
         if jwt:
@@ -64,14 +264,17 @@ class ConnectionManager:
                 user_id = token_data.sub
                 name = token_data.name if token_data.name else "Player"
             else:
-                user_id = "guest_" + str(uuid4())
+                user_id = "guest_" + str(self.shard.new_uuid("guest_"))
                 name = "Guest"
         else:
-            user_id = "guest_" + str(uuid4())
+            user_id = "guest_" + str(self.shard.new_uuid("guest_"))
             name = "Guest"
 
         # Create connection
-        connection = WebSocketConnection(websocket)
+        connection = WebSocketConnection(
+            websocket, protocol, self.send_queue_size, self.max_send_lag
+        )
+        connection.start()
         self.id_to_websocket_connection[connection.id] = connection
 
         # Add to name mapping
@@ -89,13 +292,32 @@ class ConnectionManager:
         """Return user_id for a given connection ID"""
         return self.connection_id_to_user_id.get(connection_id)
 
+    def get_connection_stats(self) -> dict[str, dict]:
+        """Return outbound queue and lag statistics for every connection."""
+        return {
+            str(connection_id): connection.get_stats()
+            for connection_id, connection in self.id_to_websocket_connection.items()
+        }
+
+
+# A loadout checked against the starting position: (row, col, modifier) per color
+CompiledLoadout = dict[str, list[tuple[int, int, Modifier]]]
+
 
 class Room:
-    def __init__(self):
-        self.id = uuid4()
+    def __init__(
+        self,
+        room_id: Optional[UUID] = None,
+        template: Optional[GameTemplate] = None,
+    ):
+        self.id = room_id or uuid4()
         self.white: str
         self.black: str
-        self.game: Game = Game()
+        # The starting position this room's game was copied from, if any
+        self.template = template
+        self.game: Game = template.new_game() if template else Game()
+        self.actor = RoomActor(self.id)
+        self.spectators = SpectatorChannel(self.id)
 
 
 class RoomService:
@@ -121,76 +343,155 @@ class RoomService:
         "Teleport": TELEPORT_MODIFIER,
     }
 
-    def __init__(self):
-        self.rooms: dict[UUID, Room] = {}
-        self.queue: list[str] = []
-        self.player_to_room_map: dict[str, UUID] = {}
+    def __init__(
+        self,
+        clock_scheduler: Optional[ClockScheduler] = None,
+        shard: Optional[ShardSpec] = None,
+        persistence: Optional[PersistenceQueue] = None,
+    ):
+        # Striped so room threads can look rooms up safely without the GIL
+        self.rooms: StripedDict[UUID, Room] = StripedDict()
+        self.queue = MatchmakingQueue()
+        # Players waiting to be rated and queued by the next matchmaking tick
+        self.arrivals: dict[str, None] = {}
+        # Compiled loadouts, filled when players are queued so that opening a
+        # room needs no database round trip; dropped when a loadout is saved
+        self.loadouts: AsyncCache[str, CompiledLoadout] = AsyncCache(
+            self._load_loadout, ttl=LOADOUT_TTL_SECONDS
+        )
+        self.prefetches: set[asyncio.Task] = set()
+        # Ready-made starting positions for each pair of loadouts
+        self.templates = GameTemplates()
+        self.player_to_room_map: StripedDict[str, UUID] = StripedDict()
+        self.clock_scheduler = clock_scheduler
+        # New rooms get ids that hash to this shard
+        self.shard = shard or ShardSpec()
+        self.room_closed_listener: Optional[Callable[[Room], None]] = None
+        # Finished games are saved (and rated) in the background
+        self.persistence = (
+            persistence if persistence is not None else PersistenceQueue()
+        )
 
     def add_to_queue(self, name: str):
-        """Add a player to the queue if not already present."""
+        """Add a player to the queue at the next matchmaking tick."""
         if name not in self.queue:
-            self.queue.append(name)
+            self.arrivals[name] = None
+
+    def remove_from_queue(self, name: str):
+        """Remove a player from the queue if present."""
+        self.arrivals.pop(name, None)
+        self.queue.remove(name)
 
     def queue_length(self) -> int:
         """Return the number of players in the queue."""
-        return len(self.queue)
+        return len(self.queue) + len(self.arrivals)
+
+    async def admit_arrivals(self, limit: int = MATCHMAKING_BATCH_SIZE) -> int:
+        """
+        Queue up to limit new arrivals with their ratings, fetching every
+        registered player's rating and loadout in one query. Returns the
+        number of players queued.
+        """
+        batch = list(itertools.islice(self.arrivals, limit))
+        if not batch:
+            return 0
+        users = await self._get_users(
+            [user_id for user_id in batch if not user_id.startswith("guest_")]
+        )
+
+        admitted = 0
+        for user_id in batch:
+            # Players who disconnected during the query are no longer arrivals
+            if user_id not in self.arrivals:
+                continue
+            del self.arrivals[user_id]
+            # Nor are those already seated or queued, such as a player who
+            # reconnected while their room was still being opened
+            if user_id in self.player_to_room_map or user_id in self.queue:
+                continue
+            user = users.get(user_id)
+            self.queue.add(user_id, user.elo if user else None)
+            if user and self.loadouts.peek(user_id) is None:
+                self.loadouts.put(user_id, self.compile_loadout(user.loadout))
+            admitted += 1
+        return admitted
+
+    def prefetch_loadout(self, user_id: str) -> None:
+        """Start loading a player's compiled loadout unless it is cached."""
+        if user_id.startswith("guest_") or self.loadouts.peek(user_id) is not None:
+            return
+        task = asyncio.create_task(self._get_compiled_loadout(user_id))
+        self.prefetches.add(task)
+        task.add_done_callback(self.prefetches.discard)
+
+    def match_waiting_players(self) -> list[tuple[str, str]]:
+        """Pair every queued player who has an acceptable opponent."""
+        return self.queue.match_all()
+
+    async def _get_users(self, user_ids: list[str]) -> dict[str, "User"]:
+        if not user_ids:
+            return {}
+        try:
+            async with unit_of_work() as session:
+                db_service = DatabaseService(session)
+                users = await db_service.get_users_by_ids(user_ids)
+                return {user.id: user for user in users}
+        except Exception as e:
+            logging.error(f"Error loading {len(user_ids)} queued players: {e}")
+        return {}
+
+    def get_matchmaking_stats(self) -> dict:
+        """Return queue depth by rating band and time-to-match percentiles."""
+        return self.queue.get_stats()
 
     async def new_room(self, white: str, black: str) -> UUID:
         """Create a new room with the given players."""
-        room = Room()
+        # Both loadouts are normally cached, so this rarely waits
+        template = self.templates.get(
+            await self._get_compiled_loadout(white),
+            await self._get_compiled_loadout(black),
+        )
+        room = Room(self.shard.new_uuid(), template)
         room.white = white
         room.black = black
         self.rooms[room.id] = room
 
-        if white in self.queue:
-            self.queue.remove(white)
-            self.player_to_room_map[white] = room.id
-        if black in self.queue:
-            self.queue.remove(black)
-            self.player_to_room_map[black] = room.id
+        if white in self.queue and black in self.queue:
+            self.queue.pair(white, black)
+        self.player_to_room_map[white] = room.id
+        self.player_to_room_map[black] = room.id
 
-        # Load and apply loadouts for both players
-        await self._apply_player_loadouts(room)
+        if self.clock_scheduler:
+            self.clock_scheduler.watch(room.id, room.game)
+        room.actor.start()
 
         return room.id
 
-    async def _apply_player_loadouts(self, room: Room):
-        """Load and apply loadouts for both players in the room."""
-        # Load loadouts for both players
-        white_loadout = await self._get_player_loadout(room.white)
-        black_loadout = await self._get_player_loadout(room.black)
-
-        # Apply white's loadout
-        if white_loadout:
-            self._apply_loadout_to_board(room.game.board, white_loadout, "white")
-
-        # Apply black's loadout
-        if black_loadout:
-            self._apply_loadout_to_board(room.game.board, black_loadout, "black")
-
-    async def _get_player_loadout(self, player_id: str) -> "Loadout | dict | None":
-        """Get the loadout for a player from the database."""
+    async def _get_compiled_loadout(self, player_id: str) -> Optional[CompiledLoadout]:
         # Skip guest players
         if not player_id or player_id.startswith("guest_"):
             return None
-
         try:
-            async for session in get_db_session():
-                db_service = DatabaseService(session)
-                user = await db_service.get_user_by_id(player_id)
-                if user and user.loadout:
-                    return user.loadout
-                return None
+            return await self.loadouts.get(player_id)
         except Exception as e:
             logging.error(f"Error loading loadout for player {player_id}: {e}")
             return None
 
-    def _apply_loadout_to_board(
-        self, board: Board, loadout_data: "Loadout | dict | None", player_color: str
-    ) -> None:
-        """Apply a loadout to the board for a specific player."""
+    async def _load_loadout(self, player_id: str) -> CompiledLoadout:
+        """Get the loadout for a player from the database and compile it."""
+        async with unit_of_work() as session:
+            db_service = DatabaseService(session)
+            user = await db_service.get_user_by_id(player_id)
+            return self.compile_loadout(user.loadout if user else None)
+
+    def compile_loadout(self, loadout_data: "Loadout | dict | None") -> CompiledLoadout:
+        """
+        Check a stored loadout against the starting position and resolve its
+        modifiers, keeping the (row, col, modifier) assignments that apply.
+        """
+        compiled: CompiledLoadout = {"white": [], "black": []}
         if not loadout_data:
-            return
+            return compiled
 
         # Convert Loadout model to dict if needed
         if hasattr(loadout_data, "model_dump"):
@@ -198,51 +499,53 @@ class RoomService:
         else:
             loadout_dict = loadout_data
 
-        # Extract the loadout array for this player's color
-        # The loadout is stored as {"white": [...], "black": [...]}
-        loadout = loadout_dict.get(player_color, [])
-
-        for piece_loadout in loadout:
-            # Get the position as [row, col] array
-            pos = piece_loadout.get("pos", [0, 0])
-            if not isinstance(pos, list) or len(pos) != 2:
-                logging.warning(f"Invalid pos format for {player_color}")
-                continue
-
-            row, col = pos
-
-            # Mirror column for black pieces
-            # Black's a-file should be at column 0, but from black's perspective
-            # the UI shows it mirrored, so we need to flip it back
-            if player_color == "black":
-                col = 7 - col
-
-            # Get the piece at this position
-            piece = board.piece_from_position(Position(row, col))
-            if not piece:
-                logging.warning(
-                    f"No piece found at position ({row}, {col}) for {player_color}"
-                )
-                continue
+        board = self._starting_board()
+        for player_color in ("white", "black"):
+            # The loadout is stored as {"white": [...], "black": [...]}
+            for piece_loadout in loadout_dict.get(player_color, []):
+                # Get the position as [row, col] array
+                pos = piece_loadout.get("pos", [0, 0])
+                if not isinstance(pos, list) or len(pos) != 2:
+                    logging.warning(f"Invalid pos format for {player_color}")
+                    continue
+
+                row, col = pos
+
+                # Mirror column for black pieces
+                # Black's a-file should be at column 0, but from black's perspective
+                # the UI shows it mirrored, so we need to flip it back
+                if player_color == "black":
+                    col = 7 - col
+
+                piece = board.piece_from_position(Position(row, col))
+                if not piece or piece.color != player_color:
+                    logging.warning(
+                        f"No piece found at position ({row}, {col}) for {player_color}"
+                    )
+                    continue
 
-            # Apply single modifier to the piece
-            modifier_name = piece_loadout.get("modifier")
-            if not modifier_name:
-                continue
+                modifier_name = piece_loadout.get("modifier")
+                if not modifier_name:
+                    continue
 
-            modifier = self.MODIFIERS_MAP.get(modifier_name)
-            if modifier:
-                success = piece.add_modifier(modifier)
-                if success:
-                    logging.info(
-                        f"Applied {modifier_name} to {player_color} {piece.type} at ({row}, {col})"
-                    )
-                else:
+                modifier = self.MODIFIERS_MAP.get(modifier_name)
+                if not modifier:
+                    logging.warning(f"Unknown modifier: {modifier_name}")
+                elif not modifier.can_apply_to_piece(piece.type):
                     logging.warning(
-                        f"Failed to apply {modifier_name} to {player_color} {piece.type} at ({row}, {col})"
+                        f"Cannot apply {modifier_name} to {player_color} {piece.type} at ({row}, {col})"
                     )
-            else:
-                logging.warning(f"Unknown modifier: {modifier_name}")
+                else:
+                    compiled[player_color].append((row, col, modifier))
+        return compiled
+
+    _starting_position: Optional[Board] = None
+
+    @classmethod
+    def _starting_board(cls) -> Board:
+        if cls._starting_position is None:
+            cls._starting_position = Board()
+        return cls._starting_position
 
     def find_player_room(self, player_name: str) -> Optional[Room]:
         """Find the room ID for a given player."""
@@ -255,6 +558,12 @@ class RoomService:
         """Get a room by its ID."""
         return self.rooms.get(room_id)
 
+    def get_queue_stats(self) -> dict[str, dict]:
+        """Return inbound queue statistics for every room."""
+        return {
+            str(room_id): room.actor.get_stats() for room_id, room in self.rooms.items()
+        }
+
     async def cleanup_room(self, room_id: UUID):
         """Remove a completed game and clean up player mappings."""
         if room_id not in self.rooms:
@@ -262,84 +571,87 @@ class RoomService:
 
         room = self.rooms[room_id]
 
-        # Save game to database if it was completed or aborted
+        # Queue completed and aborted games to be saved (and rated) by the
+        # persistence flusher, so closing the room never waits on the database
         if room.game.status in [GameStatus.COMPLETE, GameStatus.ABORTED]:
-            session = None
-            try:
-                async for session in get_db_session():
-                    db_service = DatabaseService(session)
-                    winner = (
-                        room.game.winner
-                        if room.game.status == GameStatus.COMPLETE
-                        else "aborted"
-                    )
-                    end_reason = (
-                        room.game.end_reason
-                        if room.game.status == GameStatus.COMPLETE
-                        else "aborted"
-                    )
-                    # Convert guest player IDs to None for database storage
-                    white_db_id = (
+            completed = room.game.status == GameStatus.COMPLETE
+            self.persistence.record(
+                FinishedGame(
+                    # Guest player IDs are stored as None
+                    white_player_id=(
                         None if room.white.startswith("guest_") else room.white
-                    )
-                    black_db_id = (
+                    ),
+                    black_player_id=(
                         None if room.black.startswith("guest_") else room.black
-                    )
-
-                    await db_service.create_chess_game(
-                        white_player_id=white_db_id,
-                        black_player_id=black_db_id,
-                        winner=winner,
-                        end_reason=end_reason,
-                    )
-
-                    status_text = (
-                        "completed"
-                        if room.game.status == GameStatus.COMPLETE
-                        else "aborted"
-                    )
-                    logging.info(f"Saved {status_text} game {room_id} to database")
-                    break  # Exit the async generator after successful operation
-            except Exception as e:
-                logging.error(f"Error saving game {room_id} to database: {e}")
-            finally:
-                # Session cleanup is handled by get_db_session() context manager
-                pass
+                    ),
+                    winner=room.game.winner if completed else "aborted",
+                    end_reason=room.game.end_reason if completed else "aborted",
+                    rated=completed,
+                )
+            )
 
         # Clean up player mappings
-        if room.white in self.player_to_room_map:
-            del self.player_to_room_map[room.white]
-        if room.black in self.player_to_room_map:
-            del self.player_to_room_map[room.black]
+        self.player_to_room_map.pop(room.white, None)
+        self.player_to_room_map.pop(room.black, None)
         # Remove the room
         del self.rooms[room_id]
+        room.actor.close()
+        room.spectators.close()
+        if self.clock_scheduler:
+            self.clock_scheduler.unwatch(room_id)
+        if self.room_closed_listener:
+            self.room_closed_listener(room)
         logging.info(f"Cleaned up completed game {room_id}")
 
 
 class RoomManager:
-    def __init__(self, manager: ConnectionManager, room_service: RoomService):
+    def __init__(
+        self,
+        manager: ConnectionManager,
+        room_service: RoomService,
+        position_service: Optional[PositionService] = None,
+        room_threads: Optional[RoomThreads] = None,
+    ):
         self.room_service = room_service
         self.manager = manager
-        self.elo_service = EloService()
+        self.position_service = position_service or PositionService()
+        self.room_threads = room_threads or RoomThreads()
+        # Dropped by DatabaseService when a user's rating or username changes
+        self.user_info_cache: AsyncCache[str, UserInfo] = AsyncCache(
+            self._load_user_info, ttl=USER_INFO_TTL_SECONDS
+        )
+        # Set by main.py when running as one of several shard processes
+        self.shards: Optional["ShardCoordinator"] = None
 
     async def get_user_info(self, user_id: str) -> UserInfo:
-        """Get user info (ELO and username) in a single query."""
+        """Get user info (ELO and username), from memory when cached."""
         if not user_id or user_id.startswith("guest_"):
             return UserInfo(elo=None, username="Guest")
 
-        session = None
         try:
-            async for session in get_db_session():
-                db_service = DatabaseService(session)
-                user = await db_service.get_user_by_id(user_id)
-                return UserInfo(
-                    elo=user.elo if user else None,
-                    username=user.username if user and user.username else "Guest",
-                )
+            return await self.user_info_cache.get(user_id)
         except Exception as e:
             logging.error(f"Error fetching user info for user {user_id}: {e}")
         return UserInfo(elo=None, username="Guest")
 
+    async def _load_user_info(self, user_id: str) -> UserInfo:
+        """Load user info (ELO and username) in a single query."""
+        async with unit_of_work() as session:
+            db_service = DatabaseService(session)
+            user = await db_service.get_user_by_id(user_id)
+            return UserInfo(
+                elo=user.elo if user else None,
+                username=user.username if user and user.username else "Guest",
+            )
+
+    def get_cache_stats(self) -> dict[str, dict]:
+        """Return size and hit-rate statistics for the in-process caches."""
+        return {
+            "user_info": self.user_info_cache.get_stats(),
+            "loadouts": self.room_service.loadouts.get_stats(),
+            "game_templates": self.room_service.templates.get_stats(),
+        }
+
     async def get_user_elo(self, user_id: str) -> Optional[int]:
         """Get the ELO rating for a user."""
         user_info = await self.get_user_info(user_id)
@@ -351,53 +663,101 @@ class RoomManager:
         return user_info.username
 
     async def cleanup_room_with_elo_update(self, room_id: UUID):
-        """Clean up a room and update ELO ratings if the game was completed."""
-        if room_id not in self.room_service.rooms:
-            return
-
-        room = self.room_service.rooms[room_id]
-
-        # Update ELO ratings for completed games before cleanup
-        if room.game.status == GameStatus.COMPLETE:
-            session = None
-            try:
-                async for session in get_db_session():
-                    db_service = DatabaseService(session)
-                    await self.elo_service.update_ratings(
-                        room.white,
-                        room.black,
-                        room.game.winner,
-                        self.get_user_info,
-                        db_service,
-                    )
-                    break  # Exit the async generator after successful operation
-            except Exception as e:
-                logging.error(f"Error updating ELO ratings for room {room_id}: {e}")
-            finally:
-                # Session cleanup is handled by get_db_session() context manager
-                pass
-
-        # Now clean up the room
+        """
+        Clean up a room. Completed games between registered players are rated
+        when the persistence queue saves them.
+        """
         await self.room_service.cleanup_room(room_id)
 
-    async def connect(self, websocket, jwt: Optional[str] = None) -> str:
+    async def connect(
+        self, websocket, jwt: Optional[str] = None, protocol: Optional[str] = None
+    ) -> str:
         """Connect a player to the WebSocket and return their name."""
-        connection_id = await self.manager.connect(websocket, jwt)
+        connection_id = await self.manager.connect(websocket, jwt, protocol)
         name = self.manager.connection_id_to_user_id.get(connection_id)
         existing_room = self.room_service.find_player_room(name)
         if existing_room:
-            await self.emit_game_state_to_room(existing_room.id)
+            # Through the actor, so the game is not read mid-move
+            existing_room.actor.submit(
+                partial(self.emit_game_state_to_room, existing_room.id), internal=True
+            )
+        elif self.shards and self.shards.route_connection(
+            name, self.manager.id_to_websocket_connection[connection_id]
+        ):
+            # Served by another shard, or already waiting on the lobby shard
+            pass
         else:
-            # If the player is not already in a room, add them to the queue
+            # If the player is not already in a room, the matchmaking tick
+            # will queue and pair them
             self.room_service.add_to_queue(name)
-            if self.room_service.queue_length() >= 2:
-                room_id = await self.room_service.new_room(
-                    self.room_service.queue[0], self.room_service.queue[1]
-                )
-                await self.emit_game_state_to_room(room_id)
 
         return connection_id
 
+    async def run_matchmaking(self, interval: float = MATCHMAKING_TICK_SECONDS):
+        """Background task that pairs waiting players every interval seconds."""
+        while True:
+            try:
+                await self.matchmaking_tick()
+            except Exception as e:
+                logging.error(f"Error in matchmaking tick: {e}")
+            await asyncio.sleep(interval)
+
+    async def matchmaking_tick(self) -> list[UUID]:
+        """Queue new arrivals, pair everyone who can be paired, and open their rooms."""
+        await self.room_service.admit_arrivals()
+        pairs = self.room_service.match_waiting_players()
+        # The player who has been waiting longer plays white
+        room_ids = list(
+            await asyncio.gather(
+                *(self.room_service.new_room(white, black) for white, black in pairs)
+            )
+        )
+        await asyncio.gather(
+            *(self.emit_game_state_to_room(room_id) for room_id in room_ids)
+        )
+        if self.shards:
+            self.shards.after_tick(room_ids)
+        return room_ids
+
+    async def watch(self, websocket, room_id: UUID) -> Optional[WebSocketConnection]:
+        """
+        Subscribe a read-only spectator to a room. Returns their connection,
+        or None (after closing the socket) if the room does not exist.
+        """
+        room = self.room_service.rooms.get(room_id)
+        if room is None:
+            if self.shards and not self.shards.spec.owns(room_id):
+                # Tell the spectator which process has the room
+                await websocket.accept()
+                shard = shard_for(room_id, self.shards.spec.count)
+                await websocket.send_json({"type": "redirect", "shard": shard})
+                await websocket.close()
+                return None
+            await websocket.close(code=1008)
+            return None
+        await websocket.accept()
+        connection = WebSocketConnection(
+            websocket,
+            max_queued=SPECTATOR_QUEUE_SIZE,
+            max_send_lag=self.manager.max_send_lag,
+        )
+        connection.start()
+        room.spectators.subscribe(connection)
+        return connection
+
+    def stop_watching(self, room_id: UUID, connection: WebSocketConnection):
+        room = self.room_service.rooms.get(room_id)
+        if room is not None:
+            room.spectators.unsubscribe(connection.id)
+        connection.close()
+
+    def get_spectator_stats(self) -> dict[str, dict]:
+        """Return spectator counts and broadcast statistics for every room."""
+        return {
+            str(room_id): room.spectators.get_stats()
+            for room_id, room in self.room_service.rooms.items()
+        }
+
     async def disconnect(self, connection_id: UUID):
         """Disconnect a player by connection ID."""
         user_id = self.manager.connection_id_to_user_id.get(connection_id)
@@ -411,10 +771,12 @@ class RoomManager:
                     del self.manager.user_id_to_connection_map[user_id]
             del self.manager.id_to_websocket_connection[connection_id]
             del self.manager.connection_id_to_user_id[connection_id]
+            connection.close()
 
             # Remove from queue if present
-            if user_id in self.room_service.queue:
-                self.room_service.queue.remove(user_id)
+            self.room_service.remove_from_queue(user_id)
+            if self.shards:
+                self.shards.withdraw(user_id)
 
     async def emit_game_state_to_room(self, room_id: UUID):
         """Emit the current game state to all players in the room."""
@@ -422,78 +784,138 @@ class RoomManager:
             return
         room = self.room_service.rooms[room_id]
 
-        if room:
-            state = {
-                "squares": room.game.board.get_squares(),
-                "turn": room.game.turn,
-                "kings_in_check": room.game.board.kings_in_check(),
-                "status": room.game.status.value,
-                "winner": room.game.winner,
-                "end_reason": room.game.end_reason,
-                "time": {
-                    "white": self._get_current_time_remaining(room.game, "white"),
-                    "black": self._get_current_time_remaining(room.game, "black"),
-                },
-                "draw_requests": {
-                    "white": room.game.white_draw_requested,
-                    "black": room.game.black_draw_requested,
-                },
-                "captured_pieces": {
-                    "white": [
-                        {"type": piece.type, "color": piece.color}
-                        for piece in room.game.board.captured_pieces
-                        if piece.color == "white"
-                    ],
-                    "black": [
-                        {"type": piece.type, "color": piece.color}
-                        for piece in room.game.board.captured_pieces
-                        if piece.color == "black"
-                    ],
-                },
-                "last_move": room.game.last_move.to_dict()
-                if room.game.last_move
-                else None,
-            }
-        for player_name in [room.white, room.black]:
-            state["id"] = str(room.id)  # Room ID for fetching game info
-            state["player_id"] = (
-                player_name  # Player ID to identify which player this is
+        # Move lists and check flags, generated off the event loop if configured
+        template = room.template
+        if template and template.is_unchanged(room.game):
+            summary = template.summary
+        elif self.room_threads.enabled:
+            summary = await self.room_threads.run(
+                room.id, summarise, room.game.board, room.game.turn
             )
+        else:
+            summary = await self.position_service.summarise(
+                room.game.board, room.game.turn
+            )
+
+        # Fields every player sees, serialised once per emit
+        state = {
+            "squares": (
+                template.squares
+                if template and template.is_unchanged(room.game)
+                else room.game.board.get_squares()
+            ),
+            "turn": room.game.turn,
+            "kings_in_check": summary.kings_in_check,
+            "status": room.game.status.value,
+            "winner": room.game.winner,
+            "end_reason": room.game.end_reason,
+            "time": {
+                "white": self._get_current_time_remaining(room.game, "white"),
+                "black": self._get_current_time_remaining(room.game, "black"),
+            },
+            "draw_requests": {
+                "white": room.game.white_draw_requested,
+                "black": room.game.black_draw_requested,
+            },
+            "captured_pieces": {
+                "white": [
+                    {"type": piece.type, "color": piece.color}
+                    for piece in room.game.board.captured_pieces
+                    if piece.color == "white"
+                ],
+                "black": [
+                    {"type": piece.type, "color": piece.color}
+                    for piece in room.game.board.captured_pieces
+                    if piece.color == "black"
+                ],
+            },
+            "last_move": room.game.last_move.to_dict()
+            if room.game.last_move
+            else None,
+        }
+        shared_json: Optional[bytes] = None
+        compact_state: Optional[dict] = None
+        delta_cache: dict = {}  # Delta messages already encoded during this emit
+
+        for player_name in [room.white, room.black]:
+            connections = [
+                connection
+                for connection in self.manager.user_id_to_connection_map.get(
+                    player_name, []
+                )
+                if connection
+                and self.manager.get_user_id_for_connection(connection.id) is not None
+            ]
+            if not connections:
+                continue
 
             # Determine player color
             player_color = "white" if player_name == room.white else "black"
 
-            # Add turn-based moves: regular moves if it's their turn, premoves if not
-            if room.game.turn == player_color:
-                state["moves"] = [
-                    x.to_dict()
-                    for x in room.game.board.get_available_moves_for_color(player_color)
-                ]
-            else:
-                state["moves"] = [
-                    x.to_dict()
-                    for x in room.game.board.get_available_premoves_for_color(
-                        player_color
-                    )
-                ]
+            # Turn-based moves: regular moves if it's their turn, premoves if not
+            moves = summary.moves[player_color]
 
             # Add opponent connection status
             opponent_name = room.black if player_name == room.white else room.white
-            state["opponent_connected"] = (
-                len(self.manager.user_id_to_connection_map.get(opponent_name, [])) > 0
-            )
+            player_state = {
+                "id": str(room.id),  # Room ID for fetching game info
+                "player_id": player_name,  # Player ID to identify which player this is
+                "moves": [x.to_dict() for x in moves],
+                "opponent_connected": (
+                    len(self.manager.user_id_to_connection_map.get(opponent_name, []))
+                    > 0
+                ),
+            }
 
-            connections = self.manager.user_id_to_connection_map.get(player_name, [])
+            full_message: Optional[str] = None
+            delta_view: Optional[dict] = None
+            binary_message: Optional[bytes] = None
             for connection in connections:
-                if (
-                    connection
-                    and self.manager.get_user_id_for_connection(connection.id)
-                    is not None
-                ):
-                    try:
-                        await connection.websocket.send_json(state)
-                    except Exception as e:
-                        logging.error(f"Failed to send to {player_name}: {e}")
+                if connection.protocol == BINARY_PROTOCOL:
+                    if binary_message is None:
+                        binary_message = encode_state(
+                            room.id.bytes,
+                            room.game,
+                            player_name,
+                            moves,
+                            player_state["opponent_connected"],
+                            (state["time"]["white"], state["time"]["black"]),
+                            state["kings_in_check"],
+                        )
+                    message = binary_message
+                elif connection.protocol == DELTA_PROTOCOL:
+                    if connection.backlogged:
+                        # Queued deltas are about to be replaced; start afresh
+                        connection.state_stream.reset()
+                    if delta_view is None:
+                        if compact_state is None:
+                            compact_state = compact_shared_state(state)
+                        delta_view = {**compact_state, **player_state}
+                    message = connection.state_stream.next_message(
+                        delta_view, delta_cache
+                    )
+                    if message is None:
+                        continue
+                else:
+                    if full_message is None:
+                        if shared_json is None:
+                            shared_json = orjson.dumps(state)
+                        # Splice this player's fields into the shared JSON object
+                        full_message = (
+                            shared_json[:-1] + b"," + orjson.dumps(player_state)[1:]
+                        ).decode()
+                    message = full_message
+                connection.send(message)
+
+        # Spectators share one frame with no move list; the broadcaster sends it
+        if shared_json is None:
+            shared_json = orjson.dumps(state)
+        spectator_fields = orjson.dumps(
+            {"id": str(room.id), "spectating": True, "moves": []}
+        )
+        room.spectators.publish(
+            (shared_json[:-1] + b"," + spectator_fields[1:]).decode()
+        )
 
     def _get_current_time_remaining(self, game, player_color):
         """Calculate the current time remaining for a player, accounting for elapsed time since last move."""
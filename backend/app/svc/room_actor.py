@@ -0,0 +1,78 @@
+"""Per-room task that applies a room's events one at a time."""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional
+from uuid import UUID
+
+DEFAULT_MAX_QUEUED = 64
+
+RoomEvent = Callable[[], Awaitable[None]]
+
+
+async def _wake() -> None:
+    pass
+
+
+class RoomActor:
+    """
+    Owns the only task allowed to touch a room's game.
+
+    Player messages, clock deadlines and disconnects are queued as coroutine
+    functions and awaited in arrival order, so one event finishes (including
+    any database writes it awaits) before the next starts. Player messages are
+    refused once max_queued are waiting; internal events always get in, since
+    dropping a flag-fall or a disconnect would leave the game stuck.
+    """
+
+    def __init__(self, room_id: UUID, max_queued: int = DEFAULT_MAX_QUEUED):
+        self.room_id = room_id
+        self.max_queued = max_queued
+        self.queue: asyncio.Queue[RoomEvent] = asyncio.Queue()
+        self.task: Optional[asyncio.Task] = None
+        self.closed = False
+        self.processed = 0
+        self.dropped = 0
+        self.max_depth = 0
+
+    @property
+    def depth(self) -> int:
+        return self.queue.qsize()
+
+    def start(self) -> None:
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+
+    def submit(self, event: RoomEvent, internal: bool = False) -> bool:
+        """Queue an event. Returns False if the room is closed or its queue is full."""
+        if self.closed or (not internal and self.depth >= self.max_queued):
+            self.dropped += 1
+            return False
+        self.queue.put_nowait(event)
+        self.max_depth = max(self.max_depth, self.depth)
+        return True
+
+    def close(self) -> None:
+        """Stop after the event being handled; anything still queued is discarded."""
+        self.closed = True
+        self.queue.put_nowait(_wake)  # Let an idle run() see the flag and exit
+
+    def get_stats(self) -> dict:
+        return {
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "processed": self.processed,
+            "dropped": self.dropped,
+        }
+
+    async def run(self) -> None:
+        while not self.closed:
+            event = await self.queue.get()
+            if self.closed:
+                break
+            try:
+                await event()
+            except Exception as e:
+                logging.error(f"Error handling event for room {self.room_id}: {e}")
+            finally:
+                self.processed += 1
@@ -0,0 +1,82 @@
+"""A dict split into lock-striped shards, safe to share between threads."""
+
+import threading
+import zlib
+from typing import Generic, Iterator, Optional, TypeVar, Union
+from uuid import UUID
+
+K = TypeVar("K", bound=Union[str, UUID])
+V = TypeVar("V")
+
+DEFAULT_STRIPES = 16
+
+
+class StripedDict(Generic[K, V]):
+    """
+    The dict operations RoomService uses, with keys spread over stripes that
+    each have their own lock. Threads working on different rooms rarely touch
+    the same stripe, so they seldom wait on each other, which matters on
+    free-threaded builds where a plain dict gives no such guarantee for
+    compound updates. Iteration works on a per-stripe snapshot.
+    """
+
+    def __init__(self, stripes: int = DEFAULT_STRIPES):
+        self.stripes: list[dict[K, V]] = [{} for _ in range(stripes)]
+        self.locks = [threading.Lock() for _ in range(stripes)]
+
+    def _stripe(self, key: K) -> int:
+        return zlib.crc32(str(key).encode()) % len(self.stripes)
+
+    def __getitem__(self, key: K) -> V:
+        index = self._stripe(key)
+        with self.locks[index]:
+            return self.stripes[index][key]
+
+    def __setitem__(self, key: K, value: V) -> None:
+        index = self._stripe(key)
+        with self.locks[index]:
+            self.stripes[index][key] = value
+
+    def __delitem__(self, key: K) -> None:
+        index = self._stripe(key)
+        with self.locks[index]:
+            del self.stripes[index][key]
+
+    def __contains__(self, key: object) -> bool:
+        index = self._stripe(key)  # type: ignore[arg-type]
+        with self.locks[index]:
+            return key in self.stripes[index]
+
+    def __len__(self) -> int:
+        return sum(len(stripe) for stripe in self.stripes)
+
+    def __iter__(self) -> Iterator[K]:
+        return iter(self.keys())
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, StripedDict):
+            other = dict(other.items())
+        return dict(self.items()) == other
+
+    def get(self, key: K, default: Optional[V] = None) -> Optional[V]:
+        index = self._stripe(key)
+        with self.locks[index]:
+            return self.stripes[index].get(key, default)
+
+    def pop(self, key: K, *default: V) -> V:
+        index = self._stripe(key)
+        with self.locks[index]:
+            return self.stripes[index].pop(key, *default)
+
+    def keys(self) -> list[K]:
+        return [key for key, _ in self.items()]
+
+    def values(self) -> list[V]:
+        return [value for _, value in self.items()]
+
+    def items(self) -> list[tuple[K, V]]:
+        items: list[tuple[K, V]] = []
+        for stripe, lock in zip(self.stripes, self.locks):
+            with lock:
+                items.extend(stripe.items())
+        return items
@@ -0,0 +1,129 @@
+"""
+Game logic for each room pinned to one of a few worker threads.
+
+On a free-threaded (no-GIL) build, rooms on different threads validate moves
+and generate move lists truly in parallel while the event loop only does
+socket I/O. Pinning keeps each room on one thread, so its game is never
+touched by two threads at once and stays warm in that core's caches; the
+room's actor already guarantees only one event per room is in flight.
+
+With threads=0 (the default, and the right choice on standard builds where
+the GIL serialises the work anyway) calls run inline on the event loop.
+
+Benchmark: python -m app.svc.room_threads --rooms 64 --threads 0 1 2 4
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar, Union
+from uuid import UUID
+
+T = TypeVar("T")
+
+
+def gil_enabled() -> bool:
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", None)
+    return True if is_gil_enabled is None else is_gil_enabled()
+
+
+class RoomThreads:
+    def __init__(self, threads: int = 0):
+        self.executors = [
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"room-shard-{index}")
+            for index in range(threads)
+        ]
+        self.calls = [0] * max(threads, 1)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.executors)
+
+    def thread_for(self, room_id: Union[str, UUID]) -> int:
+        if not self.executors:
+            return 0
+        return zlib.crc32(str(room_id).encode()) % len(self.executors)
+
+    async def run(
+        self, room_id: Union[str, UUID], function: Callable[..., T], *args: Any
+    ) -> T:
+        """Call function(*args) on the room's thread and wait for the result."""
+        index = self.thread_for(room_id)
+        self.calls[index] += 1
+        if not self.executors:
+            return function(*args)
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executors[index], function, *args
+        )
+
+    def shutdown(self) -> None:
+        for executor in self.executors:
+            executor.shutdown(wait=False, cancel_futures=True)
+        self.executors = []
+
+    def get_stats(self) -> dict:
+        return {
+            "threads": len(self.executors),
+            "gil_enabled": gil_enabled(),
+            "calls_per_thread": list(self.calls),
+        }
+
+
+async def _play_rooms(threads: RoomThreads, rooms: int, plies: int) -> int:
+    """Play plies moves in each of rooms games at once; return moves made."""
+    from app.obj.game import Game, GameStatus
+    from app.svc.position_service import summarise
+
+    def play_one(game: Game, turn: str, ply: int) -> bool:
+        moves = summarise(game.board, turn).moves[turn]
+        if not moves:
+            return False
+        move = moves[ply * 7 % len(moves)]
+        return game.move(
+            move.position_from, move.position_to, turn, move.promote_to_type
+        )
+
+    async def play_room(room_id: int) -> int:
+        game = Game()
+        made = 0
+        for ply in range(plies):
+            if await threads.run(room_id, play_one, game, game.turn, ply):
+                made += 1
+            if game.status == GameStatus.COMPLETE:
+                game = Game()  # Keep the room busy after a quick finish
+        return made
+
+    return sum(await asyncio.gather(*(play_room(room) for room in range(rooms))))
+
+
+def benchmark(rooms: int, plies: int, thread_counts: list[int]) -> dict:
+    results = {}
+    for count in thread_counts:
+        threads = RoomThreads(count)
+        started = time.perf_counter()
+        moves = asyncio.run(_play_rooms(threads, rooms, plies))
+        seconds = time.perf_counter() - started
+        threads.shutdown()
+        results[str(count)] = {
+            "moves": moves,
+            "seconds": round(seconds, 3),
+            "moves_per_second": round(moves / seconds, 1),
+        }
+    return {"gil_enabled": gil_enabled(), "rooms": rooms, "results": results}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n\n")[0])
+    parser.add_argument("--rooms", type=int, default=64)
+    parser.add_argument("--plies", type=int, default=20)
+    parser.add_argument("--threads", type=int, nargs="+", default=[0, 1, 2, 4])
+    args = parser.parse_args()
+    print(json.dumps(benchmark(args.rooms, args.plies, args.threads), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""
+Partitioning rooms and players across several server processes.
+
+Each process is one shard, started with SHARD_INDEX and SHARD_COUNT.
+Ownership is decided by a stable hash:
+
+- A registered player belongs to their home shard, shard_for(user_id), which
+  queues them for matchmaking. Guest ids are generated to hash to the shard
+  that created them.
+- A room belongs to shard_for(room_id). Rooms are given ids that hash to the
+  shard that creates them, so any process (or the proxy in front) can tell
+  where a room lives from its id alone.
+
+Players are paired on their home shard when possible. Anyone still waiting
+after handoff_after seconds is handed off to the lobby shard (shard 0), which
+pairs handed-off players with each other and with its own. Shards talk
+through the broker (see broker). These messages are sent:
+
+    handoff       home -> lobby  queue this player (rating, joined_at, origin)
+    withdraw      home -> lobby  the player left before being paired
+    placed        lobby -> home  the player's room is on shard N
+    released      lobby -> home  that room has closed
+    user_changed  any -> all     drop cached copies of a user's row
+
+A player whose socket is on the wrong shard is sent
+{"type": "redirect", "shard": N} (with "room_id" when they have a game) and
+reconnects with ?shard=N, which the proxy routes to that process (see
+nginx.conf; the client handles this in GameView). That is how a reconnecting
+player lands on the process that owns their room. Guests are also sent a
+"token" naming their guest id: a guest who connected without one would
+otherwise get a new id on reconnect and not be matched to their room.
+"""
+
+import logging
+import time
+import zlib
+from typing import TYPE_CHECKING, Any, Optional, Union
+from uuid import UUID, uuid4
+
+import orjson
+
+from app.auth import create_jwt_token
+
+if TYPE_CHECKING:
+    from app.svc.broker import BrokerLink, InProcessLink
+    from app.svc.room import Room, RoomManager, WebSocketConnection
+
+LOBBY_SHARD = 0
+# Seconds a player waits for a match on their home shard before handoff
+HANDOFF_AFTER_SECONDS = 5.0
+
+HANDOFF = "handoff"
+WITHDRAW = "withdraw"
+PLACED = "placed"
+RELEASED = "released"
+USER_CHANGED = "user_changed"
+
+
+def shard_for(key: Union[str, UUID], count: int) -> int:
+    """Stable across processes, unlike hash()."""
+    return zlib.crc32(str(key).encode()) % count
+
+
+class ShardSpec:
+    """Which shard this process is, out of how many."""
+
+    def __init__(self, index: int = 0, count: int = 1):
+        if not 0 <= index < count:
+            raise ValueError(f"Shard index {index} is out of range for {count} shards")
+        self.index = index
+        self.count = count
+
+    def owns(self, key: Union[str, UUID]) -> bool:
+        return self.count == 1 or shard_for(key, self.count) == self.index
+
+    def new_uuid(self, prefix: str = "") -> UUID:
+        """A random id that this shard owns once prefixed with prefix."""
+        while True:
+            candidate = uuid4()
+            if self.owns(prefix + str(candidate)):
+                return candidate
+
+
+class ShardCoordinator:
+    """
+    Handles this shard's side of matchmaking handoff and redirects. Sends are
+    fire-and-forget and handle() runs on the event loop, so no method waits on
+    another shard.
+    """
+
+    def __init__(
+        self,
+        spec: ShardSpec,
+        room_manager: "RoomManager",
+        handoff_after: float = HANDOFF_AFTER_SECONDS,
+    ):
+        self.spec = spec
+        self.room_manager = room_manager
+        self.handoff_after = handoff_after
+        self.link: "Optional[BrokerLink | InProcessLink]" = None
+        # Home side: our players waiting on the lobby, and those playing elsewhere
+        self.handed_off: set[str] = set()
+        self.remote_rooms: dict[str, tuple[int, str]] = {}
+        # Lobby side: handed-off players by home shard, before and after pairing
+        self.guests: dict[str, int] = {}
+        self.placed: dict[str, int] = {}
+        room_manager.room_service.room_closed_listener = self.room_closed
+
+    @property
+    def is_lobby(self) -> bool:
+        return self.spec.index == LOBBY_SHARD
+
+    def attach(self, link: "BrokerLink | InProcessLink") -> None:
+        self.link = link
+        link.start()
+
+    def route_connection(self, user_id: str, connection: "WebSocketConnection") -> bool:
+        """
+        Redirect a player who connected here but is served elsewhere. Returns
+        True if the player should not be queued on this shard.
+        """
+        if user_id in self.remote_rooms:
+            shard, room_id = self.remote_rooms[user_id]
+            self._redirect(connection, user_id, shard, room_id)
+            return True
+        if not self.spec.owns(user_id):
+            self._redirect(connection, user_id, shard_for(user_id, self.spec.count))
+            return True
+        # Already queued on the lobby from another tab or a dropped socket
+        return user_id in self.handed_off
+
+    def withdraw(self, user_id: str) -> None:
+        """The player left; take them out of the lobby queue if they are in it."""
+        if user_id in self.handed_off:
+            self.handed_off.discard(user_id)
+            self._send(LOBBY_SHARD, {"type": WITHDRAW, "user_id": user_id})
+
+    def after_tick(self, room_ids: list[UUID], now: Optional[float] = None) -> None:
+        """Tell home shards about rooms just opened, or hand off long waiters."""
+        if self.is_lobby:
+            for room_id in room_ids:
+                room = self.room_manager.room_service.rooms[room_id]
+                for user_id in (room.white, room.black):
+                    origin = self.guests.pop(user_id, None)
+                    if origin is not None:
+                        self.placed[user_id] = origin
+                        self._send(
+                            origin,
+                            {
+                                "type": PLACED,
+                                "user_id": user_id,
+                                "room_id": str(room_id),
+                                "shard": self.spec.index,
+                            },
+                        )
+            return
+
+        room_service = self.room_manager.room_service
+        cutoff = (time.time() if now is None else now) - self.handoff_after
+        for entry in room_service.queue.waiting_since(cutoff):
+            room_service.remove_from_queue(entry.user_id)
+            self.handed_off.add(entry.user_id)
+            self._send(
+                LOBBY_SHARD,
+                {
+                    "type": HANDOFF,
+                    "user_id": entry.user_id,
+                    "rating": entry.rating,
+                    "joined_at": entry.joined_at,
+                    "origin": self.spec.index,
+                },
+            )
+
+    def room_closed(self, room: "Room") -> None:
+        for user_id in (room.white, room.black):
+            origin = self.placed.pop(user_id, None)
+            if origin is not None:
+                self._send(origin, {"type": RELEASED, "user_id": user_id})
+
+    def handle(self, message: dict[str, Any]) -> None:
+        """Apply a message from another shard."""
+        kind, user_id = message["type"], message["user_id"]
+        room_service = self.room_manager.room_service
+        if kind == HANDOFF:
+            if room_service.queue.add(user_id, message["rating"], message["joined_at"]):
+                self.guests[user_id] = message["origin"]
+                room_service.prefetch_loadout(user_id)
+        elif kind == WITHDRAW:
+            if self.guests.pop(user_id, None) is not None:
+                room_service.remove_from_queue(user_id)
+        elif kind == PLACED:
+            self.handed_off.discard(user_id)
+            self.remote_rooms[user_id] = (message["shard"], message["room_id"])
+            for connection in self.room_manager.manager.user_id_to_connection_map.get(
+                user_id, []
+            ):
+                self._redirect(
+                    connection, user_id, message["shard"], message["room_id"]
+                )
+        elif kind == RELEASED:
+            self.remote_rooms.pop(user_id, None)
+        elif kind == USER_CHANGED:
+            self.room_manager.user_info_cache.invalidate(user_id)
+            room_service.loadouts.invalidate(user_id)
+        else:
+            logging.warning(f"Ignoring unknown shard message type {kind}")
+
+    def user_changed(self, user_id: str) -> None:
+        """A user's row changed here; have every other shard drop its copies."""
+        for shard in range(self.spec.count):
+            if shard != self.spec.index:
+                self._send(shard, {"type": USER_CHANGED, "user_id": user_id})
+
+    def get_stats(self) -> dict:
+        return {
+            "shard": self.spec.index,
+            "shards": self.spec.count,
+            "handed_off": len(self.handed_off),
+            "playing_elsewhere": len(self.remote_rooms),
+            "lobby_guests": len(self.guests),
+            "lobby_placed": len(self.placed),
+            "sent": self.link.sent if self.link else 0,
+            "unsent": self.link.unsent if self.link else 0,
+        }
+
+    def _send(self, shard: int, message: dict[str, Any]) -> None:
+        if self.link is None:
+            logging.warning(f"Dropped {message['type']} message: no broker link")
+            return
+        self.link.send(shard, message)
+
+    def _redirect(
+        self,
+        connection: "WebSocketConnection",
+        user_id: str,
+        shard: int,
+        room_id: Optional[str] = None,
+    ) -> None:
+        message: dict[str, Any] = {"type": "redirect", "shard": shard}
+        if room_id is not None:
+            message["room_id"] = room_id
+        if user_id.startswith("guest_"):
+            # Lets the guest reconnect under the same id
+            message["token"] = create_jwt_token(
+                {"sub": user_id, "email": "guest@local", "name": None}
+            )
+        connection.send(orjson.dumps(message).decode())
@@ -0,0 +1,121 @@
+"""Read-only spectator subscriptions to a room's game state."""
+
+import asyncio
+import logging
+from typing import Optional
+from uuid import UUID
+
+# Subscribers sent to before the broadcaster yields to other tasks
+FANOUT_BATCH_SIZE = 256
+# Frames a spectator may have waiting; a newer frame replaces them (drop on lag)
+SPECTATOR_QUEUE_SIZE = 1
+
+
+class SpectatorChannel:
+    """
+    Fans a room's state out to its spectators.
+
+    The emit path only publishes: it hands over one pre-serialised frame per
+    state change and returns. A broadcaster task then queues the newest frame
+    on every subscriber. Subscribers are WebSocketConnections with a queue of
+    SPECTATOR_QUEUE_SIZE, so each one has its own writer and a slow spectator
+    just skips frames without holding up the others or the players.
+    """
+
+    def __init__(self, room_id: UUID):
+        self.room_id = room_id
+        self.subscribers: dict[UUID, object] = {}  # Connection id -> connection
+        self.latest: Optional[str] = None
+        self.version = 0  # Bumped on every publish
+        self.sent_version = 0  # Last version fanned out
+        self.ready = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.closed = False
+        self.published = 0
+        self.broadcasts = 0
+        self.superseded = 0  # Frames replaced before the broadcaster got to them
+
+    def __len__(self) -> int:
+        return len(self.subscribers)
+
+    def subscribe(self, connection) -> None:
+        """Add a spectator and send them the latest frame straight away."""
+        if self.latest is not None:
+            connection.send(self.latest)
+        if self.closed:
+            connection.finish()
+            return
+        self.subscribers[connection.id] = connection
+        self._start()
+
+    def unsubscribe(self, connection_id: UUID) -> None:
+        self.subscribers.pop(connection_id, None)
+
+    def publish(self, frame: str) -> None:
+        """Make frame the room's current state. Never waits on subscribers."""
+        if self.closed:
+            return
+        if self.version > self.sent_version:
+            self.superseded += 1
+        self.latest = frame
+        self.version += 1
+        self.published += 1
+        if self.subscribers:
+            self.ready.set()
+
+    def close(self) -> None:
+        """
+        Stop once the latest frame has gone out to everyone, closing each
+        spectator's socket after it has been sent.
+        """
+        self.closed = True
+        self.ready.set()
+        if self.task is None:
+            self._finish_subscribers()
+
+    def get_stats(self) -> dict:
+        return {
+            "subscribers": len(self.subscribers),
+            "published": self.published,
+            "broadcasts": self.broadcasts,
+            "superseded": self.superseded,
+            "dropped": sum(
+                connection.coalesced for connection in self.subscribers.values()
+            ),
+        }
+
+    def _start(self) -> None:
+        if self.task is None and not self.closed:
+            self.task = asyncio.create_task(self.run())
+
+    async def run(self) -> None:
+        while True:
+            await self.ready.wait()
+            self.ready.clear()
+            if self.version > self.sent_version:
+                try:
+                    await self._fan_out()
+                except Exception as e:
+                    logging.error(
+                        f"Error broadcasting to spectators of room {self.room_id}: {e}"
+                    )
+            if self.closed:
+                self._finish_subscribers()
+                break
+
+    def _finish_subscribers(self) -> None:
+        for connection in self.subscribers.values():
+            connection.finish()
+        self.subscribers.clear()
+
+    async def _fan_out(self) -> None:
+        frame, self.sent_version = self.latest, self.version
+        self.broadcasts += 1
+        # Subscribers can come and go while the broadcaster yields
+        for index, connection in enumerate(list(self.subscribers.values()), 1):
+            if connection.closed:
+                self.subscribers.pop(connection.id, None)
+                continue
+            connection.send(frame)
+            if index % FANOUT_BATCH_SIZE == 0:
+                await asyncio.sleep(0)
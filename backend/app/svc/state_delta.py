@@ -0,0 +1,152 @@
+"""Versioned game state messages: a full snapshot, then per-event deltas."""
+
+from typing import Any, Optional
+
+import orjson
+
+from app.obj.modifier import ALL_MODIFIERS
+
+# Protocols a client can ask for with the ?protocol= query parameter
+JSON_PROTOCOL = "json"  # Full state on every event (the default)
+DELTA_PROTOCOL = "delta"
+PROTOCOLS = {JSON_PROTOCOL, DELTA_PROTOCOL}
+# Negotiated through the websocket subprotocol instead (see binary_protocol)
+BINARY_PROTOCOL = "binary"
+
+
+# Sent once in each snapshot, so squares can name modifiers instead of
+# repeating their descriptions
+MODIFIER_CATALOGUE = {
+    modifier.modifier_type: modifier.to_dict() for modifier in ALL_MODIFIERS
+}
+
+
+def compact_shared_state(state: dict) -> dict:
+    """Copy of the shared state with each square's modifiers reduced to names."""
+    squares = [
+        [
+            (
+                dict(
+                    square,
+                    modifiers=[modifier["type"] for modifier in square["modifiers"]],
+                )
+                if square and square["modifiers"]
+                else square
+            )
+            for square in row
+        ]
+        for row in state["squares"]
+    ]
+    return dict(state, squares=squares)
+
+
+def compact_move(move: dict) -> list[int]:
+    """{"from": {"row", "col"}, "to": {...}} -> [from_row, from_col, to_row, to_col]"""
+    return [
+        move["from"]["row"],
+        move["from"]["col"],
+        move["to"]["row"],
+        move["to"]["col"],
+    ]
+
+
+def diff_squares(previous: list, current: list) -> list[list]:
+    """Return [row, col, square] for every square that changed."""
+    return [
+        [row, col, square]
+        for row, (old_row, new_row) in enumerate(zip(previous, current))
+        for col, (old, square) in enumerate(zip(old_row, new_row))
+        if old != square
+    ]
+
+
+def diff_moves(previous: list, current: list) -> Optional[dict[str, list]]:
+    """Return the added and removed moves in compact form, or None if unchanged."""
+    old_moves = {tuple(compact_move(move)) for move in previous}
+    new_moves = {tuple(compact_move(move)) for move in current}
+    if old_moves == new_moves:
+        return None
+    return {
+        "added": sorted(list(move) for move in new_moves - old_moves),
+        "removed": sorted(list(move) for move in old_moves - new_moves),
+    }
+
+
+def diff_state(previous: dict, current: dict, previous_moves: list) -> dict[str, Any]:
+    """
+    Describe how a player's state changed. Squares and moves are diffed; any
+    other top-level field is included whole if it changed at all.
+
+    A player's move list alternates between legal moves and premoves, which
+    share little, so moves are diffed against previous_moves: the list last
+    sent with the same side to move.
+    """
+    changes: dict[str, Any] = {}
+    for key, value in current.items():
+        if key == "squares":
+            squares = diff_squares(previous["squares"], value)
+            if squares:
+                changes["squares"] = squares
+        elif key == "moves":
+            moves = diff_moves(previous_moves, value)
+            if moves:
+                changes["moves"] = moves
+        elif previous.get(key) != value:
+            changes[key] = value
+    return changes
+
+
+class StateStream:
+    """
+    Tracks what one connection has been sent. The first message (and the first
+    after a room change or a resync request) is a snapshot; later ones carry
+    only changes. Every message has a sequence number so a client that misses
+    one can ask for a resync.
+
+    Snapshots carry a modifier_catalogue, and squares in both message types
+    list their modifiers by name. Clients apply "moves" changes to the move
+    list they last had for the same "turn" value (an empty list if they have
+    none yet).
+    """
+
+    def __init__(self):
+        self.seq = 0
+        self.last_state: Optional[dict] = None
+        self.move_lists: dict[str, list] = {}  # Last move list sent, by turn
+
+    def reset(self) -> None:
+        """Send a snapshot next time."""
+        self.last_state = None
+        self.move_lists = {}
+
+    def next_message(self, view: dict, cache: dict) -> Optional[str]:
+        """
+        Return the message that brings the client to view, or None if nothing
+        changed. view must not be modified afterwards: it becomes the base for
+        the next delta. Encoded messages are shared through cache, so
+        connections that are in step with each other encode each view once.
+        """
+        previous = self.last_state
+        if previous is None or previous.get("id") != view.get("id"):
+            self.move_lists = {}
+            key = ("snapshot", id(view))
+            if key not in cache:
+                cache[key] = orjson.dumps(
+                    dict(view, modifier_catalogue=MODIFIER_CATALOGUE)
+                )
+            kind, field = "state_snapshot", "state"
+        else:
+            previous_moves = self.move_lists.get(view["turn"], [])
+            key = (id(previous), id(previous_moves), id(view))
+            if key not in cache:
+                changes = diff_state(previous, view, previous_moves)
+                cache[key] = orjson.dumps(changes) if changes else None
+            kind, field = "state_delta", "changes"
+
+        body = cache[key]
+        if body is None:
+            return None
+        self.seq += 1
+        self.last_state = view
+        self.move_lists[view["turn"]] = view["moves"]
+        return f'{{"type":"{kind}","seq":{self.seq},"{field}":{body.decode()}}}'
@@ -12,7 +12,7 @@ class WebSocketMessageHandler:
 
     def __init__(self, room_manager: RoomManager):
         self.room_manager: RoomManager = room_manager
-        self.game_service = GameService()
+        self.game_service = GameService(room_manager.room_threads)
         self.handlers: Dict[
             str, Callable[[Dict[str, Any], Room, str], Awaitable[None]]
         ] = {
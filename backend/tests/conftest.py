@@ -0,0 +1,4 @@
+import os
+
+# app.auth refuses to import without a signing key
+os.environ.setdefault("JWT_SECRET_KEY", "test-secret")
@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+from app.engine.fen import FENError, board_from_fen, board_to_fen, normalize_fen
+from app.engine.search import search
+from app.svc.analysis_service import (
+    AnalysisBusyError,
+    AnalysisLimitError,
+    AnalysisService,
+)
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+
+def test_fen_round_trips_modifiers_castling_and_en_passant():
+    fen = (
+        "r[Quook]nbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/"
+        "RN[Royal Guard]BQK[Escape Hatch:0]BNR b Kq e3 0 1"
+    )
+    board, turn = board_from_fen(fen)
+
+    assert turn == "black"
+    assert board.squares[0][0].has_modifier("Quook")
+    assert board.squares[7][4].get_modifier_uses_remaining("Escape Hatch") == 0
+    assert not board.squares[7][7].moved
+    assert board.squares[7][0].moved
+    assert board_to_fen(board, turn) == fen
+    assert normalize_fen(START_FEN.replace(" 0 1", "")) == START_FEN
+
+
+@pytest.mark.parametrize(
+    "fen",
+    [
+        "8/8/8/8/8/8/8/8 w - - 0 1",
+        "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR x KQkq - 0 1",
+        "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKB[Quook]NR w KQkq - 0 1",
+        "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq e3 0 1",
+    ],
+)
+def test_fen_rejects_bad_positions(fen):
+    with pytest.raises(FENError):
+        board_from_fen(fen)
+
+
+def test_search_finds_mate_and_wins_material():
+    board, turn = board_from_fen("6k1/5ppp/8/8/8/8/5PPP/R5K1 w - - 0 1")
+    result = search(board, turn, depth=2)
+    assert result.to_dict(turn)["best_move"] == "a1a8"
+    assert result.mate_in == 1
+
+    # Only the Quook's diagonal move takes the checking queen
+    board, turn = board_from_fen("6k1/8/8/8/3q4/8/8/R[Quook]5K1 w - - 0 1")
+    result = search(board, turn, depth=1)
+    assert result.to_dict(turn)["best_move"] == "a1d4"
+
+
+@pytest.mark.asyncio
+async def test_analysis_service_caches_and_limits():
+    service = AnalysisService(workers=1, max_queued=1, per_user_limit=1)
+    fen = normalize_fen("6k1/5ppp/8/8/8/8/5PPP/R5K1 w - - 0 1")
+    try:
+        first = await service.analyse("user", fen, depth=2)
+        assert first["best_move"] == "a1a8"
+        assert first["cached"] is False
+
+        second = await service.analyse("other", fen, depth=2)
+        assert second["cached"] is True
+
+        # One running search per user, and one worker plus one queued overall
+        running = asyncio.ensure_future(service.analyse("user", START_FEN, depth=2))
+        await asyncio.sleep(0)
+        with pytest.raises(AnalysisLimitError):
+            await service.analyse("user", START_FEN, depth=1)
+        queued = asyncio.ensure_future(service.analyse("second", START_FEN, depth=1))
+        await asyncio.sleep(0)
+        with pytest.raises(AnalysisBusyError):
+            await service.analyse("third", fen, depth=3)
+
+        await asyncio.gather(running, queued)
+        assert service.pending == 0
+        assert service.user_counts == {}
+    finally:
+        service.shutdown()
@@ -0,0 +1,85 @@
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from app.engine.batch import BatchBoards, evaluate_batch  # noqa: E402
+from app.obj.game import Game, GameStatus  # noqa: E402
+from app.obj.modifier import ALL_MODIFIERS  # noqa: E402
+
+
+def random_positions(seed: int, games: int, plies: int):
+    """Play random games with random loadouts and collect every position reached."""
+    rng = random.Random(seed)
+    boards, turns = [], []
+    for _ in range(games):
+        game = Game()
+        for piece in game.board.pieces:
+            modifiers = [
+                m
+                for m in ALL_MODIFIERS
+                if piece.can_add_modifier(m) and m.modifier_type != "Teleport"
+            ]
+            if modifiers and rng.random() < 0.4:
+                piece.add_modifier(rng.choice(modifiers))
+
+        for _ in range(plies):
+            if game.status == GameStatus.COMPLETE:
+                break
+            boards.append(game.board.clone())
+            turns.append(game.turn)
+            moves = game.board.get_available_moves_for_color(game.turn)
+            if not moves:
+                break
+            move = rng.choice(moves)
+            game.move(
+                move.position_from, move.position_to, game.turn, move.promote_to_type
+            )
+    return boards, turns
+
+
+def test_batch_legal_moves_match_object_model():
+    boards, turns = random_positions(seed=7, games=4, plies=40)
+    evaluation = evaluate_batch(BatchBoards.from_boards(boards, turns))
+
+    expected = [
+        len(board.get_available_moves_for_color(turn))
+        for board, turn in zip(boards, turns)
+    ]
+    assert evaluation.legal_moves.tolist() == expected
+    # Most positions should not need the object-model fallback
+    assert evaluation.used_object_model.mean() < 0.5
+
+
+def test_batch_material_and_check_flags():
+    boards, turns = random_positions(seed=11, games=3, plies=30)
+    evaluation = evaluate_batch(BatchBoards.from_boards(boards, turns))
+
+    for index, (board, turn) in enumerate(zip(boards, turns)):
+        for side, color in enumerate(["white", "black"]):
+            expected = sum(
+                piece.get_base_value()
+                + sum(
+                    m.score
+                    for m in piece.modifiers
+                    if m.uses == 0
+                    or piece.get_modifier_uses_remaining(m.modifier_type) > 0
+                )
+                for piece in board.pieces
+                if piece.color == color
+            )
+            assert evaluation.material[index, side] == expected
+        assert evaluation.in_check[index] == board.is_king_in_check(turn)
+
+    assert evaluation.features().shape == (len(boards), 9)
+
+
+def test_batch_round_trips_through_object_model():
+    boards, turns = random_positions(seed=3, games=2, plies=20)
+    batch = BatchBoards.from_boards(boards, turns)
+    rebuilt = [batch.to_board(index) for index in range(len(batch))]
+    repacked = BatchBoards.from_boards(rebuilt, turns)
+
+    assert np.array_equal(batch.occupancy, repacked.occupancy)
+    assert np.array_equal(batch.castling, repacked.castling)
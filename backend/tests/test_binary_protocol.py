@@ -0,0 +1,105 @@
+import asyncio
+import json
+
+import pytest
+
+from app.obj.modifier import KNOOK_MODIFIER
+from app.obj.position import position_from_notation
+from app.svc.binary_protocol import (
+    BINARY_SUBPROTOCOL,
+    PIECE_TYPES,
+    BinaryProtocolError,
+    decode_client_message,
+    decode_state,
+)
+from app.svc.room import ConnectionManager, RoomManager, RoomService
+
+
+class FakeWebSocket:
+    def __init__(self, subprotocols=()):
+        self.scope = {"subprotocols": list(subprotocols)}
+        self.accepted_subprotocol = None
+        self.sent = []
+
+    async def accept(self, subprotocol=None):
+        self.accepted_subprotocol = subprotocol
+
+    async def send_json(self, data):
+        self.sent.append(data)
+
+    async def send_text(self, data):
+        self.sent.append(json.loads(data))
+
+    async def send_bytes(self, data):
+        self.sent.append(data)
+
+
+def test_client_frames_decode_to_json_messages():
+    e7, e8 = position_from_notation("e7"), position_from_notation("e8")
+    code = (e7.row * 8 + e7.col) | (e8.row * 8 + e8.col) << 6 | 4 << 12
+    assert decode_client_message(bytes([0x10]) + code.to_bytes(2, "little")) == {
+        "type": "move",
+        "from": [1, 4],
+        "to": [0, 4],
+        "promotion": "queen",
+    }
+    assert decode_client_message(b"\x12") == {"type": "resign"}
+    with pytest.raises(BinaryProtocolError):
+        decode_client_message(b"\x10\x00")
+    with pytest.raises(BinaryProtocolError):
+        decode_client_message(b"\x7f")
+
+
+@pytest.mark.asyncio
+async def test_binary_state_matches_json_state_in_a_fraction_of_the_bytes():
+    room_manager = RoomManager(ConnectionManager(), RoomService())
+    json_socket = FakeWebSocket()
+    binary_socket = FakeWebSocket([BINARY_SUBPROTOCOL])
+    await room_manager.connect(json_socket)
+    await room_manager.connect(binary_socket)
+    await room_manager.matchmaking_tick()
+    await asyncio.sleep(0.01)
+    assert binary_socket.accepted_subprotocol == BINARY_SUBPROTOCOL
+    assert binary_socket.sent[0]["type"] == "binary_hello"
+
+    room = next(iter(room_manager.room_service.rooms.values()))
+    room.game.board.squares[7][0].add_modifier(KNOOK_MODIFIER)
+    assert room.game.move(
+        position_from_notation("e2"), position_from_notation("e4"), "white"
+    )
+    await room_manager.emit_game_state_to_room(room.id)
+    await asyncio.sleep(0.01)  # Let the writer tasks send
+
+    full = json_socket.sent[-1]
+    state = decode_state(binary_socket.sent[-1])
+    assert state["room_id"] == room.id.bytes
+    assert state["turn"] == full["turn"] == "black"
+    assert state["status"] == full["status"]
+    assert state["time"]["white"] == pytest.approx(full["time"]["white"], abs=0.01)
+    assert state["last_move"] == {"from": [6, 4], "to": [4, 4], "promotion": None}
+    assert state["modifiers"] == [(56, "Knook", None)]
+    for square, code in enumerate(state["board"]):
+        piece = room.game.board.squares[square // 8][square % 8]
+        if piece is None:
+            assert code == 0
+        else:
+            assert PIECE_TYPES[(code & 7) - 1] == piece.get_acting_type()
+            assert bool(code & 8) == (piece.color == "black")
+
+    # The binary player's move list, as target squares per origin
+    binary_player = state["player_id"]
+    color = "white" if binary_player == room.white else "black"
+    moves = (
+        room.game.board.get_available_moves_for_color(color)
+        if room.game.turn == color
+        else room.game.board.get_available_premoves_for_color(color)
+    )
+    expected = {}
+    for move in moves:
+        to = move.position_to
+        if 0 <= to.row < 8 and 0 <= to.col < 8:
+            origin = move.position_from.row * 8 + move.position_from.col
+            expected.setdefault(origin, set()).add(to.row * 8 + to.col)
+    assert {k: set(v) for k, v in state["targets"].items()} == expected
+
+    assert len(binary_socket.sent[-1]) * 10 < len(json.dumps(full))
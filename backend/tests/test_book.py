@@ -0,0 +1,69 @@
+from app.engine.book import OpeningBook, build
+from app.engine.pgn import clean_moves, read_games, resolve_san, split_file
+from app.engine.zobrist import position_key
+from app.obj.board import Board
+from app.obj.modifier import QUOOK_MODIFIER
+
+GAMES = [
+    ("1-0", "1. e4 e5 2. Nf3 Nc6 3. Bb5 a6 4. O-O Nf6 1-0"),
+    ("0-1", "1. e4 c5 {Sicilian} 2. Nf3 d6 3. d4 cxd4 0-1"),
+    ("1/2-1/2", "1. d4 d5 2. c4 e6 (2... c6) 3. Nc3 Nf6 1/2-1/2"),
+    ("1-0", "1. e4 e5 2. Nf3 Nc6 3. Bc4 Bc5?! 1-0"),
+]
+
+
+def write_pgn(path):
+    with open(path, "w") as file:
+        for index, (result, moves) in enumerate(GAMES):
+            file.write(f'[Event "Game {index}"]\n[Result "{result}"]\n\n{moves}\n\n')
+
+
+def test_split_ranges_read_every_game_once(tmp_path):
+    path = tmp_path / "games.pgn"
+    write_pgn(path)
+
+    for parts in range(1, 12):
+        events = [
+            game["Event"]
+            for start, end in split_file(str(path), parts)
+            for game in read_games(str(path), start, end)
+        ]
+        assert events == [f"Game {index}" for index in range(len(GAMES))]
+
+
+def test_san_replay_handles_castling_and_captures():
+    board = Board()
+    turn = "white"
+    for san in clean_moves(GAMES[0][1]) + ["Re1"]:
+        board.apply_move(resolve_san(board, turn, san))
+        turn = "black" if turn == "white" else "white"
+    assert board.squares[7][6].type == "king"
+    assert board.squares[7][4].type == "rook"
+
+
+def test_position_key_includes_modifiers():
+    board = Board()
+    plain = position_key(board, "white")
+    assert plain != position_key(board, "black")
+    assert plain == position_key(Board(), "white")
+
+    board.squares[7][0].add_modifier(QUOOK_MODIFIER)
+    assert position_key(board, "white") != plain
+
+
+def test_build_and_lookup(tmp_path):
+    path = tmp_path / "games.pgn"
+    write_pgn(path)
+    output = str(tmp_path / "book.cgob")
+
+    build([str(path)], output, max_plies=6, min_games=1, workers=2)
+    book = OpeningBook(output)
+
+    moves = book.lookup(Board(), "white")
+    assert [(move.position_to.notation(), move.games) for move in moves] == [
+        ("e4", 3),
+        ("d4", 1),
+    ]
+    assert (moves[0].white_wins, moves[0].draws, moves[0].black_wins) == (2, 0, 1)
+    assert book.choose(Board(), "black") is None
+    book.close()
@@ -0,0 +1,139 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.svc.cache import AsyncCache
+from app.svc.database_service import DatabaseService
+from app.svc.room import ConnectionManager, RoomManager, RoomService, UserInfo
+
+
+class CountingLoader:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+
+    async def __call__(self, key):
+        self.calls.append(key)
+        await asyncio.sleep(self.delay)
+        return f"{key}:{len(self.calls)}"
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_load():
+    loader = CountingLoader(0.01)
+    cache = AsyncCache(loader)
+
+    values = await asyncio.gather(*(cache.get("a") for _ in range(10)))
+    assert values == ["a:1"] * 10
+    assert await cache.get("a") == "a:1"
+    assert loader.calls == ["a"]
+    stats = cache.get_stats()
+    assert stats["misses"] == 10
+    assert stats["coalesced"] == 9
+    assert stats["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_entries_expire_and_least_recently_used_go_first():
+    loader = CountingLoader()
+    cache = AsyncCache(loader, ttl=0.05, max_size=2)
+    await cache.get("a")
+    await cache.get("b")
+    await cache.get("a")  # "b" is now least recently used
+    await cache.get("c")
+    assert cache.peek("b") is None
+    assert cache.peek("a") == "a:1"
+    assert cache.get_stats()["evictions"] == 1
+
+    await asyncio.sleep(0.06)
+    assert await cache.get("a") == "a:4"
+
+
+@pytest.mark.asyncio
+async def test_invalidation_during_a_load_is_not_undone():
+    loader = CountingLoader(0.02)
+    cache = AsyncCache(loader)
+    load = asyncio.create_task(cache.get("a"))
+    await asyncio.sleep(0.005)
+    cache.invalidate("a")
+    assert await load == "a:1"
+    assert cache.peek("a") is None
+    assert await cache.get("a") == "a:2"
+
+
+@pytest.mark.asyncio
+async def test_errors_are_shared_but_not_cached():
+    calls = []
+
+    async def failing(key):
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("database down")
+
+    cache = AsyncCache(failing)
+    results = await asyncio.gather(
+        cache.get("a"), cache.get("a"), return_exceptions=True
+    )
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert calls == ["a"]
+    with pytest.raises(RuntimeError):
+        await cache.get("a")
+    assert calls == ["a", "a"]
+
+
+@pytest.mark.asyncio
+async def test_a_cancelled_caller_does_not_cancel_the_shared_load():
+    loader = CountingLoader(0.02)
+    cache = AsyncCache(loader)
+    first = asyncio.create_task(cache.get("a"))
+    await asyncio.sleep(0)
+    second = asyncio.create_task(cache.get("a"))
+    await asyncio.sleep(0.005)
+
+    # The caller that started the load goes away, e.g. its socket closed
+    first.cancel()
+    assert await second == "a:1"
+    assert first.cancelled()
+    assert loader.calls == ["a"]
+    assert cache.peek("a") == "a:1"
+
+
+class FakeSession:
+    def __init__(self, user):
+        self.user = user
+
+    async def execute(self, _statement):
+        return SimpleNamespace(scalar_one_or_none=lambda: self.user)
+
+    async def commit(self):
+        pass
+
+    async def refresh(self, _user):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_rating_update_drops_the_cached_user_info(monkeypatch):
+    room_manager = RoomManager(ConnectionManager(), RoomService())
+    loads = []
+
+    async def load(user_id):
+        loads.append(user_id)
+        return UserInfo(elo=1200 + len(loads), username="alice")
+
+    room_manager.user_info_cache.loader = load
+    monkeypatch.setattr(
+        DatabaseService,
+        "user_changed_listeners",
+        [room_manager.user_info_cache.invalidate],
+    )
+
+    assert (await room_manager.get_user_info("user-1")).elo == 1201
+    assert (await room_manager.get_user_info("user-1")).elo == 1201
+    assert room_manager.get_cache_stats()["user_info"]["hit_rate"] == 0.5
+
+    user = SimpleNamespace(id="user-1", elo=1201)
+    await DatabaseService(FakeSession(user)).update_user_elo("user-1", 1250)
+    assert (await room_manager.get_user_info("user-1")).elo == 1202
+    assert loads == ["user-1", "user-1"]
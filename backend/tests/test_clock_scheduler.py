@@ -0,0 +1,108 @@
+import asyncio
+import threading
+import time
+from uuid import uuid4
+
+import pytest
+
+from app.obj.game import Game, GameStatus
+from app.obj.position import position_from_notation
+from app.svc.clock_scheduler import ClockScheduler
+from app.svc.game_service import GameService
+from app.svc.room import Room
+from app.svc.room_threads import RoomThreads
+
+
+@pytest.mark.asyncio
+async def test_deadlines_fire_in_order_and_follow_reschedules():
+    fired = []
+
+    async def on_deadline(room_id):
+        fired.append((room_id, time.time()))
+
+    scheduler = ClockScheduler(on_deadline)
+    task = asyncio.create_task(scheduler.run())
+    try:
+        first, second, cancelled = uuid4(), uuid4(), uuid4()
+        now = time.time()
+        scheduler.schedule(second, now + 0.2)
+        scheduler.schedule(first, now + 0.5)
+        scheduler.schedule(cancelled, now + 0.05)
+        # Moving a deadline earlier must wake the sleeping runner
+        scheduler.schedule(first, now + 0.1)
+        scheduler.schedule(cancelled, None)
+
+        await asyncio.sleep(0.35)
+        assert [room_id for room_id, _ in fired] == [first, second]
+        assert fired[0][1] - (now + 0.1) < 0.05
+        assert scheduler.get_stats()["scheduled"] == 0
+    finally:
+        task.cancel()
+
+
+def test_stale_entries_are_compacted():
+    async def on_deadline(room_id):
+        pass
+
+    scheduler = ClockScheduler(on_deadline)
+    room_id = uuid4()
+    for offset in range(1000):
+        scheduler.schedule(room_id, time.time() + offset)
+    assert len(scheduler.heap) < 100
+    assert scheduler.pop_due(time.time() + 10_000) == [room_id]
+
+
+def test_watched_game_reschedules_on_move_and_end():
+    async def on_deadline(room_id):
+        pass
+
+    scheduler = ClockScheduler(on_deadline)
+    room_id = uuid4()
+    game = Game()
+    scheduler.watch(room_id, game)
+    assert scheduler.next_deadline() == pytest.approx(
+        game.last_move_time + game.white_time_left
+    )
+
+    game.move(position_from_notation("e2"), position_from_notation("e4"), "white")
+    assert game.turn == "black"
+    assert scheduler.next_deadline() == pytest.approx(
+        game.last_move_time + game.black_time_left
+    )
+
+    game.mark_player_forfeit("black")
+    assert game.status == GameStatus.COMPLETE
+    assert scheduler.next_deadline() is None
+
+
+@pytest.mark.asyncio
+async def test_moves_on_a_room_thread_reschedule_on_the_event_loop():
+    async def on_deadline(room_id):
+        pass
+
+    scheduler = ClockScheduler(on_deadline)
+    scheduled_on = []
+    schedule = scheduler.schedule
+
+    def recording_schedule(room_id, deadline):
+        scheduled_on.append(threading.current_thread().name)
+        schedule(room_id, deadline)
+
+    scheduler.schedule = recording_schedule
+    room = Room()
+    scheduler.watch(room.id, room.game)
+    room_threads = RoomThreads(1)
+    try:
+        moved = await GameService(room_threads).process_move(
+            room, "white", (6, 4), (4, 4)
+        )
+        assert moved
+        await asyncio.sleep(0)  # Let the loop run the handed-back reschedule
+    finally:
+        room_threads.shutdown()
+
+    loop_thread = threading.current_thread().name
+    assert scheduled_on == [loop_thread, loop_thread]
+    assert scheduler.next_deadline() == pytest.approx(
+        room.game.last_move_time + room.game.black_time_left
+    )
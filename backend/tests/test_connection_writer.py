@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+from app.svc.room import WebSocketConnection
+
+
+class SlowWebSocket:
+    def __init__(self, delay):
+        self.delay = delay
+        self.sent = []
+        self.close_code = None
+
+    async def send_text(self, data):
+        await asyncio.sleep(self.delay)
+        self.sent.append(data)
+
+    async def close(self, code=1000):
+        self.close_code = code
+
+
+@pytest.mark.asyncio
+async def test_full_queue_keeps_only_the_latest_state():
+    websocket = SlowWebSocket(0.05)
+    connection = WebSocketConnection(websocket, max_queued=2)
+    connection.start()
+
+    connection.send("state 1")
+    await asyncio.sleep(0)  # The writer takes "state 1"
+    for state in range(2, 6):
+        connection.send(f"state {state}")
+
+    await asyncio.sleep(0.3)
+    assert websocket.sent == ["state 1", "state 4", "state 5"]
+    stats = connection.get_stats()
+    assert stats["sent"] == 3
+    assert stats["coalesced"] == 2
+    assert stats["max_lag_ms"] > 0
+    connection.close()
+
+
+@pytest.mark.asyncio
+async def test_stalled_connection_is_closed_without_blocking_others():
+    stalled = WebSocketConnection(SlowWebSocket(10), max_send_lag=0.05)
+    healthy_socket = SlowWebSocket(0)
+    healthy = WebSocketConnection(healthy_socket, max_send_lag=0.05)
+    stalled.start()
+    healthy.start()
+
+    stalled.send("state")
+    healthy.send("state")
+    await asyncio.sleep(0.1)
+
+    assert healthy_socket.sent == ["state"]
+    assert stalled.closed
+    assert stalled.websocket.close_code == 1013
+    stalled.send("ignored")
+    assert stalled.get_stats()["queued"] == 0
+    healthy.close()
@@ -0,0 +1,71 @@
+from app.engine.zobrist import position_key
+from app.obj.board import Board
+from app.obj.game import Game
+from app.obj.position import Position
+from app.svc.game_templates import GameTemplates
+from app.svc.position_service import summarise
+from app.svc.room import RoomService
+
+LOADOUT = {
+    "white": [
+        {"pos": [7, 0], "modifier": "Knook"},
+        {"pos": [6, 4], "modifier": "Kitty"},
+    ],
+    "black": [{"pos": [1, 0], "modifier": "Kitty"}],
+}
+
+
+def test_games_from_a_template_match_a_freshly_built_board():
+    compiled = RoomService().compile_loadout(LOADOUT)
+    template = GameTemplates().get(compiled, compiled)
+    game = template.new_game()
+
+    board = Board()
+    for color in ("white", "black"):
+        for row, col, modifier in compiled[color]:
+            board.squares[row][col].add_modifier(modifier)
+
+    assert game.board.get_squares() == board.get_squares() == template.squares
+    assert game.position_history == Game().position_history
+    assert template.key == position_key(board, "white")
+    expected = summarise(board, "white")
+    assert [m.to_dict() for m in template.summary.moves["white"]] == [
+        m.to_dict() for m in expected.moves["white"]
+    ]
+
+
+def test_playing_a_game_leaves_its_template_untouched():
+    compiled = RoomService().compile_loadout(LOADOUT)
+    template = GameTemplates().get(compiled, None)
+    game = template.new_game()
+
+    assert game.move(Position(6, 4), Position(4, 4), "white")
+    game.board.squares[7][0].remove_modifier("Knook")
+    assert not template.is_unchanged(game)
+
+    assert template.board.squares[6][4].position.coordinates() == (6, 4)
+    assert template.board.squares[4][4] is None
+    assert [m.modifier_type for m in template.board.squares[7][0].modifiers] == [
+        "Knook"
+    ]
+    assert template.is_unchanged(template.new_game())
+
+
+def test_templates_are_shared_per_loadout_pair():
+    room_service = RoomService()
+    compiled = room_service.compile_loadout(LOADOUT)
+    templates = GameTemplates(max_size=2)
+
+    first = templates.get(compiled, None)
+    assert templates.get(compiled, None) is first
+    # Only each player's own side counts
+    assert templates.get(compiled, {"white": [], "black": []}) is first
+    templates.get(None, compiled)
+    templates.get(None, None)
+    assert templates.get_stats() == {
+        "size": 2,
+        "hits": 2,
+        "misses": 3,
+        "evictions": 1,
+        "hit_rate": 0.4,
+    }
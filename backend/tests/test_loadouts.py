@@ -0,0 +1,79 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.svc.database_service import DatabaseService
+from app.svc.room import RoomService
+
+LOADOUT = {
+    "white": [
+        {"pos": [7, 0], "modifier": "Knook"},
+        {"pos": [7, 1], "modifier": "Knook"},  # Not a rook: skipped
+        {"pos": [4, 4], "modifier": "Kitty"},  # Empty square: skipped
+    ],
+    "black": [{"pos": [1, 0], "modifier": "Kitty"}],
+}
+
+
+def test_compiled_loadout_keeps_only_valid_assignments():
+    compiled = RoomService().compile_loadout(LOADOUT)
+    assert [(row, col, m.modifier_type) for row, col, m in compiled["white"]] == [
+        (7, 0, "Knook")
+    ]
+    # Black columns are mirrored
+    assert [(row, col) for row, col, _ in compiled["black"]] == [(1, 7)]
+
+
+@pytest.mark.asyncio
+async def test_rooms_open_from_loadouts_cached_at_queue_time():
+    room_service = RoomService()
+    users = {
+        "alice": SimpleNamespace(id="alice", elo=1200, loadout=LOADOUT),
+        "bob": SimpleNamespace(id="bob", elo=1210, loadout=None),
+    }
+
+    async def get_users(user_ids):
+        return {user_id: users[user_id] for user_id in user_ids}
+
+    async def no_database(user_id):
+        raise AssertionError(f"Loaded {user_id} from the database")
+
+    room_service._get_users = get_users
+    room_service.loadouts.loader = no_database
+    room_service.add_to_queue("alice")
+    room_service.add_to_queue("bob")
+    assert await room_service.admit_arrivals() == 2
+
+    (pair,) = room_service.match_waiting_players()
+    room = room_service.get_room(await room_service.new_room(*pair))
+    rook = room.game.board.squares[7][0]
+    assert [m.modifier_type for m in rook.modifiers] == ["Knook"]
+    assert room_service.loadouts.get_stats()["hits"] == 2
+    room.actor.close()
+
+
+class FakeSession:
+    def __init__(self, user):
+        self.user = user
+
+    async def execute(self, _statement):
+        return SimpleNamespace(scalar_one_or_none=lambda: self.user)
+
+    async def commit(self):
+        pass
+
+    async def refresh(self, _user):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_saving_a_loadout_drops_the_cached_copy(monkeypatch):
+    room_service = RoomService()
+    room_service.loadouts.put("alice", room_service.compile_loadout(LOADOUT))
+    monkeypatch.setattr(
+        DatabaseService, "user_changed_listeners", [room_service.loadouts.invalidate]
+    )
+
+    user = SimpleNamespace(id="alice", loadout=LOADOUT)
+    await DatabaseService(FakeSession(user)).update_user_loadout("alice", {})
+    assert room_service.loadouts.peek("alice") is None
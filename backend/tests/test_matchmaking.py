@@ -0,0 +1,143 @@
+import random
+
+import pytest
+
+from app.svc.matchmaking import MAX_SCAN_PER_BAND, MatchmakingQueue
+from app.svc.room import ConnectionManager, RoomManager, RoomService
+
+
+def test_players_match_within_a_window_that_widens_while_waiting():
+    queue = MatchmakingQueue()
+    queue.add("strong", 2000, now=0)
+    queue.add("weak", 1200, now=0)
+    assert not queue.add("weak", 1200, now=1)  # Already queued
+
+    queue.add("close", 1250, now=1)
+    assert queue.find_match("close", now=1) == "weak"
+    queue.pair("weak", "close", now=1)
+
+    queue.add("guest", None, now=2)  # Guests count as 1200
+    assert queue.find_match("guest", now=2) is None
+    # 800 points apart is acceptable once the longer waiter has waited 28s
+    assert queue.find_match("guest", now=27) is None
+    assert queue.find_match("guest", now=29) == "strong"
+
+    stats = queue.get_stats()
+    assert stats["queued"] == 2
+    assert stats["bands"] == {1200: 1, 2000: 1}
+    assert stats["time_to_match_seconds"]["p50"] == 1
+
+
+def test_leaving_players_are_skipped_and_compacted():
+    queue = MatchmakingQueue()
+    for index in range(1000):
+        queue.add(f"left {index}", 1500, now=0)
+        queue.remove(f"left {index}")
+    assert len(queue.buckets[15]) < 50
+
+    queue.add("waiting", 1500, now=0)
+    queue.add("new", 1510, now=1)
+    assert queue.find_match("new", now=1) == "waiting"
+    assert "left 3" not in queue
+
+
+def test_queue_operations_stay_fast_with_many_players():
+    queue = MatchmakingQueue()
+    rng = random.Random(0)
+    for index in range(50_000):
+        queue.add(str(index), rng.randint(600, 2600), now=0)
+    matches = 0
+    for index in range(0, 50_000, 2):
+        user_id = str(index)
+        if user_id in queue:
+            opponent = queue.find_match(user_id, now=0)
+            if opponent:
+                queue.pair(opponent, user_id, now=0)
+                matches += 1
+        queue.remove(str(index + 1))
+    assert matches > 10_000
+    # Each leaver is walked past at most once, on top of a bounded scan
+    assert queue.visits < 2 * 50_000
+
+
+def test_lookups_drop_leavers_behind_waiting_players():
+    queue = MatchmakingQueue()
+    queue.add("too far", 1599, now=0)
+    for index in range(10):
+        queue.add(f"left {index}", 1550, now=0)
+        queue.remove(f"left {index}")
+    queue.add("near", 1500, now=0)
+    queue.add("searching", 1400, now=0)
+
+    assert queue.find_match("searching", now=0) == "near"
+    assert [entry.user_id for entry in queue.buckets[15]] == ["too far", "near"]
+
+
+def test_lookups_scan_a_bounded_number_of_players_per_band():
+    queue = MatchmakingQueue()
+    for index in range(5000):
+        queue.add(f"far {index}", 1399, now=0)
+    queue.add("searching", 1200, now=0)
+
+    for _ in range(100):
+        assert queue.find_match("searching", now=0) is None
+    # Only band 13 has anyone but the searcher, and only its front is scanned
+    assert queue.visits <= 100 * (MAX_SCAN_PER_BAND + 1)
+    assert [entry.user_id for entry in queue.buckets[13]][:2] == ["far 0", "far 1"]
+
+
+def test_match_all_pairs_longest_waiting_first():
+    queue = MatchmakingQueue()
+    queue.add("a", 1500, now=0)
+    queue.add("b", 2500, now=1)
+    queue.add("c", 1520, now=2)
+    queue.add("d", 1480, now=3)
+    queue.add("e", 2450, now=4)
+    assert queue.match_all(now=5) == [("a", "c"), ("b", "e")]
+    assert list(queue.entries) == ["d"]
+
+
+class FakeWebSocket:
+    scope = {"subprotocols": []}
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, data):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_tick_opens_rooms_for_a_burst_of_arrivals():
+    room_manager = RoomManager(ConnectionManager(), RoomService())
+    connection_ids = [await room_manager.connect(FakeWebSocket()) for _ in range(7)]
+    assert room_manager.room_service.rooms == {}
+    assert room_manager.room_service.queue_length() == 7
+
+    # The last arrival leaves before the tick
+    await room_manager.disconnect(connection_ids[-1])
+    room_ids = await room_manager.matchmaking_tick()
+
+    assert len(room_ids) == 3
+    assert room_manager.room_service.queue_length() == 0
+    for connection_id in connection_ids[:6]:
+        user_id = room_manager.manager.get_user_id_for_connection(connection_id)
+        assert room_manager.room_service.find_player_room(user_id) is not None
+
+
+@pytest.mark.asyncio
+async def test_seated_or_queued_arrivals_are_not_queued_again():
+    room_service = RoomService()
+    room_service.add_to_queue("guest_queued")
+    await room_service.admit_arrivals()
+
+    # Both reconnect: one was queued meanwhile, the other seated in a room
+    room_service.arrivals["guest_queued"] = None
+    room_service.add_to_queue("guest_seated")
+    room_service.player_to_room_map["guest_seated"] = "room"
+    room_service.add_to_queue("guest_new")
+
+    assert await room_service.admit_arrivals() == 1
+    assert room_service.arrivals == {}
+    assert "guest_seated" not in room_service.queue
+    assert room_service.queue_length() == 2
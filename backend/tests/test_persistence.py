@@ -0,0 +1,189 @@
+import asyncio
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import DataError
+
+from app.obj.game import GameStatus
+from app.svc.database_service import DatabaseService
+from app.svc.elo_service import EloService
+from app.svc import persistence as persistence_module
+from app.svc.persistence import FinishedGame, PersistenceQueue
+from app.svc.room import Room, RoomService
+
+
+class RecordingWriter:
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.batches = []
+
+    async def __call__(self, batch):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("database unavailable")
+        self.batches.append([game.winner for game in batch])
+
+
+def finished(winner="white", white="alice", black="bob"):
+    return FinishedGame(white, black, winner, "checkmate", rated=True)
+
+
+@pytest.mark.asyncio
+async def test_closing_a_room_only_queues_the_game():
+    writer = RecordingWriter()
+    room_service = RoomService(persistence=PersistenceQueue(writer))
+    room = Room()
+    room.white, room.black = "alice", "guest_1"
+    room.game.status = GameStatus.COMPLETE
+    room.game.winner = "black"
+    room_service.rooms[room.id] = room
+
+    await room_service.cleanup_room(room.id)
+    (game,) = room_service.persistence.pending
+    assert game.to_row()["black_player_id"] is None
+    assert not game.rated  # Guests are not rated
+    assert writer.batches == []
+
+    await room_service.persistence.close()
+    assert writer.batches == [["black"]]
+
+
+@pytest.mark.asyncio
+async def test_batches_are_retried_and_drained_on_close(monkeypatch):
+    monkeypatch.setattr(persistence_module, "RETRY_BACKOFF_SECONDS", 0.001)
+    writer = RecordingWriter(failures=2)
+    queue = PersistenceQueue(writer, batch_size=2, flush_interval=60, max_backlog=5)
+    queue.start()
+
+    for winner in ["white", "black", "draw", "white", "black", "draw"]:
+        queue.record(finished(winner))
+    await queue.close(timeout=1)
+
+    # The first batch went out on the third attempt; the sixth game did not fit
+    assert writer.batches == [["white", "black"], ["draw", "white"], ["black"]]
+    stats = queue.get_stats()
+    assert (stats["saved"], stats["failures"], stats["dropped"]) == (5, 2, 1)
+    assert not queue.record(finished())
+
+
+@pytest.mark.asyncio
+async def test_a_batch_is_retried_for_as_long_as_the_database_is_down(monkeypatch):
+    monkeypatch.setattr(persistence_module, "RETRY_BACKOFF_SECONDS", 0.001)
+    monkeypatch.setattr(persistence_module, "MAX_RETRY_BACKOFF_SECONDS", 0.001)
+    writer = RecordingWriter(failures=10)
+    queue = PersistenceQueue(writer, max_attempts=3)
+    queue.record(finished())
+    await asyncio.wait_for(queue.flush_batch(), 1)
+
+    # Connection failures never count towards max_attempts
+    assert writer.batches == [["white"]]
+    stats = queue.get_stats()
+    assert (stats["saved"], stats["failures"], stats["dropped"]) == (1, 10, 0)
+
+
+class PoisonWriter(RecordingWriter):
+    """Fails every batch containing a game with an unknown winner."""
+
+    async def __call__(self, batch):
+        if any(game.winner not in ("white", "black", "draw") for game in batch):
+            raise DataError("INSERT INTO chess_games", {}, ValueError("bad winner"))
+        await super().__call__(batch)
+
+
+@pytest.mark.asyncio
+async def test_only_the_bad_record_of_a_failing_batch_is_dropped(monkeypatch):
+    monkeypatch.setattr(persistence_module, "RETRY_BACKOFF_SECONDS", 0.001)
+    writer = PoisonWriter()
+    queue = PersistenceQueue(writer, max_attempts=2)
+    for winner in ["white", "black", "nobody", "draw", "white"]:
+        queue.record(finished(winner))
+    await asyncio.wait_for(queue.flush_batch(), 1)
+
+    # The good games are saved in the order they finished
+    assert writer.batches == [["white", "black"], ["draw", "white"]]
+    stats = queue.get_stats()
+    assert (stats["saved"], stats["dropped"], stats["backlog"]) == (4, 1, 0)
+
+
+def test_ratings_follow_games_in_the_order_they_finished():
+    elos = EloService().new_ratings(
+        [("alice", "bob", "white"), ("bob", "carol", "white"), ("dan", "bob", "draw")],
+        {"alice": 1200, "bob": None, "carol": 1500},
+    )
+    # Bob lost at the default rating, then played carol from his new one
+    assert elos["alice"] == 1212
+    bob_change, carol_change = EloService().rating_changes(1188, 1500, "white")
+    assert elos["bob"] == 1188 + bob_change
+    assert elos["carol"] == 1500 + carol_change
+    assert "dan" not in elos  # Unknown players are skipped
+
+
+class CapturingSession:
+    """Returns results[i] as the rows of the i-th statement."""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.statements = []
+        self.commits = 0
+
+    async def execute(self, statement):
+        self.statements.append(str(statement.compile(dialect=postgresql.dialect())))
+        rows = self.results.pop(0) if self.results else []
+        return SimpleNamespace(
+            all=lambda: rows, scalars=lambda: SimpleNamespace(all=lambda: rows)
+        )
+
+    async def commit(self):
+        self.commits += 1
+
+
+@pytest.mark.asyncio
+async def test_a_game_and_both_ratings_are_saved_in_one_transaction(monkeypatch):
+    changed = []
+    monkeypatch.setattr(DatabaseService, "user_changed_listeners", [changed.append])
+    game = finished()
+    session = CapturingSession([("alice", 1200), ("bob", None)], [game.id])
+
+    elos = await EloService().save_games([game], DatabaseService(session))
+    assert elos == {"alice": 1212, "bob": 1188}
+    lock, insert, update = session.statements
+    assert lock.endswith("ORDER BY users.id FOR UPDATE")
+    assert insert.startswith("INSERT INTO chess_games")
+    assert "UPDATE users SET elo=ratings.elo" in update
+    assert "FROM (VALUES" in update
+    assert session.commits == 1
+    assert changed == ["alice", "bob"]
+
+
+@pytest.mark.asyncio
+async def test_games_saved_by_an_earlier_attempt_are_not_rated_again(monkeypatch):
+    changed = []
+    monkeypatch.setattr(DatabaseService, "user_changed_listeners", [changed.append])
+    new_game = finished()
+    saved_game = finished("black", "carol", "dan")
+    stored = [("alice", 1200), ("bob", 1200), ("carol", 1300), ("dan", 1100)]
+    # The first attempt committed saved_game before the connection dropped
+    session = CapturingSession(stored, [new_game.id])
+
+    @asynccontextmanager
+    async def unit_of_work():
+        yield session
+
+    monkeypatch.setattr(persistence_module, "unit_of_work", unit_of_work)
+    await PersistenceQueue()._write([new_game, saved_game])
+
+    lock, insert, update = session.statements
+    assert "ON CONFLICT (id) DO NOTHING RETURNING chess_games.id" in insert
+    assert changed == ["alice", "bob"]
+    assert session.commits == 1
+
+
+@pytest.mark.asyncio
+async def test_unrated_games_are_inserted_together():
+    session = CapturingSession()
+    games = [finished().to_row(), finished("draw").to_row()]
+    assert await DatabaseService(session).insert_games(games) == set()
+    (insert,) = session.statements
+    assert insert.startswith("INSERT INTO chess_games") and "_m1" in insert
@@ -0,0 +1,136 @@
+import random
+
+import pytest
+
+from app.engine.fen import board_from_fen
+from app.obj.board import Board
+from app.obj.game import Game
+from app.obj.modifier import ALL_MODIFIERS
+from app.obj.position import position_from_notation
+from app.svc import position_service as position_service_module
+from app.svc.position_service import (
+    PROCESS,
+    THREAD,
+    PositionService,
+    snapshot,
+    summarise,
+    summarise_snapshot,
+)
+
+
+def move_set(moves):
+    return {
+        (
+            move.position_from.row,
+            move.position_from.col,
+            move.position_to.row,
+            move.position_to.col,
+            move.promote_to_type,
+        )
+        for move in moves
+    }
+
+
+def assert_same_summary(summary, expected):
+    assert summary.kings_in_check == expected.kings_in_check
+    for color in ["white", "black"]:
+        assert move_set(summary.moves[color]) == move_set(expected.moves[color])
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("mode", [THREAD, PROCESS])
+async def test_offloaded_summary_matches_inline(mode):
+    game = Game()
+    for start, end in [("e2", "e4"), ("d7", "d5"), ("e4", "d5")]:
+        assert game.move(
+            position_from_notation(start), position_from_notation(end), game.turn
+        )
+    board, turn = board_from_fen(
+        "r[Quook]nbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/"
+        "RN[Royal Guard]BQK[Escape Hatch:0]BNR b Kq e3 0 1"
+    )
+
+    service = PositionService(mode=mode, workers=1, budget=30)
+    try:
+        for position, side in [(game.board, game.turn), (board, turn)]:
+            expected = summarise(position, side)
+            summary = await service.summarise(position, side)
+            assert_same_summary(summary, expected)
+        assert service.get_stats()["offloaded"] == 2
+
+        # The same position again comes from the cache
+        await service.summarise(board, turn)
+        assert service.get_stats()["offloaded"] == 2
+    finally:
+        service.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_small_positions_and_slow_workers_fall_back_inline():
+    board, turn = board_from_fen("4k3/8/8/8/8/8/8/4K2R w K - 0 1")
+    service = PositionService(mode=THREAD, workers=1, budget=0)
+    try:
+        await service.summarise(board, turn)
+        assert service.get_stats()["inline"] == 1
+        assert service.executor is None
+
+        game = Game()
+        summary = await service.summarise(game.board, game.turn)
+        assert len(summary.moves["white"]) == 20
+        assert service.get_stats()["over_budget"] == 1
+    finally:
+        service.shutdown()
+
+
+def test_snapshots_keep_moved_flags_that_fen_cannot_express():
+    board = Board()
+    # White's rooks are gone but the king has not moved, so FEN has no
+    # castling rights for it; castling is still a premove
+    for col in (0, 7):
+        board.pieces.remove(board.squares[7][col])
+        board.squares[7][col] = None
+
+    summary = summarise_snapshot(snapshot(board, "black"))
+    premoves = move_set(summary.moves["white"])
+    assert {(7, 4, 7, 6, None), (7, 4, 7, 2, None)} <= premoves
+    assert_same_summary(summary, summarise(board, "black"))
+
+
+def test_snapshots_summarise_like_the_board_on_played_positions():
+    # Sacrificial Lamb is left out: its check test recurses on some boards
+    modifiers = [m for m in ALL_MODIFIERS if m.modifier_type != "Sacrificial Lamb"]
+    # Seeds whose games reach positions where FEN alone loses moved flags
+    for seed in [3, 11]:
+        rng = random.Random(seed)
+        board = Board()
+        for piece in list(board.pieces):
+            if rng.random() < 0.3:
+                choices = [m for m in modifiers if piece.can_add_modifier(m)]
+                if choices:
+                    piece.add_modifier(rng.choice(choices))
+        turn = "white"
+        for _ in range(40):
+            moves = board.get_available_moves_for_color(turn)
+            if not moves:
+                break
+            board.apply_move(rng.choice(moves))
+            turn = "black" if turn == "white" else "white"
+            assert_same_summary(
+                summarise_snapshot(snapshot(board, turn)), summarise(board, turn)
+            )
+
+
+@pytest.mark.asyncio
+async def test_worker_errors_fall_back_inline(monkeypatch):
+    def broken(position):
+        raise RuntimeError("worker pool is broken")
+
+    monkeypatch.setattr(position_service_module, "summarise_snapshot", broken)
+    game = Game()
+    service = PositionService(mode=THREAD, workers=1, budget=30)
+    try:
+        summary = await service.summarise(game.board, game.turn)
+        assert_same_summary(summary, summarise(game.board, game.turn))
+        assert service.get_stats()["failed"] == 1
+    finally:
+        service.shutdown()
@@ -103,3 +103,23 @@ def test_kitty_doesnt_eat_your_own_pieces():
     }
 
     assert (("d2", "e3")) not in moves["moves"]["white"]
+
+
+def test_teleport_swaps_with_the_friendly_piece_instead_of_capturing_it():
+    game = Game()
+    game.board.piece_from_position(position_from_notation("e1")).add_modifier(
+        TELEPORT_MODIFIER
+    )
+
+    assert game.move(
+        position_from_notation("e1"), position_from_notation("a1"), game.turn
+    )
+
+    king = game.board.piece_from_position(position_from_notation("a1"))
+    rook = game.board.piece_from_position(position_from_notation("e1"))
+    assert isinstance(king, King)
+    assert rook.type == "rook" and rook.color == "white"
+    assert rook.position.notation() == "e1"
+    assert rook in game.board.pieces
+    assert len(game.board.pieces) == 32
+    assert game.board.captured_pieces == []
@@ -0,0 +1,62 @@
+import asyncio
+from uuid import uuid4
+
+import pytest
+
+from app.svc.room_actor import RoomActor
+
+
+@pytest.mark.asyncio
+async def test_events_run_one_at_a_time_in_order():
+    actor = RoomActor(uuid4())
+    log = []
+
+    async def event(name):
+        log.append(f"{name} start")
+        await asyncio.sleep(0.01)  # e.g. a database write
+        log.append(f"{name} end")
+
+    actor.start()
+    for name in ["move", "resign", "timeout"]:
+        assert actor.submit(lambda name=name: event(name))
+    await asyncio.sleep(0.1)
+
+    assert log == [
+        "move start",
+        "move end",
+        "resign start",
+        "resign end",
+        "timeout start",
+        "timeout end",
+    ]
+    assert actor.get_stats()["processed"] == 3
+    actor.close()
+
+
+@pytest.mark.asyncio
+async def test_full_queue_refuses_player_messages_but_not_internal_events():
+    actor = RoomActor(uuid4(), max_queued=2)
+    handled = []
+
+    async def event(name):
+        handled.append(name)
+
+    assert actor.submit(lambda: event("a"))
+    assert actor.submit(lambda: event("b"))
+    assert not actor.submit(lambda: event("c"))
+    assert actor.submit(lambda: event("deadline"), internal=True)
+    assert actor.get_stats() == {
+        "depth": 3,
+        "max_depth": 3,
+        "processed": 0,
+        "dropped": 1,
+    }
+
+    actor.start()
+    await asyncio.sleep(0.01)
+    assert handled == ["a", "b", "deadline"]
+
+    # A closed room accepts nothing, and its task finishes
+    actor.close()
+    assert not actor.submit(lambda: event("late"), internal=True)
+    await asyncio.wait_for(actor.task, 1)
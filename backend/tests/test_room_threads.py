@@ -0,0 +1,53 @@
+import threading
+
+import pytest
+
+from app.svc.room_registry import StripedDict
+from app.svc.room_threads import RoomThreads, benchmark
+
+
+def test_striped_dict_behaves_like_a_dict_across_threads():
+    registry = StripedDict(stripes=4)
+
+    def fill(start):
+        for key in range(start, start + 500):
+            registry[f"room-{key}"] = key
+            assert registry[f"room-{key}"] == key
+        for key in range(start, start + 250):
+            del registry[f"room-{key}"]
+
+    workers = [threading.Thread(target=fill, args=(n * 500,)) for n in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert len(registry) == 1000
+    assert "room-0" not in registry
+    assert registry.get("room-499") == 499
+    assert registry.pop("room-499") == 499
+    assert registry.pop("room-499", None) is None
+    assert sorted(registry.values())[:2] == [250, 251]
+    assert StripedDict() == {}
+
+
+@pytest.mark.asyncio
+async def test_each_room_stays_on_one_thread():
+    threads = RoomThreads(3)
+
+    def current_thread():
+        return threading.current_thread().name
+
+    for room_id in ["a", "b", "c", "d"]:
+        names = {await threads.run(room_id, current_thread) for _ in range(5)}
+        assert names == {f"room-shard-{threads.thread_for(room_id)}_0"}
+    assert sum(threads.get_stats()["calls_per_thread"]) == 20
+    threads.shutdown()
+
+    inline = RoomThreads()
+    assert await inline.run("a", current_thread) == threading.current_thread().name
+
+
+def test_benchmark_plays_the_same_moves_inline_and_threaded():
+    results = benchmark(rooms=2, plies=2, thread_counts=[0, 2])["results"]
+    assert results["0"]["moves"] == results["2"]["moves"] == 4
@@ -0,0 +1,42 @@
+from app.engine.selfplay import SelfPlayConfig, read_results, report, run
+
+
+def test_self_play_is_resumable_and_deterministic(tmp_path):
+    config = SelfPlayConfig(seed=5, depth=1, max_plies=6, modifier_chance=0.5)
+    first = str(tmp_path / "first.jsonl")
+    second = str(tmp_path / "second.jsonl")
+
+    assert run(config, 2, first, workers=1) == 2
+    with open(first, "a") as file:
+        file.write('{"seed": 5, "game": 2, "winn')  # Interrupted mid-write
+    assert run(config, 3, first, workers=1) == 1
+    assert run(config, 3, first, workers=1) == 0
+    assert run(config, 3, second, workers=2) == 3
+
+    def key(record):
+        return {k: v for k, v in record.items() if k != "seconds"}
+
+    resumed = sorted(map(key, read_results(first, 5)), key=lambda r: r["game"])
+    fresh = sorted(map(key, read_results(second, 5)), key=lambda r: r["game"])
+    assert resumed == fresh
+    assert [record["game"] for record in resumed] == [0, 1, 2]
+
+
+def test_report_win_rate_deltas():
+    results = [
+        {"white_modifiers": ["Quook"], "black_modifiers": [], "winner": "white"},
+        {"white_modifiers": [], "black_modifiers": ["Quook"], "winner": "black"},
+        {"white_modifiers": ["Quook"], "black_modifiers": [], "winner": "draw"},
+        {"white_modifiers": [], "black_modifiers": [], "winner": "white"},
+    ]
+    for record in results:
+        record["seconds"] = 2.0
+
+    summary = report(results)
+    quook = summary["modifiers"]["Quook"]
+    # Sides with a Quook scored 2.5/3, the other five sides 1.5/5
+    assert quook["sides"] == 3
+    assert abs(quook["delta"] - (2.5 / 3 - 0.3)) < 1e-3
+    assert quook["low"] < quook["delta"] < quook["high"]
+    assert summary["games_per_hour_per_core"] == 1800.0
+    assert "Knook" not in summary["modifiers"]
@@ -0,0 +1,181 @@
+import asyncio
+import json
+import os
+import tempfile
+
+import pytest
+
+from app.auth import create_jwt_token
+from app.svc.broker import Broker, BrokerLink, InProcessBroker
+from app.svc.room import ConnectionManager, RoomManager, RoomService
+from app.svc.sharding import ShardCoordinator, ShardSpec, shard_for
+
+
+class FakeWebSocket:
+    scope = {"subprotocols": []}
+
+    def __init__(self):
+        self.sent = []
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, data):
+        self.sent.append(json.loads(data))
+
+
+def make_shards(count, broker, handoff_after=0.0):
+    shards = []
+    for index in range(count):
+        spec = ShardSpec(index, count)
+        room_manager = RoomManager(
+            ConnectionManager(shard=spec), RoomService(shard=spec)
+        )
+        room_manager.shards = ShardCoordinator(spec, room_manager, handoff_after)
+        room_manager.shards.attach(broker.link(index, room_manager.shards.handle))
+        shards.append(room_manager)
+    return shards
+
+
+def token_for(user_id):
+    return create_jwt_token(
+        {
+            "sub": user_id,
+            "email": f"{user_id}@example.com",
+            "name": None,
+            "type": "access",
+        }
+    )
+
+
+def user_on_shard(shard, count):
+    return next(
+        f"user-{n}" for n in range(1000) if shard_for(f"user-{n}", count) == shard
+    )
+
+
+def test_ids_hash_to_the_shard_that_made_them():
+    spec = ShardSpec(2, 4)
+    assert all(shard_for(spec.new_uuid(), 4) == 2 for _ in range(20))
+    assert all(
+        shard_for("guest_" + str(spec.new_uuid("guest_")), 4) == 2 for _ in range(20)
+    )
+
+
+@pytest.mark.asyncio
+async def test_players_on_different_shards_meet_on_the_lobby():
+    lobby, other = make_shards(2, InProcessBroker())
+    lobby_player, other_player = user_on_shard(0, 2), user_on_shard(1, 2)
+    lobby_socket, other_socket = FakeWebSocket(), FakeWebSocket()
+    await lobby.connect(lobby_socket, token_for(lobby_player))
+    await other.connect(other_socket, token_for(other_player))
+
+    # Nobody to play on either shard; the other shard hands its player off
+    assert await lobby.matchmaking_tick() == []
+    assert await other.matchmaking_tick() == []
+    assert other.shards.handed_off == {other_player}
+    await asyncio.sleep(0)
+
+    (room_id,) = await lobby.matchmaking_tick()
+    assert shard_for(room_id, 2) == 0
+    await asyncio.sleep(0.01)
+    redirect = other_socket.sent[-1]
+    assert redirect == {"type": "redirect", "shard": 0, "room_id": str(room_id)}
+
+    # Reconnecting to the home shard redirects again; the lobby serves the game
+    home_socket = FakeWebSocket()
+    await other.connect(home_socket, token_for(other_player))
+    await asyncio.sleep(0.01)
+    assert home_socket.sent[-1]["shard"] == 0
+    lobby_game_socket = FakeWebSocket()
+    await lobby.connect(lobby_game_socket, token_for(other_player))
+    await asyncio.sleep(0.01)
+    assert lobby_game_socket.sent[-1]["id"] == str(room_id)
+
+    # Closing the room frees the player on their home shard
+    await lobby.room_service.cleanup_room(room_id)
+    await asyncio.sleep(0)
+    assert other.shards.remote_rooms == {}
+
+
+@pytest.mark.asyncio
+async def test_a_guest_without_a_token_reconnects_to_their_room_on_another_shard():
+    lobby, other = make_shards(2, InProcessBroker())
+    await lobby.connect(FakeWebSocket(), token_for(user_on_shard(0, 2)))
+    guest_socket = FakeWebSocket()
+    connection_id = await other.connect(guest_socket)
+    guest_id = other.manager.connection_id_to_user_id[connection_id]
+    assert shard_for(guest_id, 2) == 1
+
+    await lobby.matchmaking_tick()
+    await other.matchmaking_tick()
+    await asyncio.sleep(0)
+    (room_id,) = await lobby.matchmaking_tick()
+    await asyncio.sleep(0.01)
+
+    # The redirect carries a token, so the guest keeps their id on the lobby
+    redirect = guest_socket.sent[-1]
+    assert (redirect["shard"], redirect["room_id"]) == (0, str(room_id))
+    await other.disconnect(connection_id)
+    reconnected = FakeWebSocket()
+    await lobby.connect(reconnected, redirect["token"])
+    await asyncio.sleep(0.01)
+    assert lobby.room_service.find_player_room(guest_id).id == room_id
+    assert reconnected.sent[-1]["id"] == str(room_id)
+
+    # Landing on the home shard again (no ?shard) sends the guest back
+    home_socket = FakeWebSocket()
+    await other.connect(home_socket, redirect["token"])
+    await asyncio.sleep(0.01)
+    assert home_socket.sent[-1]["room_id"] == str(room_id)
+
+
+@pytest.mark.asyncio
+async def test_players_are_sent_to_their_home_shard_and_can_withdraw():
+    lobby, other = make_shards(2, InProcessBroker())
+    player = user_on_shard(1, 2)
+    socket = FakeWebSocket()
+    await lobby.connect(socket, token_for(player))
+    await asyncio.sleep(0.01)
+    assert socket.sent[-1] == {"type": "redirect", "shard": 1}
+    assert lobby.room_service.queue_length() == 0
+
+    connection_id = await other.connect(FakeWebSocket(), token_for(player))
+    await other.matchmaking_tick()
+    await asyncio.sleep(0)
+    assert player in lobby.room_service.queue
+
+    await other.disconnect(connection_id)
+    await asyncio.sleep(0)
+    assert player not in lobby.room_service.queue
+    assert lobby.shards.guests == {}
+
+
+@pytest.mark.asyncio
+async def test_unix_socket_broker_forwards_between_shards():
+    path = os.path.join(tempfile.mkdtemp(), "broker.sock")
+    broker = Broker()
+    server = asyncio.create_task(broker.serve(path))
+    received = []
+    links = [BrokerLink(path, shard, received.append) for shard in range(2)]
+    for _ in range(100):
+        await asyncio.sleep(0.01)
+        if os.path.exists(path):
+            break
+    for link in links:
+        link.start()
+    for _ in range(100):
+        await asyncio.sleep(0.01)
+        if len(broker.shards) == 2:
+            break
+
+    links[0].send(1, {"type": "withdraw", "user_id": "user-1"})
+    for _ in range(100):
+        await asyncio.sleep(0.01)
+        if received:
+            break
+    assert received == [{"type": "withdraw", "user_id": "user-1", "to": 1}]
+
+    for link in links:
+        await link.close()
+    server.cancel()
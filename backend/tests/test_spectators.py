@@ -0,0 +1,140 @@
+import asyncio
+import json
+
+import pytest
+
+from app.svc.room import (
+    ConnectionManager,
+    RoomManager,
+    RoomService,
+    WebSocketConnection,
+)
+from app.svc.spectators import SpectatorChannel
+
+
+class FakeWebSocket:
+    scope = {"subprotocols": []}
+
+    def __init__(self, delay=0):
+        self.delay = delay
+        self.sent = []
+        self.close_code = None
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, data):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.sent.append(data)
+
+    async def close(self, code=1000):
+        self.close_code = code
+
+
+@pytest.mark.asyncio
+async def test_thousands_of_spectators_share_one_frame():
+    channel = SpectatorChannel("room")
+    sockets = [FakeWebSocket() for _ in range(2000)]
+    for websocket in sockets:
+        connection = WebSocketConnection(websocket, max_queued=1)
+        connection.start()
+        channel.subscribe(connection)
+
+    frame = '{"turn":"white"}'
+    channel.publish(frame)
+    for _ in range(100):
+        await asyncio.sleep(0.01)
+        if all(websocket.sent for websocket in sockets):
+            break
+
+    assert all(websocket.sent == [frame] for websocket in sockets)
+    assert all(websocket.sent[0] is frame for websocket in sockets)
+    assert channel.get_stats()["broadcasts"] == 1
+    channel.close()
+    for connection in channel.subscribers.values():
+        connection.close()
+
+
+@pytest.mark.asyncio
+async def test_spectators_get_the_final_frame_and_are_closed_when_the_room_ends():
+    channel = SpectatorChannel("room")
+    sockets = [FakeWebSocket() for _ in range(3)]
+    connections = [
+        WebSocketConnection(websocket, max_queued=1) for websocket in sockets
+    ]
+    for connection in connections:
+        connection.start()
+        channel.subscribe(connection)
+
+    channel.publish("checkmate")
+    channel.close()
+    await asyncio.wait_for(channel.task, 1)
+    await asyncio.wait_for(
+        asyncio.gather(*(connection.writer for connection in connections)), 1
+    )
+
+    assert all(websocket.sent == ["checkmate"] for websocket in sockets)
+    assert all(websocket.close_code == 1000 for websocket in sockets)
+    assert all(connection.closed for connection in connections)
+    assert not channel.subscribers
+
+    late_socket = FakeWebSocket()
+    late = WebSocketConnection(late_socket, max_queued=1)
+    late.start()
+    channel.subscribe(late)
+    await asyncio.wait_for(late.writer, 1)
+    assert late_socket.sent == ["checkmate"]
+    assert late_socket.close_code == 1000
+    assert not channel.subscribers
+
+
+@pytest.mark.asyncio
+async def test_slow_spectator_skips_frames_without_holding_up_others():
+    channel = SpectatorChannel("room")
+    slow_socket, fast_socket = FakeWebSocket(0.05), FakeWebSocket()
+    slow = WebSocketConnection(slow_socket, max_queued=1)
+    fast = WebSocketConnection(fast_socket, max_queued=1)
+    for connection in (slow, fast):
+        connection.start()
+        channel.subscribe(connection)
+
+    for state in range(1, 6):
+        channel.publish(f"state {state}")
+        await asyncio.sleep(0.005)
+    await asyncio.sleep(0.15)
+
+    assert fast_socket.sent == [f"state {state}" for state in range(1, 6)]
+    assert slow_socket.sent[0] == "state 1"
+    assert slow_socket.sent[-1] == "state 5"
+    assert len(slow_socket.sent) < 5
+    assert channel.get_stats()["dropped"] > 0
+    slow.close()
+    fast.close()
+
+
+@pytest.mark.asyncio
+async def test_spectator_watches_a_game_without_move_lists():
+    room_manager = RoomManager(ConnectionManager(), RoomService())
+    players = [FakeWebSocket(), FakeWebSocket()]
+    for websocket in players:
+        await room_manager.connect(websocket)
+    (room_id,) = await room_manager.matchmaking_tick()
+
+    spectator_socket = FakeWebSocket()
+    connection = await room_manager.watch(spectator_socket, room_id)
+    await room_manager.emit_game_state_to_room(room_id)
+    await asyncio.sleep(0.01)
+
+    state = json.loads(spectator_socket.sent[-1])
+    assert state["id"] == str(room_id)
+    assert state["spectating"] is True
+    assert state["moves"] == []
+    assert "player_id" not in state
+    assert room_manager.get_spectator_stats()[str(room_id)]["subscribers"] == 1
+    # Players still get their own moves
+    assert json.loads(players[0].sent[-1])["moves"]
+
+    room_manager.stop_watching(room_id, connection)
+    assert room_manager.get_spectator_stats()[str(room_id)]["subscribers"] == 0
+    assert await room_manager.watch(FakeWebSocket(), "missing") is None
@@ -0,0 +1,112 @@
+import asyncio
+import copy
+import json
+
+import pytest
+
+from app.obj.modifier import KNOOK_MODIFIER
+from app.obj.position import position_from_notation
+from app.svc.room import (
+    ConnectionManager,
+    RoomManager,
+    RoomService,
+    WebSocketConnection,
+)
+from app.svc.state_delta import MODIFIER_CATALOGUE, compact_move, compact_shared_state
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.scope = {"subprotocols": []}
+        self.sent = []
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, data):
+        self.sent.append(json.loads(data))
+
+
+def apply_message(state, move_lists, message):
+    """What a delta client does with each message."""
+    if message["type"] == "state_snapshot":
+        state = copy.deepcopy(message["state"])
+        move_lists.clear()
+    else:
+        state = copy.deepcopy(state)
+        changes = message["changes"]
+        for key, value in changes.items():
+            if key == "squares":
+                for row, col, square in value:
+                    state["squares"][row][col] = square
+            elif key != "moves":
+                state[key] = value
+
+        moves = move_lists.get(state["turn"], [])
+        if "moves" in changes:
+            removed = {tuple(move) for move in changes["moves"]["removed"]}
+            moves = [m for m in moves if tuple(compact_move(m)) not in removed] + [
+                {"from": {"row": m[0], "col": m[1]}, "to": {"row": m[2], "col": m[3]}}
+                for m in changes["moves"]["added"]
+            ]
+        state["moves"] = moves
+    move_lists[state["turn"]] = state["moves"]
+    return state
+
+
+def comparable(state):
+    state = dict(state)
+    state["moves"] = sorted(compact_move(move) for move in state["moves"])
+    state.pop("modifier_catalogue", None)
+    del state["time"]  # Depends on when the state was built
+    return state
+
+
+@pytest.mark.asyncio
+async def test_delta_client_tracks_full_state_with_far_fewer_bytes():
+    room_manager = RoomManager(ConnectionManager(), RoomService())
+    opponent, delta = FakeWebSocket(), FakeWebSocket()
+    await room_manager.connect(opponent)
+    connection_id = await room_manager.connect(delta, protocol="delta")
+    await room_manager.matchmaking_tick()
+
+    # A second, legacy connection for the same player to compare against
+    user_id = room_manager.manager.connection_id_to_user_id[connection_id]
+    legacy = FakeWebSocket()
+    connection = WebSocketConnection(legacy)
+    connection.start()
+    room_manager.manager.user_id_to_connection_map[user_id].append(connection)
+    room_manager.manager.connection_id_to_user_id[connection.id] = user_id
+
+    room = room_manager.room_service.find_player_room(user_id)
+    assert room.game.board.squares[7][0].add_modifier(KNOOK_MODIFIER)
+    for move in [("e2", "e4"), ("e7", "e5"), ("g1", "f3"), ("b8", "c6")]:
+        start, end = (position_from_notation(square) for square in move)
+        assert room.game.move(start, end, room.game.turn)
+        await room_manager.emit_game_state_to_room(room.id)
+        await asyncio.sleep(0.01)  # Let the writer tasks send
+
+    types = [message["type"] for message in delta.sent]
+    assert types == ["state_snapshot"] + ["state_delta"] * 4
+    assert [message["seq"] for message in delta.sent] == [1, 2, 3, 4, 5]
+
+    assert delta.sent[0]["state"]["modifier_catalogue"] == MODIFIER_CATALOGUE
+    assert [
+        7,
+        0,
+        {
+            "type": "rook",
+            "color": "white",
+            "modifiers": ["Knook"],
+            "modifier_uses_remaining": {},
+        },
+    ] in delta.sent[1]["changes"]["squares"]
+
+    client_state, move_lists = None, {}
+    for message in delta.sent:
+        client_state = apply_message(client_state, move_lists, message)
+    assert comparable(client_state) == comparable(compact_shared_state(legacy.sent[-1]))
+
+    full_bytes = len(json.dumps(legacy.sent[-1]))
+    delta_bytes = len(json.dumps(delta.sent[-1]))
+    assert delta_bytes * 10 < full_bytes
@@ -0,0 +1,85 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from app.engine import tablebase  # noqa: E402
+from app.engine.tablebase import Material, Tablebase, TablebaseSet  # noqa: E402
+from app.obj.board import Board  # noqa: E402
+from app.obj.pieces import King, Rook  # noqa: E402
+from app.obj.position import Position  # noqa: E402
+
+
+def test_material_parsing_and_ordering():
+    material = Material.parse("KR[Quook]vK")
+    assert str(material) == "KR[Quook]vK"
+    assert str(Material.parse("KNBvK")) == "KBNvK"
+    assert str(material.mirrored()) == "KvKR[Quook]"
+    assert Material.parse("KPvK").subsets() == [
+        Material.parse("KvK"),
+        Material.parse("KQvK"),
+        Material.parse("KRvK"),
+        Material.parse("KBvK"),
+        Material.parse("KNvK"),
+    ]
+
+    with pytest.raises(ValueError):
+        Material.parse("KQK")
+    with pytest.raises(ValueError):
+        Material.parse("KB[Quook]vK")
+    with pytest.raises(ValueError):
+        Material.parse("KB[Corner Hop]vK")
+    with pytest.raises(ValueError):
+        Material.parse("QvK")
+
+
+def test_index_round_trips_through_board():
+    material = Material.parse("KR[Quook]vK")
+    board = Board.empty()
+    board.place_piece(King("white"), Position(7, 4))
+    rook = Rook("white")
+    rook.add_modifier(tablebase.MODIFIERS_BY_TYPE["Quook"])
+    board.place_piece(rook, Position(3, 3))
+    board.place_piece(King("black"), Position(0, 0))
+
+    index = material.index_of(board, "black")
+    rebuilt, turn = material.board_at(index)
+    assert turn == "black"
+    assert material.index_of(rebuilt, turn) == index
+    assert Material.parse("KRvK").index_of(board, "black") is None
+
+
+def test_retrograde_distances():
+    # 0 is mated, 1 can only move to 0, 2 can only move to 1, 3 moves to 2 or 4,
+    # 4 moves to 3 or 4 (a draw by repetition), 5 moves to a won sub-table result
+    counts = np.array([0, 1, 1, 2, 2, 1], np.int32)
+    targets = np.array([0, 1, 2, 4, 3, 4, -1], np.int32)
+    external_states = np.zeros(len(targets), np.int8)
+    external_plies = np.zeros(len(targets), np.int16)
+    external_states[-1] = tablebase._WIN
+    external_plies[-1] = 7
+
+    states = np.full(6, tablebase._UNKNOWN, np.int8)
+    states[0] = tablebase._LOSS
+    plies = np.zeros(6, np.int16)
+    tablebase._retrograde(
+        states, plies, counts, targets, external_states, external_plies
+    )
+
+    values = tablebase._encode(states, plies)
+    assert values.tolist() == [128, 1, 130, 3, 0, 136]
+
+
+def test_generate_and_probe_bare_kings(tmp_path):
+    paths = tablebase.generate_with_subtables(Material.parse("KvK"), str(tmp_path), 1)
+    table = Tablebase(paths[-1])
+
+    values = table.values()
+    # Kings on adjacent squares can never happen, everything else is a draw
+    assert set(np.unique(values).tolist()) == {tablebase.DRAW, tablebase.ILLEGAL}
+    assert (values == tablebase.DRAW).sum() == 2 * (64 * 63 - 420)
+
+    board = Board.empty()
+    board.place_piece(King("white"), Position(7, 4))
+    board.place_piece(King("black"), Position(0, 4))
+    result = TablebaseSet(str(tmp_path)).probe(board, "white")
+    assert result.outcome == "draw"
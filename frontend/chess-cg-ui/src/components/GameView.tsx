@@ -62,12 +62,27 @@ function useAuthToken() {
   return { authToken, isLoading, error };
 }
 
+// Redirects followed in a row before giving up, in case shards disagree
+const MAX_REDIRECTS = 3;
+
+// Sent when this socket is on the wrong shard (see backend/app/svc/sharding.py)
+interface RedirectMessage {
+  type: "redirect";
+  shard: number;
+  room_id?: string;
+  token?: string;
+}
+
 // Custom hook for WebSocket connection
 function useWebSocket(onMessage: (data: BoardEvent) => void) {
   const [connectionStatus, setConnectionStatus] =
     useState<ConnectionStatusType>("connecting");
   const socketRef = useRef<WebSocket | null>(null);
   const onMessageRef = useRef(onMessage);
+  // Where the last redirect sent us, and the guest token it came with
+  const shardRef = useRef<number | null>(null);
+  const redirectTokenRef = useRef<string | null>(null);
+  const redirectsRef = useRef(0);
   const { authToken, isLoading: authLoading } = useAuthToken();
 
   // Keep the latest onMessage callback in a ref
@@ -87,19 +102,42 @@ function useWebSocket(onMessage: (data: BoardEvent) => void) {
       return;
     }
 
-    const connect = async () => {
-      let wsUrl = websocketUrl;
+    const connect = () => {
+      const params = new URLSearchParams();
 
       // Add token to URL if available
-      if (authToken) {
-        wsUrl = `${websocketUrl}?token=${encodeURIComponent(authToken)}`;
+      const token = authToken ?? redirectTokenRef.current;
+      if (token) {
+        params.set("token", token);
       }
+      // The proxy routes ?shard=N to the process serving our game
+      if (shardRef.current !== null) {
+        params.set("shard", String(shardRef.current));
+      }
+      const query = params.toString();
+      const wsUrl = query ? `${websocketUrl}?${query}` : websocketUrl;
 
       const socket = new WebSocket(wsUrl);
+      let redirected = false;
 
       socket.addEventListener("message", (event) => {
         try {
           const data = JSON.parse(event.data);
+          if (data.type === "redirect") {
+            const redirect = data as RedirectMessage;
+            if (redirectsRef.current >= MAX_REDIRECTS) {
+              console.error("Too many WebSocket redirects");
+              return;
+            }
+            redirectsRef.current += 1;
+            shardRef.current = redirect.shard;
+            redirectTokenRef.current =
+              redirect.token ?? redirectTokenRef.current;
+            redirected = true;
+            socket.close();
+            return;
+          }
+          redirectsRef.current = 0;
           onMessageRef.current(data);
         } catch (error) {
           console.error("Failed to parse WebSocket message:", error);
@@ -117,6 +155,15 @@ function useWebSocket(onMessage: (data: BoardEvent) => void) {
       });
 
       socket.addEventListener("close", () => {
+        // Ignore sockets we have already replaced or torn down
+        if (socketRef.current !== socket) return;
+        if (redirected) {
+          console.debug(`WebSocket redirected to shard ${shardRef.current}`);
+          // Re-render so the game sends on the new socket once it opens
+          setConnectionStatus("connecting");
+          connect();
+          return;
+        }
         console.debug("WebSocket disconnected");
         setConnectionStatus("disconnected");
         socketRef.current = null;